@@ -0,0 +1,47 @@
+"""Add indexes for basket, order history and catalog lookups
+
+Revision ID: 08072213003e
+Revises: b9cc8328484a
+Create Date: 2026-10-17 15:20:36.472910
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '08072213003e'
+down_revision: Union[str, None] = 'b9cc8328484a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# cart.user_id is already covered by the uix_user_food (user_id, food_id) constraint
+INDEXES = (
+    ('ix_orders_user_created', 'orders', ['user_id', 'created_at', 'id'], None),
+    ('ix_orders_restaurant_status', 'orders', ['restaurant_id', 'status'], None),
+    ('ix_order_items_order_id', 'order_items', ['order_id'], None),
+    ('ix_foods_restaurant_category_active', 'foods', ['restaurant_id', 'category_id'], 'is_active = true'),
+    ('ix_addresses_user_name', 'addresses', ['user_id', 'address_name'], None),
+    ('ix_categories_restaurant_active', 'categories', ['restaurant_id'], 'is_active = true'),
+    ('ix_restaurants_name_active', 'restaurants', ['name'], 'is_active = true'),
+)
+
+
+def upgrade() -> None:
+    # CONCURRENTLY keeps the tables writable while the indexes build; it
+    # cannot run inside the migration transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name, table, columns, unique=False,
+                postgresql_where=sa.text(where) if where else None,
+                postgresql_concurrently=True
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
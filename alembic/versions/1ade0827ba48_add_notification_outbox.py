@@ -0,0 +1,46 @@
+"""Add notification_outbox table
+
+Revision ID: 1ade0827ba48
+Revises: 1e2c3ccbea9b
+Create Date: 2026-10-17 12:31:08.904417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1ade0827ba48'
+down_revision: Union[str, None] = '1e2c3ccbea9b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('notification_outbox',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('chat_id', sa.BIGINT(), nullable=False),
+    sa.Column('text', sa.Text(), nullable=False),
+    sa.Column('reply_markup', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('order_id', sa.Integer(), nullable=True),
+    sa.Column('message_type', sa.String(length=50), nullable=True),
+    sa.Column('status', sa.String(length=20), server_default='pending', nullable=False),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('available_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('message_id', sa.BigInteger(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_notification_outbox_due', 'notification_outbox', ['available_at'], unique=False,
+                    postgresql_where=sa.text("status = 'pending'"))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_notification_outbox_due', table_name='notification_outbox')
+    op.drop_table('notification_outbox')
@@ -0,0 +1,29 @@
+"""Add per-restaurant delivery radius and zone polygon
+
+Revision ID: 1f74f61cf210
+Revises: 08072213003e
+Create Date: 2026-10-17 15:12:40.581204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1f74f61cf210'
+down_revision: Union[str, None] = '08072213003e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('restaurants', sa.Column('delivery_radius_km', sa.Float(), nullable=True))
+    op.add_column('restaurants', sa.Column('delivery_zone', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('restaurants', 'delivery_zone')
+    op.drop_column('restaurants', 'delivery_radius_km')
@@ -0,0 +1,39 @@
+"""Add order_status_history table
+
+Revision ID: 239a331f3aba
+Revises: c1d544b648d1
+Create Date: 2026-10-17 16:41:09.733120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '239a331f3aba'
+down_revision: Union[str, None] = 'c1d544b648d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('order_status_history',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('from_status', sa.String(length=50), nullable=True),
+    sa.Column('to_status', sa.String(length=50), nullable=False),
+    sa.Column('actor_telegram_id', sa.BIGINT(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_order_status_history_order_created', 'order_status_history', ['order_id', 'created_at'], unique=False)
+    op.create_index('ix_order_status_history_created', 'order_status_history', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_order_status_history_created', table_name='order_status_history')
+    op.drop_index('ix_order_status_history_order_created', table_name='order_status_history')
+    op.drop_table('order_status_history')
@@ -0,0 +1,47 @@
+"""Add updated_at watermark to catalog tables
+
+Revision ID: 29b39e7dae82
+Revises: 36b079b844ce
+Create Date: 2026-10-17 09:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '29b39e7dae82'
+down_revision: Union[str, None] = '36b079b844ce'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CATALOG_TABLES = ('restaurants', 'categories', 'foods')
+
+
+def upgrade() -> None:
+    # Rows edited outside the bot (admin panel, psql) must still move the
+    # watermark, so updated_at is maintained by a trigger rather than the ORM.
+    op.execute("""
+        CREATE OR REPLACE FUNCTION set_updated_at() RETURNS trigger AS $$
+        BEGIN
+            NEW.updated_at = NOW();
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    for table in CATALOG_TABLES:
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True))
+        op.execute(f"""
+            CREATE TRIGGER {table}_set_updated_at
+            BEFORE UPDATE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION set_updated_at()
+        """)
+
+
+def downgrade() -> None:
+    for table in CATALOG_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_set_updated_at ON {table}")
+        op.drop_column(table, 'updated_at')
+    op.execute("DROP FUNCTION IF EXISTS set_updated_at()")
@@ -0,0 +1,49 @@
+"""Add restaurant_hours and restaurant_holidays tables
+
+Revision ID: 408351266a0f
+Revises: 239a331f3aba
+Create Date: 2026-10-17 19:12:44.318507
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '408351266a0f'
+down_revision: Union[str, None] = '239a331f3aba'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('restaurant_hours',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('restaurant_id', sa.Integer(), nullable=False),
+    sa.Column('weekday', sa.SmallInteger(), nullable=False),
+    sa.Column('opens_at', sa.Time(), nullable=False),
+    sa.Column('closes_at', sa.Time(), nullable=False),
+    sa.ForeignKeyConstraint(['restaurant_id'], ['restaurants.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_restaurant_hours_restaurant', 'restaurant_hours', ['restaurant_id'], unique=False)
+    op.create_table('restaurant_holidays',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('restaurant_id', sa.Integer(), nullable=True),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('opens_at', sa.Time(), nullable=True),
+    sa.Column('closes_at', sa.Time(), nullable=True),
+    sa.Column('note', sa.String(length=255), nullable=True),
+    sa.ForeignKeyConstraint(['restaurant_id'], ['restaurants.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_restaurant_holidays_day', 'restaurant_holidays', ['day'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_restaurant_holidays_day', table_name='restaurant_holidays')
+    op.drop_table('restaurant_holidays')
+    op.drop_index('ix_restaurant_hours_restaurant', table_name='restaurant_hours')
+    op.drop_table('restaurant_hours')
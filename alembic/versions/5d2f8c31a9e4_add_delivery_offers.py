@@ -0,0 +1,36 @@
+"""Add delivery_offers table
+
+Revision ID: 5d2f8c31a9e4
+Revises: ecba9a50657d
+Create Date: 2026-10-17 21:48:17.205934
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2f8c31a9e4'
+down_revision: Union[str, None] = 'ecba9a50657d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('delivery_offers',
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('courier_telegram_id', sa.BIGINT(), nullable=False),
+    sa.Column('status', sa.String(length=20), server_default='pending', nullable=False),
+    sa.Column('offered_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('answered_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('order_id', 'courier_telegram_id')
+    )
+    op.create_index('ix_delivery_offers_courier_pending', 'delivery_offers', ['courier_telegram_id'], unique=False, postgresql_where=sa.text("status = 'pending'"))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_delivery_offers_courier_pending', table_name='delivery_offers', postgresql_where=sa.text("status = 'pending'"))
+    op.drop_table('delivery_offers')
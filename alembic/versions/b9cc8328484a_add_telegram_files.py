@@ -0,0 +1,34 @@
+"""Add telegram_files table for cached photo file ids
+
+Revision ID: b9cc8328484a
+Revises: 1ade0827ba48
+Create Date: 2026-10-17 13:47:52.118630
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9cc8328484a'
+down_revision: Union[str, None] = '1ade0827ba48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('telegram_files',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('path', sa.String(length=255), nullable=False),
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('file_id', sa.String(length=255), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('path', 'content_hash', name='uix_telegram_file_path_hash')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('telegram_files')
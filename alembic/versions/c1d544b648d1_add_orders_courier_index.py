@@ -0,0 +1,30 @@
+"""Index orders by courier for the dispatch availability check
+
+Revision ID: c1d544b648d1
+Revises: 1f74f61cf210
+Create Date: 2026-10-17 16:04:18.209577
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c1d544b648d1'
+down_revision: Union[str, None] = '1f74f61cf210'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_orders_courier_status', 'orders', ['active_delivery_person_id', 'status'],
+            unique=False, postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_orders_courier_status', table_name='orders', postgresql_concurrently=True)
@@ -0,0 +1,39 @@
+"""Backfill orders.created_at and make it NOT NULL
+
+Revision ID: c7e41b9d2a06
+Revises: 5d2f8c31a9e4
+Create Date: 2026-10-17 22:20:31.918406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7e41b9d2a06'
+down_revision: Union[str, None] = '5d2f8c31a9e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Orders inserted with raw SQL never set created_at; their last update is
+    # the closest known time, and the epoch keeps the rest at the oldest end
+    op.execute("""
+        UPDATE orders
+        SET created_at = COALESCE(updated_at, TIMESTAMP '1970-01-01')
+        WHERE created_at IS NULL
+    """)
+    op.alter_column('orders', 'created_at',
+               existing_type=sa.DateTime(),
+               server_default=sa.text('now()'),
+               nullable=False)
+
+
+def downgrade() -> None:
+    op.alter_column('orders', 'created_at',
+               existing_type=sa.DateTime(),
+               server_default=None,
+               nullable=True)
@@ -0,0 +1,35 @@
+"""Add food_card_steps table
+
+Revision ID: ecba9a50657d
+Revises: 408351266a0f
+Create Date: 2026-10-17 21:03:52.640118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ecba9a50657d'
+down_revision: Union[str, None] = '408351266a0f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('food_card_steps',
+    sa.Column('chat_id', sa.BIGINT(), nullable=False),
+    sa.Column('message_id', sa.BigInteger(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('shown', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('chat_id', 'message_id')
+    )
+    op.create_index('ix_food_card_steps_updated', 'food_card_steps', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_food_card_steps_updated', table_name='food_card_steps')
+    op.drop_table('food_card_steps')
@@ -0,0 +1,81 @@
+"""
+Compare database round trips of the old and the single-statement basket paths.
+
+Usage:
+    python -m benchmarks.basket_roundtrips --telegram-id 123456789 [--iterations 200]
+
+The removal is simulated with a cart id that does not exist, so the user's
+basket is left untouched.
+"""
+import argparse
+import asyncio
+import time
+from sqlalchemy import event
+from database.db import db
+from functions.functions import calculate_basket_totals
+
+MISSING_CART_ID = -1
+
+
+class RoundTripCounter:
+    def __init__(self, engine):
+        self.statements = 0
+        self.checkouts = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+        event.listen(engine.sync_engine.pool, "checkout", self._on_checkout)
+
+    def _on_execute(self, *args):
+        self.statements += 1
+
+    def _on_checkout(self, *args):
+        self.checkouts += 1
+
+    def reset(self):
+        self.statements = 0
+        self.checkouts = 0
+
+
+async def old_remove_and_render(telegram_id: int):
+    await db.remove_from_cart(MISSING_CART_ID)
+    items, _ = await db.get_basket_items(telegram_id)
+    await calculate_basket_totals(items)
+
+
+async def new_remove_and_render(telegram_id: int):
+    basket, _ = await db.get_basket_view(telegram_id, remove_cart_id=MISSING_CART_ID)
+    await calculate_basket_totals(basket.items, basket.restaurants)
+
+
+async def measure(name: str, path, telegram_id: int, iterations: int, counter: RoundTripCounter):
+    await path(telegram_id)  # warm up connections and caches
+    counter.reset()
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await path(telegram_id)
+    elapsed = time.perf_counter() - started
+
+    print(
+        f"{name:<8} statements/tap={counter.statements / iterations:.2f} "
+        f"sessions/tap={counter.checkouts / iterations:.2f} "
+        f"latency={elapsed / iterations * 1000:.2f} ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--telegram-id", type=int, required=True)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    await db.connect()
+    try:
+        counter = RoundTripCounter(db._engine)
+        await measure("old", old_remove_and_render, args.telegram_id, args.iterations, counter)
+        await measure("new", new_remove_and_render, args.telegram_id, args.iterations, counter)
+    finally:
+        await db.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,173 @@
+"""
+Fire concurrent courier claims at one order and check that exactly one wins.
+
+Usage:
+    python -m benchmarks.concurrent_claims [--couriers 20] [--rounds 50] [--hold-ms 50] [--legacy]
+
+Each round creates an accepted order and lets every courier claim it at the
+same moment, each on its own connection. The winner keeps its transaction
+open for --hold-ms before committing, like a handler still working. The
+losers queue on the order row and must come back empty. --legacy runs the
+old unconditional UPDATE instead, to show the double assignments it allowed.
+
+Keep --couriers within the connection pool (DB_POOL_SIZE + DB_MAX_OVERFLOW).
+Fixture rows use telegram ids from FIXTURE_TELEGRAM_ID upwards and are
+deleted at the end. Needs at least one restaurant in the database.
+"""
+import argparse
+import asyncio
+import sys
+import time
+from sqlalchemy.sql import text
+from database.db import db
+from core.order_lifecycle import CLAIM_DELIVERY
+
+FIXTURE_TELEGRAM_ID = 9_000_000_000_000
+
+LEGACY_CLAIM = text("""
+    UPDATE orders
+    SET status = 'delivering',
+        active_delivery_person_id = (
+            SELECT id FROM delivery_persons
+            WHERE telegram_id = :telegram_id
+        )
+    WHERE id = :order_id
+    RETURNING id
+""")
+
+
+def ms(values: list[float], percentile: int) -> str:
+    if not values:
+        return "-"
+    ordered = sorted(values)
+    return f"{ordered[min(len(ordered) - 1, len(ordered) * percentile // 100)] * 1000:.1f}"
+
+
+async def setup(couriers: int) -> tuple[int, int, list[int]]:
+    session = await db.get_session()
+    try:
+        result = await session.execute(text("SELECT id FROM restaurants ORDER BY id LIMIT 1"))
+        restaurant = result.fetchone()
+        if not restaurant:
+            sys.exit("No restaurants in the database")
+
+        result = await session.execute(text("""
+            INSERT INTO users (telegram_id, full_name) VALUES (:telegram_id, 'claims benchmark')
+            RETURNING id
+        """), {"telegram_id": FIXTURE_TELEGRAM_ID})
+        user_id = result.scalar()
+
+        telegram_ids = [FIXTURE_TELEGRAM_ID + 1 + index for index in range(couriers)]
+        await session.execute(text("""
+            INSERT INTO delivery_persons (telegram_id, name, busy) VALUES (:telegram_id, 'benchmark', false)
+        """), [{"telegram_id": telegram_id} for telegram_id in telegram_ids])
+        await session.commit()
+        return user_id, restaurant.id, telegram_ids
+    finally:
+        await session.close()
+
+
+async def teardown(user_id: int, telegram_ids: list[int]):
+    session = await db.get_session()
+    try:
+        await session.execute(text("DELETE FROM orders WHERE user_id = :user_id"), {"user_id": user_id})
+        await session.execute(text("DELETE FROM users WHERE id = :user_id"), {"user_id": user_id})
+        await session.execute(
+            text("DELETE FROM delivery_persons WHERE telegram_id = ANY(CAST(:ids AS BIGINT[]))"),
+            {"ids": telegram_ids}
+        )
+        await session.commit()
+    finally:
+        await session.close()
+
+
+async def create_order(user_id: int, restaurant_id: int) -> int:
+    session = await db.get_session()
+    try:
+        result = await session.execute(text("""
+            INSERT INTO orders (user_id, restaurant_id, status, total, created_at)
+            VALUES (:user_id, :restaurant_id, 'accepted', 1, NOW())
+            RETURNING id
+        """), {"user_id": user_id, "restaurant_id": restaurant_id})
+        order_id = result.scalar()
+        await session.execute(text("""
+            UPDATE delivery_persons SET busy = false
+            WHERE telegram_id >= :first
+        """), {"first": FIXTURE_TELEGRAM_ID})
+        await session.commit()
+        return order_id
+    finally:
+        await session.close()
+
+
+async def claim(order_id: int, telegram_id: int, start: asyncio.Event, hold: float, legacy: bool):
+    session = await db.get_session()
+    try:
+        # Check out the connection before the starting signal
+        await session.execute(text("SELECT 1"))
+        await start.wait()
+
+        started = time.perf_counter()
+        params = {"order_id": order_id, "telegram_id": telegram_id}
+        if legacy:
+            result = await session.execute(LEGACY_CLAIM, params)
+        else:
+            result = await CLAIM_DELIVERY.execute(session, params)
+        won = result.fetchone() is not None
+        answered = time.perf_counter() - started
+
+        if won:
+            await asyncio.sleep(hold)
+        await session.commit()
+        return won, answered
+    finally:
+        await session.close()
+
+
+async def run(args):
+    await db.connect()
+    user_id, restaurant_id, telegram_ids = await setup(args.couriers)
+    winners_per_round = []
+    loser_latency = []
+    winner_latency = []
+    try:
+        for _ in range(args.rounds):
+            order_id = await create_order(user_id, restaurant_id)
+            start = asyncio.Event()
+            tasks = [
+                asyncio.create_task(claim(order_id, telegram_id, start, args.hold_ms / 1000, args.legacy))
+                for telegram_id in telegram_ids
+            ]
+            await asyncio.sleep(0.05)
+            start.set()
+            results = await asyncio.gather(*tasks)
+
+            winners_per_round.append(sum(1 for won, _ in results if won))
+            for won, answered in results:
+                (winner_latency if won else loser_latency).append(answered)
+    finally:
+        await teardown(user_id, telegram_ids)
+        await db.close()
+
+    mode = "legacy UPDATE" if args.legacy else "compare-and-set"
+    print(f"{mode}: {args.rounds} rounds x {args.couriers} couriers, winner holds {args.hold_ms} ms")
+    print(f"winners per round: min {min(winners_per_round)}, max {max(winners_per_round)}")
+    print(f"winner answer ms: p50 {ms(winner_latency, 50)}, p99 {ms(winner_latency, 99)}")
+    print(f"loser answer ms:  p50 {ms(loser_latency, 50)}, p99 {ms(loser_latency, 99)}")
+
+    if not args.legacy and any(count != 1 for count in winners_per_round):
+        print("FAIL: a round did not have exactly one winner")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--couriers", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--hold-ms", type=float, default=50)
+    parser.add_argument("--legacy", action="store_true")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
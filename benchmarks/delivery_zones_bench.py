@@ -0,0 +1,119 @@
+"""
+Time delivery distance checks: geopy geodesic vs haversine vs the batched NumPy API.
+
+Usage:
+    python -m benchmarks.delivery_zones_bench [--restaurants 200] [--points 2000]
+
+Restaurants and customer points are scattered around the configured city
+center. geopy is only needed for the geodesic baseline and is skipped when
+not installed. Also reports the largest haversine error against geodesic.
+Before timing, checks that addresses outside a restaurant's radius or
+polygon are rejected.
+"""
+import argparse
+import time
+from collections import namedtuple
+import numpy as np
+from config import Config
+from utils.delivery_zones import DeliveryZones, equirectangular_km, haversine_km
+
+try:
+    from geopy.distance import geodesic
+except ImportError:
+    geodesic = None
+
+Restaurant = namedtuple('Restaurant', 'id latitude longitude delivery_radius_km delivery_zone')
+
+# Roughly 15 km in each direction around the center
+SPREAD_DEGREES = 0.15
+
+
+def scatter(rng, count: int) -> np.ndarray:
+    center = np.array([Config.CITY_CENTER_LATITUDE, Config.CITY_CENTER_LONGITUDE])
+    return center + rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES, size=(count, 2))
+
+
+def timed(label: str, checks: int, run):
+    started = time.perf_counter()
+    result = run()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {elapsed * 1000:10.1f} ms  {elapsed / checks * 1e9:10.0f} ns/check")
+    return result
+
+
+def check_zones():
+    """An address outside a restaurant's radius or polygon must be rejected"""
+    lat, lon = Config.CITY_CENTER_LATITUDE, Config.CITY_CENTER_LONGITUDE
+    square = [[lat - 0.01, lon - 0.01], [lat - 0.01, lon + 0.01],
+              [lat + 0.01, lon + 0.01], [lat + 0.01, lon - 0.01]]
+    zones = DeliveryZones([
+        Restaurant(1, lat, lon, 2.0, None),
+        Restaurant(2, lat, lon, None, square),
+    ])
+    # ~0.55 km and ~4.4 km north of the center
+    near, far = (lat + 0.005, lon), (lat + 0.04, lon)
+
+    assert zones.delivers_to(1, *near) and zones.delivers_to(2, *near)
+    assert not zones.delivers_to(1, *far), "address outside the radius accepted"
+    assert not zones.delivers_to(2, *far), "address outside the polygon accepted"
+    assert zones.covered(*near) and not zones.covered(*far)
+    assert zones.coverage(*far).tolist() == [False, False]
+    # Restaurants without coordinates or limits deliver anywhere
+    assert DeliveryZones([Restaurant(3, None, None, None, None)]).covered(*far)
+    assert DeliveryZones([Restaurant(4, lat, lon, None, None)]).delivers_to(4, *far)
+    print("zone checks passed\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--restaurants", type=int, default=200)
+    parser.add_argument("--points", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    check_zones()
+
+    rng = np.random.default_rng(args.seed)
+    locations = scatter(rng, args.restaurants)
+    points = scatter(rng, args.points)
+    restaurants = [
+        Restaurant(index + 1, lat, lon, 5.0, None)
+        for index, (lat, lon) in enumerate(locations.tolist())
+    ]
+    zones = DeliveryZones(restaurants)
+    checks = args.restaurants * args.points
+    print(f"{args.restaurants} restaurants x {args.points} points = {checks} distance checks\n")
+
+    if geodesic:
+        reference = timed("geopy geodesic (per pair)", checks, lambda: np.array([
+            [geodesic((lat, lon), (r.latitude, r.longitude)).km for r in restaurants]
+            for lat, lon in points.tolist()
+        ]))
+    else:
+        reference = None
+        print("geopy not installed, skipping the geodesic baseline")
+
+    timed("haversine (per pair)", checks, lambda: [
+        [haversine_km(lat, lon, r.latitude, r.longitude) for r in restaurants]
+        for lat, lon in points.tolist()
+    ])
+    timed("equirectangular (per pair)", checks, lambda: [
+        [equirectangular_km(lat, lon, r.latitude, r.longitude) for r in restaurants]
+        for lat, lon in points.tolist()
+    ])
+    timed("numpy, one call per point", checks, lambda: [
+        zones.distances_km(lat, lon) for lat, lon in points.tolist()
+    ])
+    timed("numpy coverage per point", checks, lambda: [
+        zones.coverage(lat, lon) for lat, lon in points.tolist()
+    ])
+    matrix = timed("numpy distance matrix", checks, lambda: zones.distance_matrix_km(
+        points[:, 0], points[:, 1]
+    ))
+
+    if reference is not None:
+        error = np.abs(matrix - reference) / np.maximum(reference, 1e-9)
+        print(f"\nmax haversine error vs geodesic: {error.max() * 100:.3f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Check that the hot lookup queries are planned with index scans.
+
+Usage:
+    python -m benchmarks.explain_plans [--analyze]
+
+Run it against a seeded database: on a handful of rows Postgres rightly
+prefers sequential scans, so the check only means something at realistic
+sizes. Sample parameters are taken from existing rows. Exits with status 1
+when any query sequentially scans one of its checked tables.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from sqlalchemy.sql import text
+from database.db import db
+from database.queries import get_query
+
+# name -> (SQL, tables that must not be sequentially scanned)
+CHECKS = {
+    "basket_items": (get_query("basket_items").sql, {"cart"}),
+    "order_history_first": (get_query("order_history_first").sql, {"orders", "order_items"}),
+    "order_history_older": (get_query("order_history_older").sql, {"orders", "order_items"}),
+    "orders_by_restaurant_status": ("""
+        SELECT id FROM orders WHERE restaurant_id = :restaurant_id AND status = 'pending'
+    """, {"orders"}),
+    "address_by_name": ("""
+        SELECT id FROM addresses WHERE user_id = :user_id AND address_name = :address_name
+    """, {"addresses"}),
+    "categories_of_restaurant": ("""
+        SELECT name FROM categories WHERE restaurant_id = :restaurant_id AND is_active = true
+    """, {"categories"}),
+    "foods_of_category": ("""
+        SELECT id, name FROM foods
+        WHERE restaurant_id = :restaurant_id AND category_id = :category_id AND is_active = true
+    """, {"foods"}),
+    "restaurant_by_name": ("""
+        SELECT id FROM restaurants WHERE name = :name AND is_active = true
+    """, {"restaurants"}),
+}
+
+SAMPLE_PARAMS = """
+    SELECT
+        (SELECT user_id FROM orders GROUP BY user_id ORDER BY count(*) DESC LIMIT 1) AS user_id,
+        (SELECT restaurant_id FROM foods WHERE is_active LIMIT 1) AS restaurant_id,
+        (SELECT category_id FROM foods WHERE is_active LIMIT 1) AS category_id,
+        (SELECT name FROM restaurants WHERE is_active LIMIT 1) AS restaurant_name,
+        (SELECT address_name FROM addresses LIMIT 1) AS address_name,
+        (SELECT max(created_at) FROM orders) AS cursor_created_at,
+        (SELECT max(id) FROM orders) AS cursor_id
+"""
+
+CHECKED_TABLES = ("cart", "orders", "order_items", "foods", "addresses", "categories", "restaurants")
+
+
+def seq_scans(plan: dict) -> set:
+    """Relations read with a sequential scan anywhere in the plan tree"""
+    found = set()
+    if plan.get("Node Type") == "Seq Scan":
+        found.add(plan.get("Relation Name"))
+    for child in plan.get("Plans", []):
+        found |= seq_scans(child)
+    return found
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--analyze", action="store_true", help="refresh table statistics first")
+    args = parser.parse_args()
+
+    await db.connect()
+    session = await db.get_session()
+    failures = 0
+    try:
+        if args.analyze:
+            for table in CHECKED_TABLES:
+                await session.execute(text(f"ANALYZE {table}"))
+
+        sample = (await session.execute(text(SAMPLE_PARAMS))).one()
+        params = {
+            "user_id": sample.user_id,
+            "restaurant_id": sample.restaurant_id,
+            "category_id": sample.category_id,
+            "name": sample.restaurant_name,
+            "address_name": sample.address_name,
+            "cursor_created_at": sample.cursor_created_at,
+            "cursor_id": sample.cursor_id,
+            "limit": 4,
+        }
+
+        for name, (sql, tables) in CHECKS.items():
+            result = await session.execute(text("EXPLAIN (FORMAT JSON) " + sql), params)
+            plan = result.scalar()
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            scanned = seq_scans(plan[0]["Plan"]) & tables
+            if scanned:
+                failures += 1
+                print(f"FAIL {name}: sequential scan on {', '.join(sorted(scanned))}")
+            else:
+                print(f"ok   {name}")
+    finally:
+        await session.close()
+        await db.close()
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,409 @@
+"""
+Replay the whole order journey through the real Dispatcher and time each step.
+
+Usage:
+    python -m benchmarks.journey_load [--users 100] [--concurrency 20] [--seed 1]
+                                      [--max-taps 3] [--storage memory|config]
+
+Every virtual user sends the updates a customer would: /start, open the
+menu, pick a restaurant, a category and a food, tap the stepper, add to
+cart, open the basket, check out with a contact, a new address and both
+notes, and confirm. Then the restaurant accepts, a courier claims the order,
+reports arrival and the customer confirms receipt. Updates go through
+main.create_dispatcher() with all middlewares; the Bot talks to an in-process
+fake session that answers every method and keeps the keyboards it was sent,
+so each step presses a button the bot actually offered. Choices come from
+a random generator seeded per user, so runs with the same seed and catalog
+make the same journeys.
+
+A step counts as failed when the FSM does not reach the state it should,
+and the user's journey stops there. Reported per step: count, failures and
+p50/p95/p99 in ms; overall: updates/s and completed journeys. FSM state is
+kept in memory unless --storage config selects the FSM_STORAGE backend.
+
+Run it against a seeded local database, never production: it writes users,
+orders and outbox rows. Fixture users, couriers and everything hanging off
+them are deleted at the end, as are outbox rows created during the run and
+the fake file_ids the photo cache stored. Needs at least one restaurant
+that is open now with a category and a food.
+"""
+import argparse
+import asyncio
+from collections import Counter, defaultdict
+import itertools
+import json
+import random
+import sys
+import time
+from typing import Optional
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import InlineKeyboardMarkup, ReplyKeyboardMarkup
+from sqlalchemy.sql import text
+from config import Config
+from core.bot import set_bot
+from core.dispatch import dispatcher
+from core.latency import TelegramApiTiming
+from core.photo_cache import photo_cache
+from database.db import db
+from database.fsm_storage import create_storage
+from main import create_dispatcher
+from states.states import OrderState
+
+FAKE_TOKEN = "123456:HARNESS-TOKEN"
+FIXTURE_TELEGRAM_ID = 9_100_000_000_000
+STAFF_TELEGRAM_ID = FIXTURE_TELEGRAM_ID - 1
+FAKE_FILE_PREFIX = "harness-"
+BACK_BUTTONS = {"⬅️ Orqaga", "⬅️ Asosiy menyu", "🛒 Savat"}
+
+
+class FakeTelegramSession(BaseSession):
+    """
+    Answers Bot API calls in process. Sent messages get increasing ids and
+    the last message and reply keyboard of every chat are kept for the
+    harness to press buttons on.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.calls = Counter()
+        self.messages = {}  # (chat_id, message_id) -> message dict
+        self.last_message = {}  # chat_id -> message dict
+        self.last_keyboard = {}  # chat_id -> reply keyboard button texts
+        self._message_ids = itertools.count(1)
+
+    async def close(self):
+        pass
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def make_request(self, bot, method, timeout=None):
+        name = method.__api_method__
+        self.calls[name] += 1
+        content = json.dumps({"ok": True, "result": self._result(bot, name, method)})
+        return self.check_response(bot=bot, method=method, status_code=200, content=content)
+
+    def _result(self, bot, name: str, method):
+        if name == "getMe":
+            return {"id": bot.id, "is_bot": True, "first_name": "harness", "username": "harness_bot"}
+        if name not in ("sendMessage", "sendPhoto", "editMessageText", "editMessageCaption", "editMessageReplyMarkup"):
+            return True
+
+        chat_id = int(method.chat_id)
+        markup = getattr(method, "reply_markup", None)
+        if isinstance(markup, ReplyKeyboardMarkup):
+            self.last_keyboard[chat_id] = [button.text for row in markup.keyboard for button in row]
+
+        if name.startswith("edit"):
+            message = dict(self.messages.get((chat_id, method.message_id)) or {})
+            message["message_id"] = method.message_id
+        else:
+            message = {"message_id": next(self._message_ids)}
+        message.update({
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup"}
+        })
+        if getattr(method, "text", None) is not None:
+            message["text"] = method.text
+        if getattr(method, "caption", None) is not None:
+            message["caption"] = method.caption
+        if name == "sendPhoto":
+            message["photo"] = [{
+                "file_id": f"{FAKE_FILE_PREFIX}{message['message_id']}",
+                "file_unique_id": f"u{message['message_id']}",
+                "width": 1,
+                "height": 1
+            }]
+        if isinstance(markup, InlineKeyboardMarkup):
+            message["reply_markup"] = markup.model_dump(mode="json", exclude_none=True)
+        elif name.startswith("edit") and markup is None:
+            message.pop("reply_markup", None)
+
+        self.messages[(chat_id, message["message_id"])] = message
+        self.last_message[chat_id] = message
+        return message
+
+
+class Journey:
+    """One virtual customer and the courier who delivers their order"""
+
+    def __init__(self, harness: "Harness", index: int):
+        self.harness = harness
+        self.user_id = FIXTURE_TELEGRAM_ID + index
+        self.courier_id = FIXTURE_TELEGRAM_ID + harness.args.users + index
+        self.random = random.Random(harness.args.seed * 1_000_003 + index)
+        self.order_ids = []
+
+    def _user(self, telegram_id: int) -> dict:
+        return {"id": telegram_id, "is_bot": False, "first_name": f"harness{telegram_id % 100000}"}
+
+    def _message(self, **content) -> dict:
+        return {
+            "message_id": next(self.harness.message_ids),
+            "date": int(time.time()),
+            "chat": {"id": self.user_id, "type": "private"},
+            "from": self._user(self.user_id),
+            **content
+        }
+
+    def _callback(self, data: str, from_id: int, message: dict) -> dict:
+        return {
+            "id": str(next(self.harness.update_ids)),
+            "from": self._user(from_id),
+            "chat_instance": str(message["chat"]["id"]),
+            "data": data,
+            "message": message
+        }
+
+    def _last_message(self, chat_id: int) -> dict:
+        return self.harness.session.last_message.get(chat_id) or {
+            "message_id": next(self.harness.message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup"},
+            "text": "harness"
+        }
+
+    def _choices(self) -> list[str]:
+        buttons = self.harness.session.last_keyboard.get(self.user_id, [])
+        choices = [button for button in buttons if button not in BACK_BUTTONS]
+        self.random.shuffle(choices)
+        return choices
+
+    async def _send(self, step: str, expect: Optional[str] = "", retry: bool = False, **update) -> bool:
+        """
+        Feed one update; False when the user's state is not `expect` afterwards.
+        An empty `expect` skips the check. A miss counts as a failed step
+        unless the caller will retry with another button.
+        """
+        return await self.harness.feed(step, self, expect, update, record_failure=not retry)
+
+    async def send_text(self, step: str, text_: str, expect: Optional[str] = "", retry: bool = False) -> bool:
+        return await self._send(step, expect, retry, message=self._message(text=text_))
+
+    async def press(self, step: str, data: str, expect: Optional[str] = "", from_id: Optional[int] = None,
+                    chat_id: Optional[int] = None) -> bool:
+        message = self._last_message(chat_id or from_id or self.user_id)
+        return await self._send(step, expect, callback_query=self._callback(data, from_id or self.user_id, message))
+
+    async def pick(self, step: str, expect: str) -> Optional[str]:
+        """Press reply buttons until one leads to `expect`; the chosen text or None"""
+        for choice in self._choices():
+            if await self.send_text(step, choice, expect, retry=True):
+                return choice
+        self.harness.fail(step)
+        return None
+
+    async def run(self) -> bool:
+        if not await self.send_text("start", "/start", expect=None):
+            return False
+        if not await self.send_text("open_menu", "🚚 Ovqat buyurtma qilish", OrderState.selecting_restaurant.state):
+            return False
+        # Closed restaurants and empty categories keep the state; try another button
+        if not await self.pick("restaurant", OrderState.selecting_category.state):
+            return False
+        if not await self.pick("category", OrderState.selecting_food.state):
+            return False
+        food = next((choice for choice in self._choices() if " | " in choice), None)
+        if food is None or not await self.send_text("food", food, OrderState.selecting_food.state):
+            return False
+
+        food_id = int(food.rsplit(" | ", 1)[1])
+        for _ in range(self.random.randint(0, self.harness.args.max_taps)):
+            if not await self.press("stepper_tap", f"increase_{food_id}_1", OrderState.selecting_food.state):
+                return False
+        if not await self.press("add_to_cart", f"add_to_cart_{food_id}_1", OrderState.selecting_food.state):
+            return False
+        if not await self.send_text("view_basket", "🛒 Savat", OrderState.selecting_food.state):
+            return False
+
+        if not await self.press("checkout", "complete_order", OrderState.waiting_for_phone.state):
+            return False
+        contact = {"phone_number": f"+99890{self.user_id % 10_000_000:07d}", "first_name": "harness",
+                   "user_id": self.user_id}
+        if not await self._send("contact", OrderState.adding_new_address_location.state,
+                                message=self._message(contact=contact)):
+            return False
+        location = {"latitude": Config.CITY_CENTER_LATITUDE, "longitude": Config.CITY_CENTER_LONGITUDE}
+        if not await self._send("location", OrderState.adding_new_address_name.state,
+                                message=self._message(location=location)):
+            return False
+        if not await self.send_text("address_name", "Uy", OrderState.waiting_restaurant_message.state):
+            return False
+        if not await self.send_text("restaurant_note", "⏭ O'tkazib yuborish",
+                                    OrderState.waiting_delivery_message.state):
+            return False
+        if not await self.send_text("courier_note", "⏭ O'tkazib yuborish", OrderState.confirming_order.state):
+            return False
+        if not await self.press("confirm", "confirm_order", expect=None):
+            return False
+
+        self.order_ids = await self.harness.pending_orders(self.user_id)
+        if not self.order_ids:
+            self.harness.fail("confirm")
+            return False
+
+        for order_id in self.order_ids:
+            group_message = {
+                "message_id": next(self.harness.message_ids),
+                "date": int(time.time()),
+                "chat": {"id": -self.user_id, "type": "supergroup"},
+                "text": f"🆕 Yangi buyurtma #{order_id}"
+            }
+            self.harness.session.last_message[-self.user_id] = group_message
+            await self.press("restaurant_accept", f"accept_order_{order_id}",
+                             from_id=STAFF_TELEGRAM_ID, chat_id=-self.user_id)
+            await self.press("courier_accept", f"accept_delivery_{order_id}",
+                             from_id=self.courier_id, chat_id=-self.user_id)
+            await self.press("arrival", f"arrived_{order_id}", from_id=self.courier_id)
+            await self.press("received", f"order_received_{order_id}")
+
+        return await self.harness.all_completed(self.order_ids)
+
+
+class Harness:
+    def __init__(self, args):
+        self.args = args
+        self.session = FakeTelegramSession()
+        self.session.middleware(TelegramApiTiming())
+        self.bot = Bot(token=FAKE_TOKEN, session=self.session)
+        self.storage = MemoryStorage() if args.storage == "memory" else create_storage(db)
+        self.dp = create_dispatcher(self.storage)
+        self.update_ids = itertools.count(1)
+        self.message_ids = itertools.count(1_000_000)
+        self.latencies = defaultdict(list)
+        self.failures = Counter()
+        self.updates = 0
+        self.outbox_watermark = 0
+
+    def fail(self, step: str):
+        self.failures[step] += 1
+
+    async def feed(self, step: str, journey: Journey, expect: Optional[str], update: dict,
+                   record_failure: bool = True) -> bool:
+        update = {"update_id": next(self.update_ids), **update}
+        started = time.perf_counter()
+        await self.dp.feed_raw_update(self.bot, update)
+        self.latencies[step].append(time.perf_counter() - started)
+        self.updates += 1
+
+        if expect == "":
+            return True
+        key = StorageKey(bot_id=self.bot.id, chat_id=journey.user_id, user_id=journey.user_id)
+        if await self.storage.get_state(key) == expect:
+            return True
+        if record_failure:
+            self.fail(step)
+        return False
+
+    async def _execute(self, sql: str, params: Optional[dict] = None):
+        session = await db.get_session()
+        try:
+            result = await session.execute(text(sql), params or {})
+            rows = result.fetchall() if result.returns_rows else None
+            await session.commit()
+            return rows
+        finally:
+            await session.close()
+
+    async def setup(self):
+        rows = await self._execute("SELECT COALESCE(MAX(id), 0) AS id FROM notification_outbox")
+        self.outbox_watermark = rows[0].id
+        couriers = [
+            {"telegram_id": FIXTURE_TELEGRAM_ID + self.args.users + index, "name": f"harness courier {index}"}
+            for index in range(self.args.users)
+        ]
+        await self._execute("""
+            INSERT INTO delivery_persons (telegram_id, name, phone_number, busy)
+            VALUES (:telegram_id, :name, '+998900000000', false)
+        """, couriers)
+
+    async def teardown(self):
+        last = FIXTURE_TELEGRAM_ID + 2 * self.args.users
+        await self._execute("DELETE FROM users WHERE telegram_id BETWEEN :first AND :last",
+                            {"first": FIXTURE_TELEGRAM_ID, "last": last})
+        await self._execute("DELETE FROM delivery_persons WHERE telegram_id BETWEEN :first AND :last",
+                            {"first": FIXTURE_TELEGRAM_ID, "last": last})
+        await self._execute("DELETE FROM notification_outbox WHERE id > :watermark",
+                            {"watermark": self.outbox_watermark})
+        await self._execute("DELETE FROM telegram_files WHERE file_id LIKE :prefix",
+                            {"prefix": f"{FAKE_FILE_PREFIX}%"})
+        await self._execute("DELETE FROM food_card_steps WHERE chat_id BETWEEN :first AND :last",
+                            {"first": FIXTURE_TELEGRAM_ID, "last": last})
+
+    async def pending_orders(self, telegram_id: int) -> list[int]:
+        rows = await self._execute("""
+            SELECT o.id FROM orders o JOIN users u ON u.id = o.user_id
+            WHERE u.telegram_id = :telegram_id AND o.status = 'pending'
+            ORDER BY o.id
+        """, {"telegram_id": telegram_id})
+        return [row.id for row in rows]
+
+    async def all_completed(self, order_ids: list[int]) -> bool:
+        rows = await self._execute(
+            "SELECT count(*) AS done FROM orders WHERE id = ANY(CAST(:ids AS INTEGER[])) AND status = 'completed'",
+            {"ids": order_ids}
+        )
+        if rows[0].done == len(order_ids):
+            return True
+        self.fail("received")
+        return False
+
+    async def run(self) -> tuple[int, float]:
+        semaphore = asyncio.Semaphore(self.args.concurrency)
+
+        async def journey(index: int) -> bool:
+            async with semaphore:
+                return await Journey(self, index).run()
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(journey(index) for index in range(self.args.users)))
+        return sum(results), time.perf_counter() - started
+
+    def report(self, completed: int, elapsed: float):
+        print(f"{self.args.users} journeys, concurrency {self.args.concurrency}, seed {self.args.seed}, "
+              f"storage {self.args.storage}")
+        print(f"completed {completed}/{self.args.users} in {elapsed:.2f} s, "
+              f"{self.updates} updates, {self.updates / elapsed:.0f} updates/s")
+        print(f"{'step':<18}{'count':>7}{'failed':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+        for step, values in self.latencies.items():
+            ordered = sorted(values)
+            p50, p95, p99 = (ordered[min(len(ordered) - 1, len(ordered) * p // 100)] * 1000 for p in (50, 95, 99))
+            print(f"{step:<18}{len(values):>7}{self.failures[step]:>8}{p50:>9.1f}{p95:>9.1f}{p99:>9.1f}")
+        print("bot api calls: " + ", ".join(f"{name} {count}" for name, count in self.session.calls.most_common()))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-taps", type=int, default=3)
+    parser.add_argument("--storage", choices=("memory", "config"), default="memory")
+    args = parser.parse_args()
+
+    harness = Harness(args)
+    set_bot(harness.bot)
+    await db.connect()
+    await db.load_catalog()
+    await photo_cache.load()
+    await harness.setup()
+    try:
+        completed, elapsed = await harness.run()
+        # Let background dispatch and stepper edits finish before cleaning up
+        await dispatcher.close()
+        await asyncio.sleep(Config.STEPPER_DEBOUNCE_SECONDS)
+    finally:
+        await harness.teardown()
+        await harness.storage.close()
+        await db.close()
+
+    harness.report(completed, elapsed)
+    if completed < args.users:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
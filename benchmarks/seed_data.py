@@ -0,0 +1,299 @@
+"""
+Fill the schema with a reproducible dataset at production scale.
+
+Usage:
+    python -m benchmarks.seed_data [--seed 1] [--restaurants 60] [--categories 8] [--foods 12]
+                                   [--users 100000] [--max-addresses 3] [--cart-users 20000]
+                                   [--couriers 300] [--years 3] [--orders-per-year 12]
+                                   [--max-items 4] [--until 2026-01-01] [--truncate]
+
+Restaurants with categories and foods, users with addresses and carts,
+couriers, and --years of orders with their items are generated in Python
+and loaded with COPY through asyncpg's copy_records_to_table, in batches so
+memory stays flat however many orders there are. The same arguments always
+produce the same rows: every choice comes from --seed and every timestamp is
+counted back from --until rather than from the clock.
+
+Ids are assigned here, continuing after the tables' current maximum, so
+foreign keys need no lookups; the sequences are moved past them at the end.
+Users get telegram ids from SEED_TELEGRAM_ID upwards. --truncate empties
+every table the generator writes, and the tables referencing them, first;
+only use it on a scratch database. Everything loads in one transaction and
+the tables are analyzed afterwards so the planner sees the new sizes.
+"""
+import argparse
+import asyncio
+from datetime import date, datetime, time as day_time, timedelta
+from math import cos, pi, radians, sin
+import random
+import time
+import asyncpg
+from config import Config
+
+SEED_TELEGRAM_ID = 8_000_000_000_000
+BATCH_SIZE = 50_000
+
+TABLES = ("restaurants", "categories", "foods", "users", "addresses", "cart",
+          "delivery_persons", "orders", "order_items")
+
+RESTAURANT_WORDS = ("Rayhon", "Caravan", "Samarqand", "Oqtepa", "Bon", "Evos", "Afsona", "Navvat",
+                    "Chayxana", "Milliy", "Shosh", "Lagman", "Diyor", "Zafar", "Lazzat", "Istanbul")
+CATEGORY_NAMES = ("Milliy taomlar", "Shashlik", "Somsa", "Salatlar", "Sho'rvalar", "Fast food",
+                  "Pitsa", "Ichimliklar", "Shirinliklar", "Nonushta", "Baliq", "Garnir")
+FOOD_WORDS = ("Osh", "Lag'mon", "Manti", "Chuchvara", "Norin", "Qozon kabob", "Dimlama", "Mastava",
+              "Sho'rva", "Shashlik", "Somsa", "Burger", "Lavash", "Pitsa", "Achchiq-chuchuk", "Choy")
+ADDRESS_NAMES = ("Uy", "Ish", "Ota-onam", "Do'stim", "Ofis", "Dacha")
+# Most history is delivered; the newest orders are still moving
+FINAL_STATUSES = (("completed", 0.9), ("cancelled", 0.1))
+RECENT_STATUSES = ("pending", "accepted", "delivering", "arrived")
+
+
+def _dsn() -> str:
+    return f"postgresql://{Config.DB_USER}:{Config.DB_PASSWORD}@{Config.DB_HOST}/{Config.DB_NAME}"
+
+
+def _near_center(rng: random.Random, max_km: float) -> tuple[float, float]:
+    """A point within max_km of the city center, roughly uniform over the disc"""
+    distance = max_km * rng.random() ** 0.5
+    bearing = rng.uniform(0, 2 * pi)
+    latitude = Config.CITY_CENTER_LATITUDE + distance * cos(bearing) / 111.32
+    longitude = Config.CITY_CENTER_LONGITUDE + distance * sin(bearing) / (
+        111.32 * cos(radians(Config.CITY_CENTER_LATITUDE))
+    )
+    return round(latitude, 6), round(longitude, 6)
+
+
+class SeedData:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.until = datetime.combine(args.until, day_time())
+        self.start = self.until - timedelta(days=365 * args.years)
+        self.next_ids = {}
+        self.counts = {}
+        # Filled as the catalog is generated and read by carts and orders
+        self.restaurants = []  # (id, delivery_cost)
+        self.foods_by_restaurant = {}  # restaurant_id -> [(food_id, price)]
+        self.users = []  # (id, telegram_id, created_at, phone, [(lat, lon)])
+        self.courier_ids = []
+
+    def _ids(self, table: str, count: int) -> range:
+        first = self.next_ids[table]
+        self.next_ids[table] = first + count
+        return range(first, first + count)
+
+    async def _copy(self, connection, table: str, columns: tuple, records: list):
+        if not records:
+            return
+        await connection.copy_records_to_table(table, records=records, columns=columns)
+        self.counts[table] = self.counts.get(table, 0) + len(records)
+
+    async def run(self, connection):
+        for table in TABLES:
+            self.next_ids[table] = await connection.fetchval(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {table}")
+
+        steps = (
+            ("catalog", self._catalog),
+            ("users", self._users),
+            ("carts", self._carts),
+            ("couriers", self._couriers),
+            ("orders", self._orders),
+        )
+        for name, step in steps:
+            started = time.perf_counter()
+            before = sum(self.counts.values())
+            await step(connection)
+            elapsed = time.perf_counter() - started
+            rows = sum(self.counts.values()) - before
+            print(f"{name:<10}{rows:>12,} rows {elapsed:>8.2f} s {rows / max(elapsed, 1e-9):>12,.0f} rows/s")
+
+    async def _catalog(self, connection):
+        rng = self.rng
+        restaurants, categories, foods = [], [], []
+        for restaurant_id in self._ids("restaurants", self.args.restaurants):
+            latitude, longitude = _near_center(rng, Config.MAX_DISTANCE_KM * 0.8)
+            # A few places work through the night
+            opens = day_time(rng.choice((8, 9, 10, 11, 18)))
+            closes = day_time(rng.choice((2, 3))) if opens.hour == 18 else day_time(rng.choice((21, 22, 23)))
+            delivery_cost = rng.choice((0, 5000, 8000, 10000, 12000))
+            restaurants.append((
+                restaurant_id, f"{rng.choice(RESTAURANT_WORDS)} {restaurant_id}",
+                f"Seed restaurant {restaurant_id}", f"seed_{restaurant_id % 20}.jpg",
+                -1_000_000_000_000 - restaurant_id, -2_000_000_000_000 - restaurant_id,
+                SEED_TELEGRAM_ID - restaurant_id, rng.random() > 0.05,
+                latitude, longitude, opens, closes, float(delivery_cost)
+            ))
+            self.restaurants.append((restaurant_id, delivery_cost))
+            self.foods_by_restaurant[restaurant_id] = []
+
+            names = rng.sample(CATEGORY_NAMES, min(self.args.categories, len(CATEGORY_NAMES)))
+            for category_id, category_name in zip(self._ids("categories", len(names)), names):
+                categories.append((category_id, category_name, restaurant_id, True))
+                for food_id in self._ids("foods", self.args.foods):
+                    price = float(rng.randrange(8, 120) * 1000)
+                    foods.append((
+                        food_id, f"{rng.choice(FOOD_WORDS)} {food_id}", "Seed taom",
+                        f"seed_{food_id % 50}.jpg", price, restaurant_id, category_id,
+                        rng.random() > 0.03
+                    ))
+                    self.foods_by_restaurant[restaurant_id].append((food_id, price))
+
+        # updated_at is left to its now() default, so a running bot's catalog
+        # refresh picks the rows up past its watermark
+        await self._copy(connection, "restaurants", (
+            "id", "name", "description", "image", "restaurant_chat_id", "delivery_chat_id",
+            "admin_telegram_id", "is_active", "latitude", "longitude", "startwork", "endwork",
+            "delivery_cost"
+        ), restaurants)
+        await self._copy(connection, "categories", ("id", "name", "restaurant_id", "is_active"), categories)
+        await self._copy(connection, "foods", (
+            "id", "name", "description", "image", "price", "restaurant_id", "category_id",
+            "is_active"
+        ), foods)
+
+    async def _users(self, connection):
+        rng = self.rng
+        span = (self.until - self.start).total_seconds()
+        users, addresses = [], []
+        for user_id in self._ids("users", self.args.users):
+            created_at = self.start + timedelta(seconds=rng.random() * span)
+            phone = f"+99890{rng.randrange(10_000_000):07d}"
+            telegram_id = SEED_TELEGRAM_ID + user_id
+            users.append((user_id, telegram_id, f"seed{user_id}", phone, created_at))
+
+            places = []
+            names = rng.sample(ADDRESS_NAMES, rng.randint(0, self.args.max_addresses))
+            for address_id, name in zip(self._ids("addresses", len(names)), names):
+                latitude, longitude = _near_center(rng, Config.MAX_DISTANCE_KM)
+                addresses.append((address_id, user_id, name, latitude, longitude, not places, created_at))
+                places.append((latitude, longitude))
+            self.users.append((user_id, telegram_id, created_at, phone, places))
+
+            if len(users) >= BATCH_SIZE:
+                await self._flush_users(connection, users, addresses)
+                users, addresses = [], []
+        await self._flush_users(connection, users, addresses)
+
+    async def _flush_users(self, connection, users: list, addresses: list):
+        await self._copy(connection, "users", ("id", "telegram_id", "full_name", "phone_number", "created_at"), users)
+        await self._copy(connection, "addresses", (
+            "id", "user_id", "address_name", "latitude", "longitude", "is_default", "created_at"
+        ), addresses)
+
+    async def _carts(self, connection):
+        rng = self.rng
+        rows = []
+        for user in rng.sample(self.users, min(self.args.cart_users, len(self.users))):
+            restaurant_id, _ = rng.choice(self.restaurants)
+            menu = self.foods_by_restaurant[restaurant_id]
+            chosen = rng.sample(menu, min(rng.randint(1, 5), len(menu)))
+            for cart_id, (food_id, _) in zip(self._ids("cart", len(chosen)), chosen):
+                rows.append((cart_id, user[0], food_id, rng.randint(1, 4)))
+        await self._copy(connection, "cart", ("id", "user_id", "food_id", "quantity"), rows)
+
+    async def _couriers(self, connection):
+        rows = []
+        for courier_id in self._ids("delivery_persons", self.args.couriers):
+            rows.append((
+                courier_id, SEED_TELEGRAM_ID - 100_000 - courier_id, f"Kuryer {courier_id}",
+                f"+99891{self.rng.randrange(10_000_000):07d}", False
+            ))
+            self.courier_ids.append(courier_id)
+        await self._copy(connection, "delivery_persons", ("id", "telegram_id", "name", "phone_number", "busy"), rows)
+
+    async def _orders(self, connection):
+        rng = self.rng
+        orders, items = [], []
+        recent = self.until - timedelta(hours=2)
+        statuses, weights = zip(*FINAL_STATUSES)
+        for user_id, _, joined, phone, places in self.users:
+            active_days = (self.until - joined).total_seconds() / 86400
+            expected = self.args.orders_per_year * active_days / 365
+            count = int(rng.expovariate(1 / expected)) if expected > 0 else 0
+            for order_id in self._ids("orders", count):
+                created_at = joined + timedelta(days=rng.random() * active_days)
+                restaurant_id, delivery_cost = rng.choice(self.restaurants)
+                menu = self.foods_by_restaurant[restaurant_id]
+                chosen = rng.sample(menu, min(rng.randint(1, self.args.max_items), len(menu)))
+                total = float(delivery_cost)
+                for item_id, (food_id, price) in zip(self._ids("order_items", len(chosen)), chosen):
+                    quantity = rng.randint(1, 3)
+                    total += price * quantity
+                    items.append((item_id, order_id, food_id, quantity, price, "pending"))
+
+                if created_at >= recent:
+                    status = rng.choice(RECENT_STATUSES)
+                else:
+                    status = rng.choices(statuses, weights)[0]
+                courier = rng.choice(self.courier_ids) if self.courier_ids and status in (
+                    "delivering", "arrived", "completed"
+                ) else None
+                latitude, longitude = rng.choice(places) if places else _near_center(rng, Config.MAX_DISTANCE_KM)
+                orders.append((
+                    order_id, user_id, status, total, phone,
+                    "Mijoz bekor qildi" if status == "cancelled" else None,
+                    latitude, longitude, created_at,
+                    created_at + timedelta(minutes=rng.randint(20, 90)) if status == "completed" else created_at,
+                    restaurant_id, courier
+                ))
+
+            if len(orders) >= BATCH_SIZE:
+                await self._flush_orders(connection, orders, items)
+                orders, items = [], []
+        await self._flush_orders(connection, orders, items)
+
+    async def _flush_orders(self, connection, orders: list, items: list):
+        await self._copy(connection, "orders", (
+            "id", "user_id", "status", "total", "phone_number", "cancellation_reason",
+            "latitude", "longitude", "created_at", "updated_at", "restaurant_id", "active_delivery_person_id"
+        ), orders)
+        await self._copy(connection, "order_items",
+                         ("id", "order_id", "food_id", "quantity", "price", "status"), items)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--restaurants", type=int, default=60)
+    parser.add_argument("--categories", type=int, default=8, help="per restaurant")
+    parser.add_argument("--foods", type=int, default=12, help="per category")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--max-addresses", type=int, default=3)
+    parser.add_argument("--cart-users", type=int, default=20_000, help="users with a non-empty cart")
+    parser.add_argument("--couriers", type=int, default=300)
+    parser.add_argument("--years", type=float, default=3)
+    parser.add_argument("--orders-per-year", type=float, default=12, help="average per user")
+    parser.add_argument("--max-items", type=int, default=4, help="per order")
+    parser.add_argument("--until", type=date.fromisoformat, default=date.today(),
+                        help="newest timestamp; fix it to reproduce a dataset on another day")
+    parser.add_argument("--truncate", action="store_true")
+    args = parser.parse_args()
+
+    connection = await asyncpg.connect(_dsn())
+    try:
+        if args.truncate:
+            await connection.execute(f"TRUNCATE {', '.join(TABLES)} RESTART IDENTITY CASCADE")
+
+        seed_data = SeedData(args)
+        started = time.perf_counter()
+        async with connection.transaction():
+            await seed_data.run(connection)
+
+        for table in TABLES:
+            await connection.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"(SELECT COALESCE(MAX(id), 0) + 1 FROM {table}), false)"
+            )
+            await connection.execute(f"ANALYZE {table}")
+        elapsed = time.perf_counter() - started
+    finally:
+        await connection.close()
+
+    total = sum(seed_data.counts.values())
+    for table in TABLES:
+        print(f"  {table:<18}{seed_data.counts.get(table, 0):>12,}")
+    print(f"{total:,} rows in {elapsed:.1f} s ({total / elapsed:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,138 @@
+"""
+Drive the webhook entry point end to end against a local fake Telegram server.
+
+Usage:
+    python -m benchmarks.webhook_smoke [--updates 2000] [--concurrency 100]
+                                       [--queue-size 1000] [--workers 16]
+
+A fake Bot API answers every method on 127.0.0.1, the bot is pointed at it,
+and the script posts "back to menu" updates from distinct users to the
+webhook. It reports how many were accepted or rejected with 503, and how
+long it took until the fake server had received every reply. The database
+must be reachable because the user identity middleware queries it.
+"""
+import argparse
+import asyncio
+import time
+from aiohttp import ClientSession, web
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.fsm.storage.memory import MemoryStorage
+from core.webhook import SECRET_HEADER, WebhookServer
+from database.db import db
+from main import create_dispatcher
+
+FAKE_TOKEN = "123456:FAKE-TOKEN"
+SECRET = "smoke-secret"
+HOST = "127.0.0.1"
+
+
+class FakeTelegram:
+    """Minimal Bot API that records sendMessage calls"""
+
+    def __init__(self):
+        self.sent = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        payload = await request.post()
+
+        if method == "sendMessage":
+            self.sent += 1
+            return web.json_response({"ok": True, "result": {
+                "message_id": self.sent,
+                "date": int(time.time()),
+                "chat": {"id": int(payload["chat_id"]), "type": "private"},
+                "text": payload.get("text", "")
+            }})
+
+        return web.json_response({"ok": True, "result": True})
+
+
+def make_update(update_id: int, user_id: int) -> dict:
+    user = {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"}
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": user,
+            "text": "⬅️ Orqaga"
+        }
+    }
+
+
+async def post_updates(url: str, updates: list, concurrency: int) -> tuple[int, int]:
+    accepted = 0
+    rejected = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with ClientSession() as client:
+        async def post(update):
+            nonlocal accepted, rejected
+            async with semaphore:
+                async with client.post(url, json=update, headers={SECRET_HEADER: SECRET}) as response:
+                    if response.status == 200:
+                        accepted += 1
+                    else:
+                        rejected += 1
+
+        await asyncio.gather(*(post(update) for update in updates))
+
+    return accepted, rejected
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--queue-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--api-port", type=int, default=18081)
+    parser.add_argument("--webhook-port", type=int, default=18080)
+    args = parser.parse_args()
+
+    fake = FakeTelegram()
+    api_app = web.Application()
+    api_app.router.add_post("/bot{token}/{method}", fake.handle)
+    api_runner = web.AppRunner(api_app)
+    await api_runner.setup()
+    await web.TCPSite(api_runner, HOST, args.api_port).start()
+
+    session = AiohttpSession(api=TelegramAPIServer.from_base(f"http://{HOST}:{args.api_port}"))
+    bot = Bot(token=FAKE_TOKEN, session=session)
+    server = WebhookServer(
+        create_dispatcher(MemoryStorage()),
+        bot,
+        secret_token=SECRET,
+        queue_size=args.queue_size,
+        workers=args.workers
+    )
+
+    await db.connect()
+    try:
+        await server.start(HOST, args.webhook_port)
+
+        updates = [make_update(i, 10_000_000 + i) for i in range(1, args.updates + 1)]
+        started = time.perf_counter()
+        accepted, rejected = await post_updates(
+            f"http://{HOST}:{args.webhook_port}/webhook", updates, args.concurrency
+        )
+        deadline = time.perf_counter() + 60
+        while fake.sent < accepted and time.perf_counter() < deadline:
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - started
+
+        print(f"accepted={accepted} rejected={rejected} replies={fake.sent}")
+        print(f"elapsed={elapsed:.2f} s throughput={fake.sent / elapsed:.0f} updates/s")
+    finally:
+        await server.stop()
+        await bot.session.close()
+        await api_runner.cleanup()
+        await db.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -19,14 +19,109 @@ class Config:
         print(f"Configuration error: {e}")
         sys.exit(1)
 
-    CITY_CENTER_LATITUDE = 38.2758164
-    CITY_CENTER_LONGITUDE = 67.894829
+    # City delivery area: addresses farther than this from the center are refused.
+    # Restaurants can narrow it with their own delivery_radius_km or delivery_zone
+    CITY_CENTER_LATITUDE = env.float("CITY_CENTER_LATITUDE", 38.2758164)
+    CITY_CENTER_LONGITUDE = env.float("CITY_CENTER_LONGITUDE", 67.894829)
+    MAX_DISTANCE_KM = env.float("MAX_DISTANCE_KM", 6)
 
-    MAX_DISTANCE_KM = 6
+    # Local time of the restaurants' opening hours and holidays
+    TIMEZONE = env.str("TIMEZONE", "Asia/Tashkent")
+
+    # Database connection pool
+    DB_POOL_SIZE = env.int("DB_POOL_SIZE", 20)
+    DB_MAX_OVERFLOW = env.int("DB_MAX_OVERFLOW", 10)
+    DB_POOL_TIMEOUT_SECONDS = env.float("DB_POOL_TIMEOUT_SECONDS", 30)
+    DB_POOL_RECYCLE_SECONDS = env.int("DB_POOL_RECYCLE_SECONDS", 1800)
+    DB_POOL_PRE_PING = env.bool("DB_POOL_PRE_PING", True)
+    DB_STATEMENT_TIMEOUT_MS = env.int("DB_STATEMENT_TIMEOUT_MS", 15000)
+    # Prepared statements kept per connection by the asyncpg dialect
+    DB_PREPARED_STATEMENT_CACHE_SIZE = env.int("DB_PREPARED_STATEMENT_CACHE_SIZE", 500)
+    # Adaptive mode resizes max_overflow from peak concurrency every interval
+    DB_POOL_ADAPTIVE = env.bool("DB_POOL_ADAPTIVE", False)
+    DB_POOL_ADAPT_INTERVAL_SECONDS = env.float("DB_POOL_ADAPT_INTERVAL_SECONDS", 30)
+    DB_POOL_MAX_CONNECTIONS = env.int("DB_POOL_MAX_CONNECTIONS", 60)
+    DB_POOL_HEADROOM = env.float("DB_POOL_HEADROOM", 1.25)
+
+    # Prometheus /metrics and /health; 0 disables the server
+    METRICS_HOST = env.str("METRICS_HOST", "127.0.0.1")
+    METRICS_PORT = env.int("METRICS_PORT", 0)
+
+    # Per-statement timing attributed to the calling function; slower statements
+    # are logged with redacted parameters and the slowest kept for /slow-queries
+    QUERY_TRACING = env.bool("QUERY_TRACING", True)
+    SLOW_QUERY_MS = env.float("SLOW_QUERY_MS", 200)  # 0 disables the log
+    SLOW_QUERY_TOP_N = env.int("SLOW_QUERY_TOP_N", 20)
+    SLOW_QUERY_WINDOW_SECONDS = env.float("SLOW_QUERY_WINDOW_SECONDS", 3600)
+
+    # Updates taking longer than this are logged with their db/api/python split; 0 disables
+    SLOW_UPDATE_MS = env.float("SLOW_UPDATE_MS", 1000)
+
+    # How often the in-memory menu catalog picks up changed rows
+    CATALOG_REFRESH_SECONDS = env.float("CATALOG_REFRESH_SECONDS", 30)
+
+    # telegram_id -> users.id identity cache
+    USER_CACHE_SIZE = env.int("USER_CACHE_SIZE", 10000)
+    USER_CACHE_TTL_SECONDS = env.float("USER_CACHE_TTL_SECONDS", 600)
+    USER_CACHE_MISS_TTL_SECONDS = env.float("USER_CACHE_MISS_TTL_SECONDS", 5)
+
+    # FSM storage backend: "postgres", "redis" or "memory" (single process only)
+    FSM_STORAGE = env.str("FSM_STORAGE", "postgres")
+    REDIS_URL = env.str("REDIS_URL", "redis://localhost:6379/0")
+    FSM_TTL_SECONDS = env.int("FSM_TTL_SECONDS", 7 * 24 * 3600)
+    # Postgres FSM writes go through at once; a read cache or deferred flush
+    # (seconds, 0 disables) is only safe with a single worker
+    FSM_CACHE_TTL_SECONDS = env.float("FSM_CACHE_TTL_SECONDS", 0)
+    FSM_FLUSH_INTERVAL_SECONDS = env.float("FSM_FLUSH_INTERVAL_SECONDS", 0)
+    # Failed FSM writes are retried after this, doubling up to the maximum
+    FSM_RETRY_SECONDS = env.float("FSM_RETRY_SECONDS", 1)
+    FSM_MAX_RETRY_SECONDS = env.float("FSM_MAX_RETRY_SECONDS", 60)
+
+    # Update intake: "polling" or "webhook"
+    BOT_MODE = env.str("BOT_MODE", "polling")
+    WEBHOOK_URL = env.str("WEBHOOK_URL", "")  # public base URL, e.g. https://bot.example.com
+    WEBHOOK_PATH = env.str("WEBHOOK_PATH", "/webhook")
+    WEBHOOK_SECRET = env.str("WEBHOOK_SECRET", "")
+    WEBHOOK_HOST = env.str("WEBHOOK_HOST", "127.0.0.1")
+    WEBHOOK_PORT = env.int("WEBHOOK_PORT", 8080)
+    WEBHOOK_REUSE_PORT = env.bool("WEBHOOK_REUSE_PORT", False)  # several processes on one port
+    WEBHOOK_SET_ON_START = env.bool("WEBHOOK_SET_ON_START", True)
+    WEBHOOK_QUEUE_SIZE = env.int("WEBHOOK_QUEUE_SIZE", 1000)
+    WEBHOOK_WORKERS = env.int("WEBHOOK_WORKERS", 16)
+
+    # Food card stepper: edit the caption once taps pause this long
+    STEPPER_DEBOUNCE_SECONDS = env.float("STEPPER_DEBOUNCE_SECONDS", 0.4)
+
+    # Courier dispatch: accepted orders are offered to the nearest free courier
+    # sharing a live location, one at a time, before the delivery group sees them
+    DISPATCH_ENABLED = env.bool("DISPATCH_ENABLED", True)
+    DISPATCH_OFFER_TIMEOUT_SECONDS = env.float("DISPATCH_OFFER_TIMEOUT_SECONDS", 45)
+    # How often an offer checks for a decline that reached another process
+    DISPATCH_OFFER_POLL_SECONDS = env.float("DISPATCH_OFFER_POLL_SECONDS", 2)
+    DISPATCH_MAX_OFFERS = env.int("DISPATCH_MAX_OFFERS", 3)
+    DISPATCH_MAX_DISTANCE_KM = env.float("DISPATCH_MAX_DISTANCE_KM", 10)
+    DISPATCH_CANDIDATES = env.int("DISPATCH_CANDIDATES", 10)
+    DISPATCH_GRID_CELL_KM = env.float("DISPATCH_GRID_CELL_KM", 1)
+    COURIER_LOCATION_TTL_SECONDS = env.float("COURIER_LOCATION_TTL_SECONDS", 300)
+
+    # Notification outbox dispatcher; Telegram allows ~30 msg/s overall,
+    # ~1 msg/s per private chat and 20 msg/min per group
+    NOTIFY_GLOBAL_RATE = env.float("NOTIFY_GLOBAL_RATE", 25)
+    NOTIFY_CHAT_RATE = env.float("NOTIFY_CHAT_RATE", 1)
+    NOTIFY_GROUP_RATE_PER_MINUTE = env.float("NOTIFY_GROUP_RATE_PER_MINUTE", 20)
+    NOTIFY_BATCH_SIZE = env.int("NOTIFY_BATCH_SIZE", 100)
+    NOTIFY_POLL_SECONDS = env.float("NOTIFY_POLL_SECONDS", 1)
+    NOTIFY_LEASE_SECONDS = env.float("NOTIFY_LEASE_SECONDS", 60)
+    NOTIFY_MAX_WAIT_SECONDS = env.float("NOTIFY_MAX_WAIT_SECONDS", 5)
+    NOTIFY_MAX_ATTEMPTS = env.int("NOTIFY_MAX_ATTEMPTS", 8)
+    NOTIFY_BACKOFF_SECONDS = env.float("NOTIFY_BACKOFF_SECONDS", 2)
+    NOTIFY_MAX_BACKOFF_SECONDS = env.float("NOTIFY_MAX_BACKOFF_SECONDS", 300)
 
     @classmethod
     def validate(cls):
         if not cls.BOT_TOKEN:
             raise ValueError("Bot token is required")
         if not all([cls.DB_HOST, cls.DB_USER, cls.DB_NAME]):
-            raise ValueError("Database configuration is incomplete")
\ No newline at end of file
+            raise ValueError("Database configuration is incomplete")
+        if cls.BOT_MODE == "webhook" and cls.WEBHOOK_SET_ON_START and not cls.WEBHOOK_URL:
+            raise ValueError("WEBHOOK_URL is required to register the webhook")
\ No newline at end of file
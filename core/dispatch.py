@@ -0,0 +1,388 @@
+import asyncio
+from collections import namedtuple
+import logging
+import time
+from typing import Optional
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from config import Config
+from core.bot import get_bot
+from core.metrics import registry
+from core.outbox import outbox, outbox_message
+from database.db import db
+from database.queries import register
+from utils.cache import TTLCache
+from utils.spatial import GridIndex
+
+OFFERS = registry.counter("dispatch_offers_total", "Exclusive courier offers by outcome", ("outcome",))
+DISPATCHES = registry.counter("dispatch_orders_total", "Accepted orders by how a courier was found", ("result",))
+COURIERS_TRACKED = registry.gauge("dispatch_couriers_tracked", "Couriers with a known live location")
+
+# Free couriers among the candidates: not marked busy and not carrying an order
+AVAILABLE_COURIERS = register("available_couriers", """
+    SELECT dp.telegram_id
+    FROM delivery_persons dp
+    WHERE dp.telegram_id = ANY(CAST(:telegram_ids AS BIGINT[]))
+    AND NOT COALESCE(dp.busy, false)
+    AND NOT EXISTS (
+        SELECT 1 FROM orders o
+        WHERE o.active_delivery_person_id = dp.id
+        AND o.status IN ('delivering', 'arrived')
+    )
+    AND NOT EXISTS (
+        SELECT 1 FROM delivery_offers dof
+        WHERE dof.courier_telegram_id = dp.telegram_id
+        AND dof.status = 'pending'
+        AND dof.offered_at > NOW() - make_interval(secs => CAST(:offer_timeout AS FLOAT))
+    )
+""")
+
+# Offers are recorded so a courier's answer counts whichever process gets it
+CREATE_OFFER = register("create_delivery_offer", """
+    INSERT INTO delivery_offers (order_id, courier_telegram_id, status, offered_at)
+    VALUES (:order_id, :courier_id, 'pending', NOW())
+    ON CONFLICT (order_id, courier_telegram_id) DO UPDATE SET
+        status = 'pending',
+        offered_at = NOW(),
+        answered_at = NULL
+""")
+
+ANSWER_OFFER = register("answer_delivery_offer", """
+    UPDATE delivery_offers
+    SET status = :status, answered_at = NOW()
+    WHERE order_id = :order_id AND courier_telegram_id = :courier_id
+    AND status = 'pending'
+    RETURNING order_id
+""")
+
+OFFER_STATUS = register("delivery_offer_status", """
+    SELECT dof.status, o.active_delivery_person_id IS NOT NULL AS assigned
+    FROM delivery_offers dof
+    JOIN orders o ON o.id = dof.order_id
+    WHERE dof.order_id = :order_id AND dof.courier_telegram_id = :courier_id
+""")
+
+IS_COURIER = register("is_courier", """
+    SELECT 1 FROM delivery_persons WHERE telegram_id = :telegram_id
+""")
+
+ORDER_ASSIGNED = register("order_assigned", """
+    SELECT active_delivery_person_id IS NOT NULL AS assigned
+    FROM orders
+    WHERE id = :order_id
+""")
+
+# What the restaurant acceptance hands over: where the courier has to go
+# first, the order card and the group that gets it if no courier takes it
+DispatchRequest = namedtuple('DispatchRequest', 'order_id latitude longitude text group_chat_id')
+
+
+class _Offer:
+    __slots__ = ("courier_id", "answer")
+
+    def __init__(self, courier_id: int):
+        self.courier_id = courier_id
+        self.answer = asyncio.get_running_loop().create_future()
+
+
+class CourierDispatcher:
+    """
+    Offers each accepted order to the nearest free courier before anyone else.
+
+    Couriers are tracked from the live location they share with the bot, in
+    a grid index keyed by telegram_id. An offer goes to one courier at a time
+    and waits DISPATCH_OFFER_TIMEOUT_SECONDS for an answer. After a decline,
+    a timeout or DISPATCH_MAX_OFFERS tries, the order goes to the restaurant's
+    delivery group as before, where the first tap wins.
+
+    Positions live in this process only. With several webhook processes a
+    courier is known to the process that received their last location, and
+    orders without a known courier nearby are broadcast. Offers are also
+    kept in delivery_offers: a decline that reaches another process is
+    recorded there, and the offering process polls for it every
+    DISPATCH_OFFER_POLL_SECONDS.
+    """
+
+    def __init__(self):
+        self.locations = GridIndex(Config.DISPATCH_GRID_CELL_KM, Config.CITY_CENTER_LATITUDE)
+        self._seen = {}  # telegram_id -> monotonic time of the last location
+        self._couriers = TTLCache(maxsize=10000, ttl=300)
+        self._offers = {}  # order_id -> _Offer
+        self._tasks = set()
+
+    async def is_courier(self, telegram_id: int) -> bool:
+        known = self._couriers.get(telegram_id)
+        if known is not None:
+            return known
+
+        session = await db.get_session()
+        try:
+            result = await IS_COURIER.execute(session, {"telegram_id": telegram_id})
+            known = result.fetchone() is not None
+        finally:
+            await session.close()
+
+        self._couriers.set(telegram_id, known)
+        return known
+
+    def update_location(self, telegram_id: int, latitude: float, longitude: float):
+        self.locations.update(telegram_id, latitude, longitude)
+        self._seen[telegram_id] = time.monotonic()
+        COURIERS_TRACKED.set(len(self.locations))
+
+    def forget(self, telegram_id: int):
+        self.locations.remove(telegram_id)
+        self._seen.pop(telegram_id, None)
+        COURIERS_TRACKED.set(len(self.locations))
+
+    def start(self, request: DispatchRequest):
+        """Dispatch in the background; call after the acceptance is committed"""
+        task = asyncio.create_task(self._dispatch(request))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def resolve(self, order_id: int, courier_id: int, accepted: bool) -> bool:
+        """Answer a pending offer made here; False if the courier holds no offer for the order in this process"""
+        offer = self._offers.get(order_id)
+        if not offer or offer.courier_id != courier_id or offer.answer.done():
+            return False
+        offer.answer.set_result(accepted)
+        return True
+
+    async def decline(self, order_id: int, courier_id: int) -> bool:
+        """Record a courier's decline for whichever process made the offer; False if none was pending"""
+        session = await db.get_session()
+        try:
+            result = await ANSWER_OFFER.execute(session, {
+                "order_id": order_id,
+                "courier_id": courier_id,
+                "status": "declined"
+            })
+            recorded = result.fetchone() is not None
+            await session.commit()
+        finally:
+            await session.close()
+
+        return self.resolve(order_id, courier_id, False) or recorded
+
+    async def close(self):
+        """Stop dispatching; orders still being offered go to their delivery group"""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _dispatch(self, request: DispatchRequest):
+        try:
+            if Config.DISPATCH_ENABLED and request.latitude is not None and request.longitude is not None:
+                declined = set()
+                for _ in range(Config.DISPATCH_MAX_OFFERS):
+                    courier = await self._next_courier(request, declined)
+                    if courier is None:
+                        break
+
+                    courier_id, distance = courier
+                    outcome = await self._offer(request, courier_id, distance)
+                    OFFERS.inc(outcome=outcome)
+                    if outcome == "accepted":
+                        DISPATCHES.inc(result="offer")
+                        return
+                    declined.add(courier_id)
+
+            await self._broadcast(request)
+
+        except asyncio.CancelledError:
+            # Shutting down mid-offer: leave the order with the group rather than nobody
+            await self._broadcast(request)
+            raise
+        except Exception as e:
+            logging.error(f"Error dispatching order {request.order_id}: {e}")
+            await self._broadcast(request)
+
+    async def _next_courier(self, request: DispatchRequest, declined: set) -> Optional[tuple[int, float]]:
+        """Closest free courier with a fresh location, as (telegram_id, distance_km)"""
+        now = time.monotonic()
+        for telegram_id, seen in list(self._seen.items()):
+            if now - seen > Config.COURIER_LOCATION_TTL_SECONDS:
+                self.forget(telegram_id)
+
+        offered = {offer.courier_id for offer in self._offers.values()}
+        candidates = self.locations.nearest(
+            request.latitude,
+            request.longitude,
+            limit=Config.DISPATCH_CANDIDATES,
+            max_km=Config.DISPATCH_MAX_DISTANCE_KM,
+            accept=lambda telegram_id: telegram_id not in declined and telegram_id not in offered
+        )
+        if not candidates:
+            return None
+
+        session = await db.get_session()
+        try:
+            result = await AVAILABLE_COURIERS.execute(session, {
+                "telegram_ids": [telegram_id for telegram_id, _ in candidates],
+                "offer_timeout": Config.DISPATCH_OFFER_TIMEOUT_SECONDS
+            })
+            available = {row.telegram_id for row in result.fetchall()}
+        finally:
+            await session.close()
+
+        for telegram_id, distance in candidates:
+            if telegram_id in available:
+                return telegram_id, distance
+        return None
+
+    async def _offer(self, request: DispatchRequest, courier_id: int, distance: float) -> str:
+        """Offer the order to one courier; returns accepted, declined, timeout or failed"""
+        bot = get_bot()
+        offer = _Offer(courier_id)
+        self._offers[request.order_id] = offer
+        outcome = "failed"
+        try:
+            await self._record_offer(request.order_id, courier_id)
+            try:
+                message = await bot.send_message(
+                    chat_id=courier_id,
+                    text=f"{request.text}\n\n📏 Restorangacha: {distance:.1f} km",
+                    reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+                        [InlineKeyboardButton(
+                            text="✅ Qabul qilish",
+                            callback_data=f"accept_delivery_{request.order_id}"
+                        )],
+                        [InlineKeyboardButton(
+                            text="❌ Rad etish",
+                            callback_data=f"decline_delivery_{request.order_id}"
+                        )]
+                    ])
+                )
+            except Exception as e:
+                logging.error(f"Error offering order {request.order_id} to courier {courier_id}: {e}")
+                return "failed"
+
+            accepted = await self._wait_answer(request.order_id, offer)
+            if accepted:
+                outcome = "accepted"
+                return outcome
+            if accepted is False:
+                outcome = "declined"
+                return outcome
+
+            # The answer may have reached another process
+            if await self._assigned(request.order_id):
+                outcome = "accepted"
+                return outcome
+
+            try:
+                await bot.edit_message_text(
+                    chat_id=courier_id,
+                    message_id=message.message_id,
+                    text=f"{request.text}\n\n⌛ Taklif vaqti tugadi.",
+                    reply_markup=None
+                )
+            except Exception as e:
+                logging.error(f"Error closing offer for order {request.order_id}: {e}")
+            outcome = "timeout"
+            return outcome
+        finally:
+            self._offers.pop(request.order_id, None)
+            await self._close_offer(request.order_id, courier_id, outcome)
+
+    async def _wait_answer(self, order_id: int, offer: _Offer) -> Optional[bool]:
+        """
+        The courier's answer, or None on timeout. Answers given here resolve
+        the offer at once; those recorded by another process are polled for.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + Config.DISPATCH_OFFER_TIMEOUT_SECONDS
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return None
+            try:
+                return await asyncio.wait_for(
+                    asyncio.shield(offer.answer), min(remaining, Config.DISPATCH_OFFER_POLL_SECONDS)
+                )
+            except asyncio.TimeoutError:
+                pass
+
+            session = await db.get_session()
+            try:
+                result = await OFFER_STATUS.execute(session, {
+                    "order_id": order_id,
+                    "courier_id": offer.courier_id
+                })
+                row = result.fetchone()
+            finally:
+                await session.close()
+
+            if row and row.assigned:
+                return True
+            if row and row.status == "declined":
+                return False
+
+    async def _record_offer(self, order_id: int, courier_id: int):
+        session = await db.get_session()
+        try:
+            await CREATE_OFFER.execute(session, {"order_id": order_id, "courier_id": courier_id})
+            await session.commit()
+        finally:
+            await session.close()
+
+    async def _close_offer(self, order_id: int, courier_id: int, outcome: str):
+        """Mark an offer that is still pending with how it ended"""
+        try:
+            session = await db.get_session()
+            try:
+                await ANSWER_OFFER.execute(session, {
+                    "order_id": order_id,
+                    "courier_id": courier_id,
+                    "status": outcome
+                })
+                await session.commit()
+            finally:
+                await session.close()
+        except Exception as e:
+            logging.error(f"Error closing offer record for order {order_id}: {e}")
+
+    async def _assigned(self, order_id: int) -> bool:
+        session = await db.get_session()
+        try:
+            result = await ORDER_ASSIGNED.execute(session, {"order_id": order_id})
+            row = result.fetchone()
+            return bool(row and row.assigned)
+        finally:
+            await session.close()
+
+    async def _broadcast(self, request: DispatchRequest):
+        """Post the order to the delivery group unless a courier already has it"""
+        try:
+            if await self._assigned(request.order_id):
+                return
+            if not request.group_chat_id:
+                logging.error(f"Order {request.order_id} has no delivery group to fall back to")
+                return
+
+            session = await db.get_session()
+            try:
+                await outbox.enqueue(session, [
+                    outbox_message(
+                        chat_id=request.group_chat_id,
+                        message_text=request.text,
+                        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+                            [InlineKeyboardButton(
+                                text="✅ Qabul qilish",
+                                callback_data=f"accept_delivery_{request.order_id}"
+                            )]
+                        ])
+                    )
+                ])
+                await session.commit()
+            finally:
+                await session.close()
+
+            outbox.wake()
+            DISPATCHES.inc(result="broadcast")
+        except Exception as e:
+            logging.error(f"Error broadcasting order {request.order_id}: {e}")
+
+
+dispatcher = CourierDispatcher()
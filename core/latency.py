@@ -0,0 +1,151 @@
+"""
+Where an update's time goes.
+
+UpdateLatencyMiddleware gives every update an UpdateTimer. While the update
+runs, database time (pool waits, statements and the scope's commit) and
+Telegram API time (every request the bot makes) are added to its timer; the
+rest of the wall time is Python. The split is recorded per router and
+handler in the update_seconds HDR histogram on /metrics, and updates slower
+than SLOW_UPDATE_MS are logged with their breakdown.
+
+Only the task that started the update adds to its timer. Work it spawns,
+like courier dispatch or the outbox, is not part of the update's latency.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+import logging
+import time
+from typing import Optional
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from sqlalchemy import event
+from config import Config
+from core.metrics import registry
+
+UPDATE_LATENCY = registry.hdr_histogram(
+    "update_seconds", "Update handling time by router, handler and component", ("router", "handler", "component")
+)
+API_LATENCY = registry.hdr_histogram("telegram_api_seconds", "Telegram Bot API request time", ("method",))
+
+current_timer: ContextVar[Optional["UpdateTimer"]] = ContextVar("update_timer", default=None)
+
+
+def _current_task():
+    try:
+        return asyncio.current_task()
+    except RuntimeError:
+        return None
+
+
+class UpdateTimer:
+    def __init__(self):
+        self._owner = _current_task()
+        self.started = time.perf_counter()
+        self.db = 0.0
+        self.api = 0.0
+        self.router = "none"
+        self.handler = "unhandled"
+        # Statements inside a timed commit are not counted twice
+        self._db_depth = 0
+        self._db_started = 0.0
+
+    def owned(self) -> bool:
+        return self._owner is not None and _current_task() is self._owner
+
+    def label(self, handler_object):
+        """Name the handler the update reached, from aiogram's HandlerObject"""
+        callback = getattr(handler_object, "callback", None)
+        if callback is not None:
+            self.router = getattr(callback, "__module__", None) or "none"
+            self.handler = getattr(callback, "__name__", None) or repr(callback)
+
+    def db_started(self):
+        if self._db_depth == 0:
+            self._db_started = time.perf_counter()
+        self._db_depth += 1
+
+    def db_finished(self):
+        if self._db_depth == 0:
+            return
+        self._db_depth -= 1
+        if self._db_depth == 0:
+            self.db += time.perf_counter() - self._db_started
+
+    def finish(self):
+        total = time.perf_counter() - self.started
+        python = max(total - self.db - self.api, 0.0)
+        for component, seconds in (("total", total), ("db", self.db), ("api", self.api), ("python", python)):
+            UPDATE_LATENCY.observe(seconds, router=self.router, handler=self.handler, component=component)
+
+        if Config.SLOW_UPDATE_MS and total * 1000 >= Config.SLOW_UPDATE_MS:
+            logging.warning(
+                f"Slow update in {self.router}.{self.handler}: {total * 1000:.0f} ms "
+                f"(db {self.db * 1000:.0f}, api {self.api * 1000:.0f}, python {python * 1000:.0f})"
+            )
+
+
+def _timer() -> Optional[UpdateTimer]:
+    timer = current_timer.get()
+    return timer if timer is not None and timer.owned() else None
+
+
+def add_db_time(seconds: float):
+    """Count time spent on the database outside a db_span, e.g. a pool wait"""
+    timer = _timer()
+    if timer is not None and timer._db_depth == 0:
+        timer.db += seconds
+
+
+@asynccontextmanager
+async def db_span():
+    """Count the enclosed block as database time"""
+    timer = _timer()
+    if timer is None:
+        yield
+        return
+    timer.db_started()
+    try:
+        yield
+    finally:
+        timer.db_finished()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timer = _timer()
+    if timer is not None:
+        timer.db_started()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timer = _timer()
+    if timer is not None:
+        timer.db_finished()
+
+
+def _handle_error(exception_context):
+    timer = _timer()
+    if timer is not None and exception_context.cursor is not None:
+        timer.db_finished()
+
+
+def instrument_engine(engine):
+    """Count every statement run on the engine as database time of the current update"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+
+
+class TelegramApiTiming(BaseRequestMiddleware):
+    """Bot session middleware timing every API request"""
+
+    async def __call__(self, make_request, bot, method):
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        finally:
+            elapsed = time.perf_counter() - started
+            API_LATENCY.observe(elapsed, method=type(method).__name__)
+            timer = _timer()
+            if timer is not None:
+                timer.api += elapsed
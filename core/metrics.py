@@ -0,0 +1,243 @@
+import logging
+import math
+import threading
+from typing import Any, Awaitable, Callable, Optional
+from aiohttp import web
+
+# Seconds; covers sub-millisecond cache hits up to a pool timeout
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1, 2.5, 5, 10, 30
+)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name: str, description: str, labels: tuple = ()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def _format_labels(self, key: tuple, extra: Optional[dict] = None) -> str:
+        pairs = list(zip(self.labels, key)) + list((extra or {}).items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key: tuple, value) -> list[str]:
+        return [f"{self.name}{self._format_labels(key)} {value}"]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, description: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._values[key] = (counts, total + value)
+
+    def _render_value(self, key: tuple, value) -> list[str]:
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            le = "+Inf" if bound == math.inf else repr(bound)
+            lines.append(f"{self.name}_bucket{self._format_labels(key, {'le': le})} {cumulative}")
+        lines.append(f"{self.name}_sum{self._format_labels(key)} {total}")
+        lines.append(f"{self.name}_count{self._format_labels(key)} {cumulative}")
+        return lines
+
+
+class HdrHistogram(_Metric):
+    """
+    Log-linear histogram in the style of HdrHistogram: values are counted in
+    buckets whose width grows with the value, so every recorded value keeps
+    the same relative precision (about 1.6% with the default 7 bits) from
+    microseconds up to minutes in a few hundred buckets. Rendered as a
+    Prometheus summary with quantiles computed from the buckets.
+    """
+    type = "summary"
+
+    def __init__(self, name: str, description: str, labels: tuple = (),
+                 quantiles: tuple = (0.5, 0.9, 0.99, 0.999), unit: float = 1e-6, significant_bits: int = 7):
+        super().__init__(name, description, labels)
+        self.quantiles = quantiles
+        self.unit = unit
+        self._bits = significant_bits
+        self._sub_buckets = 1 << significant_bits
+        self._half = self._sub_buckets >> 1
+
+    def observe(self, value: float, **labels):
+        index = self._index(max(int(value / self.unit), 0))
+        key = self._key(labels)
+        with self._lock:
+            counts, count, total = self._values.get(key, ({}, 0, 0.0))
+            counts[index] = counts.get(index, 0) + 1
+            self._values[key] = (counts, count + 1, total + value)
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        with self._lock:
+            item = self._values.get(self._key(labels))
+            if not item:
+                return None
+            counts, count, _ = item
+            counts = sorted(counts.items())
+        return self._quantile(counts, count, q)
+
+    def _index(self, units: int) -> int:
+        if units < self._sub_buckets:
+            return units
+        shift = units.bit_length() - self._bits
+        return self._sub_buckets + (shift - 1) * self._half + (units >> shift) - self._half
+
+    def _midpoint(self, index: int) -> float:
+        if index < self._sub_buckets:
+            return index * self.unit
+        shift, offset = divmod(index - self._sub_buckets, self._half)
+        shift += 1
+        low = (offset + self._half) << shift
+        return (low + (1 << shift) / 2) * self.unit
+
+    def _quantile(self, counts: list, count: int, q: float) -> float:
+        rank = max(math.ceil(q * count), 1)
+        seen = 0
+        for index, bucket_count in counts:
+            seen += bucket_count
+            if seen >= rank:
+                return self._midpoint(index)
+        return self._midpoint(counts[-1][0])
+
+    def _render_value(self, key: tuple, value) -> list[str]:
+        counts, count, total = value
+        counts = sorted(counts.items())
+        lines = [
+            f"{self.name}{self._format_labels(key, {'quantile': repr(q)})} {self._quantile(counts, count, q)}"
+            for q in self.quantiles
+        ]
+        lines.append(f"{self.name}_sum{self._format_labels(key)} {total}")
+        lines.append(f"{self.name}_count{self._format_labels(key)} {count}")
+        return lines
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            items = [(key, (dict(counts), count, total)) for key, (counts, count, total) in self._values.items()]
+        for key, value in items:
+            lines.extend(self._render_value(key, value))
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, description: str, labels: tuple = ()) -> Counter:
+        return self.register(Counter(name, description, labels))
+
+    def gauge(self, name: str, description: str, labels: tuple = ()) -> Gauge:
+        return self.register(Gauge(name, description, labels))
+
+    def histogram(self, name: str, description: str, labels: tuple = (),
+                  buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, description, labels, buckets))
+
+    def hdr_histogram(self, name: str, description: str, labels: tuple = ()) -> HdrHistogram:
+        return self.register(HdrHistogram(name, description, labels))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+registry = Registry()
+
+
+def _json_handler(source: Callable[[], Any]):
+    async def handle(request: web.Request) -> web.Response:
+        return web.json_response(source())
+    return handle
+
+
+async def start_metrics_server(host: str, port: int,
+                               health_check: Optional[Callable[[], Awaitable[bool]]] = None,
+                               json_routes: Optional[dict[str, Callable[[], Any]]] = None) -> web.AppRunner:
+    """Serve /metrics in Prometheus text format, /health and read-only JSON debug routes"""
+
+    async def handle_metrics(request: web.Request) -> web.Response:
+        return web.Response(text=registry.render(), content_type="text/plain")
+
+    async def handle_health(request: web.Request) -> web.Response:
+        healthy = await health_check() if health_check else True
+        return web.json_response({"ok": healthy}, status=200 if healthy else 503)
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    app.router.add_get("/health", handle_health)
+    for path, source in (json_routes or {}).items():
+        app.router.add_get(path, _json_handler(source))
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logging.info(f"Metrics server listening on {host}:{port}")
+    return runner
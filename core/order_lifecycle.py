@@ -0,0 +1,243 @@
+"""
+Order status transitions.
+
+Every change of orders.status goes through this module. A transition is
+one statement: it locks the order row, moves it only from an allowed status
+and appends the change to order_status_history. A repeated or late callback
+changes nothing and reports the status the order already has.
+
+Usage:
+    python -m core.order_lifecycle [--hours 24]
+
+prints how long orders spent in each status over the given period.
+"""
+import argparse
+import asyncio
+from collections import namedtuple
+from typing import Optional
+from database.queries import register
+
+PENDING = 'pending'
+ACCEPTED = 'accepted'
+DELIVERING = 'delivering'
+ARRIVED = 'arrived'
+COMPLETED = 'completed'
+CANCELLED = 'cancelled'
+
+# Target status -> statuses it may be entered from
+TRANSITIONS = {
+    ACCEPTED: (PENDING,),
+    DELIVERING: (ACCEPTED,),
+    ARRIVED: (DELIVERING,),
+    COMPLETED: (ARRIVED,),
+    CANCELLED: (PENDING,),
+}
+
+STATUS_LABELS = {
+    PENDING: '🕔 Kutilmoqda',
+    ACCEPTED: '👨‍🍳 Taom tayyorlanyapdi',
+    DELIVERING: '🚚 Yetkazilmoqda',
+    ARRIVED: '📍 Yetib keldi',
+    COMPLETED: '✅ Tugallangan',
+    CANCELLED: '❌ Bekor qilindi',
+    # Written by earlier versions of the bot
+    'in_delivery': '🕐 Taom tayyorlanyapdi',
+    'accepted_by_delivery': '🚚 Yetkazuvchi tomonidan qabul qilindi',
+}
+
+# changed: this call moved the order; status: the order's status afterwards
+TransitionResult = namedtuple('TransitionResult', 'changed status')
+
+TRANSITION = register("order_transition", """
+    WITH previous AS (
+        SELECT id, status FROM orders WHERE id = :order_id FOR UPDATE
+    ),
+    changed AS (
+        UPDATE orders o
+        SET status = CAST(:to_status AS VARCHAR),
+            cancellation_reason = COALESCE(CAST(:reason AS VARCHAR), o.cancellation_reason),
+            updated_at = NOW()
+        FROM previous p
+        WHERE o.id = p.id
+        AND p.status = ANY(CAST(:from_statuses AS VARCHAR[]))
+        RETURNING o.id, p.status AS from_status
+    ),
+    history AS (
+        INSERT INTO order_status_history (order_id, from_status, to_status, actor_telegram_id, created_at)
+        SELECT id, from_status, CAST(:to_status AS VARCHAR), CAST(:actor AS BIGINT), NOW() FROM changed
+    )
+    SELECT
+        EXISTS (SELECT 1 FROM changed) AS changed,
+        CASE WHEN EXISTS (SELECT 1 FROM changed) THEN CAST(:to_status AS VARCHAR) ELSE p.status END AS status
+    FROM previous p
+""")
+
+# accepted -> delivering for the first courier to ask, compare-and-set on an
+# empty courier slot. Concurrent claims queue on the order row and see the
+# winner's status, so exactly one gets a row back. The courier is marked busy
+# and the order, customer, restaurant and courier fields the messages need
+# come back with it.
+CLAIM_DELIVERY = register("claim_delivery", """
+    WITH claimed AS (
+        UPDATE orders o
+        SET status = 'delivering',
+            active_delivery_person_id = dp.id,
+            updated_at = NOW()
+        FROM delivery_persons dp
+        WHERE o.id = :order_id
+        AND o.status = 'accepted'
+        AND o.active_delivery_person_id IS NULL
+        AND dp.telegram_id = :telegram_id
+        RETURNING o.id, o.total, o.phone_number, o.latitude, o.longitude,
+                  o.delivery_message, o.restaurant_message, o.user_id, o.restaurant_id,
+                  dp.id AS courier_id, dp.name AS courier_name,
+                  dp.phone_number AS courier_phone, dp.telegram_id AS courier_telegram_id
+    ),
+    courier AS (
+        UPDATE delivery_persons
+        SET busy = true
+        WHERE id = (SELECT courier_id FROM claimed)
+    ),
+    history AS (
+        INSERT INTO order_status_history (order_id, from_status, to_status, actor_telegram_id, created_at)
+        SELECT id, 'accepted', 'delivering', CAST(:telegram_id AS BIGINT), NOW() FROM claimed
+    )
+    SELECT
+        c.*,
+        u.telegram_id as customer_telegram_id,
+        r.name as restaurant_name,
+        r.latitude as restaurant_lat,
+        r.longitude as restaurant_lon
+    FROM claimed c
+    JOIN users u ON c.user_id = u.id
+    JOIN restaurants r ON c.restaurant_id = r.id
+""")
+
+# arrived -> completed, freeing the courier unless they still carry another order
+COMPLETE = register("order_complete", """
+    WITH completed AS (
+        UPDATE orders
+        SET status = 'completed',
+            updated_at = NOW()
+        WHERE id = :order_id
+        AND status = 'arrived'
+        RETURNING id, active_delivery_person_id
+    ),
+    courier AS (
+        UPDATE delivery_persons dp
+        SET busy = false
+        FROM completed c
+        WHERE dp.id = c.active_delivery_person_id
+        AND NOT EXISTS (
+            SELECT 1 FROM orders o
+            WHERE o.active_delivery_person_id = dp.id
+            AND o.id <> c.id
+            AND o.status IN ('delivering', 'arrived')
+        )
+    ),
+    history AS (
+        INSERT INTO order_status_history (order_id, from_status, to_status, actor_telegram_id, created_at)
+        SELECT id, 'arrived', 'completed', CAST(:actor AS BIGINT), NOW() FROM completed
+    )
+    SELECT id FROM completed
+""")
+
+RECORD_CREATED = register("order_record_created", """
+    INSERT INTO order_status_history (order_id, from_status, to_status, created_at)
+    VALUES (:order_id, NULL, 'pending', NOW())
+""")
+
+# Seconds spent in each status by transitions out of it within the period
+TIME_IN_STATUS = register("order_time_in_status", """
+    WITH spans AS (
+        SELECT
+            to_status AS status,
+            EXTRACT(EPOCH FROM LEAD(created_at) OVER (PARTITION BY order_id ORDER BY created_at, id)
+                               - created_at) AS seconds,
+            LEAD(created_at) OVER (PARTITION BY order_id ORDER BY created_at, id) AS left_at
+        FROM order_status_history
+        WHERE order_id IN (
+            SELECT order_id FROM order_status_history
+            WHERE created_at >= NOW() - CAST(:hours AS FLOAT) * INTERVAL '1 hour'
+        )
+    )
+    SELECT
+        status,
+        count(*) AS orders,
+        avg(seconds) AS avg_seconds,
+        percentile_cont(0.5) WITHIN GROUP (ORDER BY seconds) AS p50_seconds,
+        percentile_cont(0.95) WITHIN GROUP (ORDER BY seconds) AS p95_seconds
+    FROM spans
+    WHERE left_at >= NOW() - CAST(:hours AS FLOAT) * INTERVAL '1 hour'
+    GROUP BY status
+    ORDER BY status
+""")
+
+
+def status_label(status: str) -> str:
+    return STATUS_LABELS.get(status, status)
+
+
+async def transition(session, order_id: int, to_status: str, actor_telegram_id: Optional[int] = None,
+                     reason: Optional[str] = None) -> Optional[TransitionResult]:
+    """
+    Move an order to to_status if its current status allows it; the caller commits.
+
+    Returns:
+        TransitionResult, or None if the order does not exist
+    """
+    result = await TRANSITION.execute(session, {
+        "order_id": order_id,
+        "to_status": to_status,
+        "from_statuses": list(TRANSITIONS[to_status]),
+        "actor": actor_telegram_id,
+        "reason": reason
+    })
+    row = result.fetchone()
+    return TransitionResult(row.changed, row.status) if row else None
+
+
+async def claim_delivery(session, order_id: int, courier_telegram_id: int):
+    """Assign a courier to an accepted order; the order details, or None if it is taken"""
+    result = await CLAIM_DELIVERY.execute(session, {
+        "order_id": order_id,
+        "telegram_id": courier_telegram_id
+    })
+    return result.fetchone()
+
+
+async def complete(session, order_id: int, actor_telegram_id: Optional[int] = None) -> bool:
+    """Mark an arrived order completed; False if it was not waiting for that"""
+    result = await COMPLETE.execute(session, {"order_id": order_id, "actor": actor_telegram_id})
+    return result.fetchone() is not None
+
+
+async def record_created(session, order_id: int):
+    """History entry for an order inserted as pending outside CREATE_ORDERS_FROM_CART"""
+    await RECORD_CREATED.execute(session, {"order_id": order_id})
+
+
+async def _print_time_in_status(hours: float):
+    from database.db import db
+
+    await db.connect()
+    session = await db.get_session()
+    try:
+        result = await TIME_IN_STATUS.execute(session, {"hours": hours})
+        rows = result.fetchall()
+    finally:
+        await session.close()
+        await db.close()
+
+    print(f"{'status':<14}{'orders':>8}{'avg min':>10}{'p50 min':>10}{'p95 min':>10}")
+    for row in rows:
+        print(
+            f"{row.status:<14}{row.orders:>8}{row.avg_seconds / 60:>10.1f}"
+            f"{row.p50_seconds / 60:>10.1f}{row.p95_seconds / 60:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time orders spent in each status")
+    parser.add_argument("--hours", type=float, default=24)
+    asyncio.run(_print_time_in_status(parser.parse_args().hours))
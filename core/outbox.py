@@ -0,0 +1,238 @@
+import asyncio
+import json
+import logging
+from typing import Optional
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from aiogram.types import InlineKeyboardMarkup
+from sqlalchemy.sql import text
+from config import Config
+from database.db import db
+from utils.cache import TTLCache
+from utils.rate_limit import TokenBucket
+
+ENQUEUE_MESSAGE = text("""
+    INSERT INTO notification_outbox (chat_id, text, reply_markup, order_id, message_type)
+    VALUES (:chat_id, :text, CAST(:reply_markup AS JSONB), :order_id, :message_type)
+""")
+
+# The lease keeps other dispatchers off claimed rows; if this one dies the
+# rows become due again when it expires.
+CLAIM_BATCH = text("""
+    UPDATE notification_outbox
+    SET available_at = NOW() + make_interval(secs => :lease)
+    WHERE id IN (
+        SELECT id FROM notification_outbox
+        WHERE status = 'pending' AND available_at <= NOW()
+        ORDER BY id
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, chat_id, text, reply_markup, order_id, message_type, attempts
+""")
+
+MARK_SENT = text("""
+    WITH sent AS (
+        SELECT * FROM unnest(CAST(:ids AS BIGINT[]), CAST(:message_ids AS BIGINT[]))
+            AS s(id, message_id)
+    ),
+    updated AS (
+        UPDATE notification_outbox n
+        SET status = 'sent',
+            message_id = sent.message_id,
+            attempts = n.attempts + 1,
+            sent_at = NOW(),
+            last_error = NULL
+        FROM sent
+        WHERE n.id = sent.id
+        RETURNING n.order_id, n.chat_id, n.message_type, sent.message_id
+    )
+    INSERT INTO delivery_messages (order_id, message_id, chat_id, type, created_at)
+    SELECT order_id, message_id, chat_id, message_type, NOW()
+    FROM updated
+    WHERE order_id IS NOT NULL AND message_type IS NOT NULL
+""")
+
+RESCHEDULE = text("""
+    UPDATE notification_outbox
+    SET status = :status,
+        attempts = attempts + :tried,
+        available_at = NOW() + make_interval(secs => :delay),
+        last_error = :error
+    WHERE id = :id
+""")
+
+
+def outbox_message(chat_id: int, message_text: str, reply_markup: Optional[InlineKeyboardMarkup] = None,
+                   order_id: Optional[int] = None, message_type: Optional[str] = None) -> dict:
+    """
+    Build an outbox row. When order_id and message_type are set, the sent
+    message is recorded in delivery_messages.
+    """
+    return {
+        "chat_id": chat_id,
+        "text": message_text,
+        "reply_markup": reply_markup.model_dump_json(exclude_none=True) if reply_markup else None,
+        "order_id": order_id,
+        "message_type": message_type
+    }
+
+
+class NotificationOutbox:
+    """
+    Transactional outbox for bot notifications.
+
+    Handlers add messages with enqueue() inside the transaction that changes
+    the order, so a notification exists exactly when the change is committed.
+    run() delivers them in the background: messages of one chat go out in
+    order, under per-chat and global rate limits, with exponential backoff on
+    failures and the wait Telegram asks for on 429.
+    """
+
+    def __init__(self):
+        self._wakeup = asyncio.Event()
+        self._global_bucket = TokenBucket(Config.NOTIFY_GLOBAL_RATE, Config.NOTIFY_GLOBAL_RATE)
+        # Idle buckets refill completely within a minute, so they can be dropped
+        self._chat_buckets = TTLCache(maxsize=10000, ttl=60)
+
+    async def enqueue(self, session, messages: list[dict]):
+        """Add messages to the caller's transaction; they are sent after its commit"""
+        if messages:
+            await session.execute(ENQUEUE_MESSAGE, messages)
+
+    def wake(self):
+        """Skip the poll delay after committing new messages"""
+        self._wakeup.set()
+
+    async def run(self, bot: Bot):
+        logging.info("Notification dispatcher started")
+        while True:
+            try:
+                delivered = await self.dispatch_batch(bot)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Error dispatching notifications: {e}")
+                delivered = 0
+
+            if delivered:
+                continue
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), Config.NOTIFY_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def dispatch_batch(self, bot: Bot) -> int:
+        """Claim due messages, send them and record the results; returns rows handled"""
+        session = await db.get_session()
+        try:
+            result = await session.execute(CLAIM_BATCH, {
+                "lease": Config.NOTIFY_LEASE_SECONDS,
+                "limit": Config.NOTIFY_BATCH_SIZE
+            })
+            rows = result.fetchall()
+            await session.commit()
+        finally:
+            await session.close()
+
+        if not rows:
+            return 0
+
+        by_chat = {}
+        for row in sorted(rows, key=lambda r: r.id):
+            by_chat.setdefault(row.chat_id, []).append(row)
+
+        sent = []
+        reschedules = []
+        await asyncio.gather(*(
+            self._send_chat(bot, chat_rows, sent, reschedules)
+            for chat_rows in by_chat.values()
+        ))
+
+        session = await db.get_session()
+        try:
+            if sent:
+                await session.execute(MARK_SENT, {
+                    "ids": [row_id for row_id, _ in sent],
+                    "message_ids": [message_id for _, message_id in sent]
+                })
+            if reschedules:
+                await session.execute(RESCHEDULE, reschedules)
+            await session.commit()
+        finally:
+            await session.close()
+
+        return len(rows)
+
+    async def _send_chat(self, bot: Bot, rows: list, sent: list, reschedules: list):
+        bucket = self._chat_bucket(rows[0].chat_id)
+
+        for index, row in enumerate(rows):
+            # Leave the rest of a throttled chat for a later batch instead of
+            # holding the batch (and the lease) open
+            wait = bucket.delay()
+            if wait > Config.NOTIFY_MAX_WAIT_SECONDS:
+                self._push_back(rows[index:], wait, None, reschedules)
+                return
+
+            await bucket.acquire()
+            await self._global_bucket.acquire()
+            try:
+                message = await bot.send_message(
+                    chat_id=row.chat_id,
+                    text=row.text,
+                    reply_markup=self._load_markup(row.reply_markup)
+                )
+                sent.append((row.id, message.message_id))
+
+            except TelegramRetryAfter as e:
+                bucket.block(e.retry_after)
+                self._push_back(rows[index:], e.retry_after, str(e), reschedules, tried=1)
+                return
+
+            except (TelegramForbiddenError, TelegramBadRequest) as e:
+                # Blocked bot, deleted chat, bad markup: retrying will not help
+                logging.error(f"Notification {row.id} to chat {row.chat_id} failed: {e}")
+                reschedules.append(self._reschedule(row, "failed", 0, str(e), tried=1))
+
+            except Exception as e:
+                attempts = row.attempts + 1
+                if attempts >= Config.NOTIFY_MAX_ATTEMPTS:
+                    logging.error(f"Notification {row.id} dropped after {attempts} attempts: {e}")
+                    reschedules.append(self._reschedule(row, "failed", 0, str(e), tried=1))
+                    self._push_back(rows[index + 1:], 0, None, reschedules)
+                else:
+                    delay = min(Config.NOTIFY_BACKOFF_SECONDS * 2 ** (attempts - 1), Config.NOTIFY_MAX_BACKOFF_SECONDS)
+                    self._push_back(rows[index:], delay, str(e), reschedules, tried=1)
+                return
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            # Groups have negative ids and a much lower limit than private chats
+            rate = Config.NOTIFY_GROUP_RATE_PER_MINUTE / 60 if chat_id < 0 else Config.NOTIFY_CHAT_RATE
+            bucket = TokenBucket(rate)
+        self._chat_buckets.set(chat_id, bucket)
+        return bucket
+
+    def _push_back(self, rows: list, delay: float, error: Optional[str], reschedules: list, tried: int = 0):
+        """Reschedule rows of one chat together so they keep their order"""
+        for index, row in enumerate(rows):
+            reschedules.append(self._reschedule(row, "pending", delay, error, tried if index == 0 else 0))
+
+    @staticmethod
+    def _reschedule(row, status: str, delay: float, error: Optional[str], tried: int) -> dict:
+        return {"id": row.id, "status": status, "delay": delay, "error": error, "tried": tried}
+
+    @staticmethod
+    def _load_markup(reply_markup) -> Optional[InlineKeyboardMarkup]:
+        if not reply_markup:
+            return None
+        if isinstance(reply_markup, str):
+            reply_markup = json.loads(reply_markup)
+        return InlineKeyboardMarkup.model_validate(reply_markup)
+
+
+outbox = NotificationOutbox()
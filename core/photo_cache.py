@@ -0,0 +1,156 @@
+"""
+Reuse Telegram file_ids for food photos instead of uploading them every time.
+
+Warm-up (uploads every active food image once, into a chat the bot can post to):
+    python -m core.photo_cache --chat-id -1001234567890
+"""
+import argparse
+import asyncio
+import hashlib
+import logging
+import os
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import FSInputFile, Message
+from sqlalchemy.sql import text
+from config import Config
+from database.db import db
+from utils.rate_limit import TokenBucket
+
+IMAGES_DIR = 'images'
+
+SELECT_FILES = text("SELECT path, content_hash, file_id FROM telegram_files")
+
+UPSERT_FILE = text("""
+    INSERT INTO telegram_files (path, content_hash, file_id)
+    VALUES (:path, :content_hash, :file_id)
+    ON CONFLICT (path, content_hash) DO UPDATE SET file_id = EXCLUDED.file_id
+""")
+
+
+class PhotoCache:
+    """
+    Maps (image path, content hash) to the file_id Telegram returned for it.
+
+    The hash is keyed on the file's size and mtime, so an unchanged image is
+    hashed once per process and a replaced image is uploaded again.
+    """
+
+    def __init__(self):
+        self._file_ids = {}
+        self._hashes = {}
+        self._locks = {}
+
+    async def load(self):
+        session = await db.get_session()
+        try:
+            result = await session.execute(SELECT_FILES)
+            self._file_ids = {(row.path, row.content_hash): row.file_id for row in result.fetchall()}
+        finally:
+            await session.close()
+        logging.info(f"Photo cache loaded: {len(self._file_ids)} file ids")
+
+    async def send_photo(self, bot: Bot, chat_id: int, image: str, **kwargs) -> Message:
+        """
+        Send images/<image>, reusing a cached file_id when there is one.
+        Raises FileNotFoundError when the image does not exist.
+        """
+        path = os.path.join(IMAGES_DIR, image)
+        key = (path, await self._content_hash(path))
+
+        file_id = self._file_ids.get(key)
+        if file_id:
+            try:
+                return await bot.send_photo(chat_id=chat_id, photo=file_id, **kwargs)
+            except TelegramBadRequest as e:
+                # file_ids belong to the bot that uploaded them; re-upload on mismatch
+                logging.warning(f"Cached file_id for {path} rejected: {e}")
+                self._file_ids.pop(key, None)
+
+        # One upload per image even when many users open it at once
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            file_id = self._file_ids.get(key)
+            if file_id:
+                return await bot.send_photo(chat_id=chat_id, photo=file_id, **kwargs)
+
+            message = await bot.send_photo(chat_id=chat_id, photo=FSInputFile(path), **kwargs)
+            await self._store(key, message.photo[-1].file_id)
+            return message
+
+    async def warm_up(self, bot: Bot, chat_id: int, images: list[str]) -> int:
+        """Upload images that have no file_id yet; returns the number uploaded"""
+        bucket = TokenBucket(Config.NOTIFY_GROUP_RATE_PER_MINUTE / 60 if chat_id < 0 else Config.NOTIFY_CHAT_RATE)
+        uploaded = 0
+        for image in images:
+            path = os.path.join(IMAGES_DIR, image)
+            try:
+                key = (path, await self._content_hash(path))
+            except FileNotFoundError:
+                logging.error(f"Image not found: {path}")
+                continue
+            if key in self._file_ids:
+                continue
+
+            await bucket.acquire()
+            message = await self.send_photo(bot, chat_id, image)
+            await bot.delete_message(chat_id=chat_id, message_id=message.message_id)
+            uploaded += 1
+        return uploaded
+
+    async def _content_hash(self, path: str) -> str:
+        stat = os.stat(path)
+        stamp = self._hashes.get(path)
+        if stamp and stamp[:2] == (stat.st_size, stat.st_mtime_ns):
+            return stamp[2]
+
+        content_hash = await asyncio.to_thread(self._hash_file, path)
+        self._hashes[path] = (stat.st_size, stat.st_mtime_ns, content_hash)
+        return content_hash
+
+    @staticmethod
+    def _hash_file(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(65536), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    async def _store(self, key: tuple[str, str], file_id: str):
+        self._file_ids[key] = file_id
+        session = await db.get_session()
+        try:
+            await session.execute(UPSERT_FILE, {"path": key[0], "content_hash": key[1], "file_id": file_id})
+            await session.commit()
+        except Exception as e:
+            # The file_id still works from memory; it is stored again on the next upload
+            logging.error(f"Error saving file_id for {key[0]}: {e}")
+            await session.rollback()
+        finally:
+            await session.close()
+
+
+photo_cache = PhotoCache()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chat-id", type=int, required=True)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    bot = Bot(token=Config.BOT_TOKEN)
+    await db.connect()
+    try:
+        await db.load_catalog()
+        await photo_cache.load()
+        images = db.catalog.get_food_images()
+        uploaded = await photo_cache.warm_up(bot, args.chat_id, images)
+        logging.info(f"Uploaded {uploaded} of {len(images)} food images")
+    finally:
+        await db.close()
+        await bot.session.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
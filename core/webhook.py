@@ -0,0 +1,108 @@
+import asyncio
+import hmac
+import logging
+from typing import Optional
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """
+    aiohttp webhook entry point that feeds updates to the dispatcher.
+
+    Requests are acknowledged as soon as the update is queued. A fixed pool of
+    workers drains the bounded queue, and when it is full Telegram gets a 503
+    and redelivers the update later instead of this process buffering without
+    limit.
+    """
+
+    def __init__(
+        self,
+        dp: Dispatcher,
+        bot: Bot,
+        path: str = "/webhook",
+        secret_token: Optional[str] = None,
+        queue_size: int = 1000,
+        workers: int = 16
+    ):
+        self.dp = dp
+        self.bot = bot
+        self.path = path
+        self.secret_token = secret_token
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.workers = workers
+        self.rejected = 0
+        self._worker_tasks = []
+        self._runner = None
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self.handle_update)
+        app.router.add_get("/health", self.handle_health)
+        return app
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        if self.secret_token:
+            received = request.headers.get(SECRET_HEADER, "")
+            if not hmac.compare_digest(received, self.secret_token):
+                return web.Response(status=401)
+
+        try:
+            update = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+
+        try:
+            self.queue.put_nowait(update)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            logging.warning(f"Webhook queue full, rejected update {update.get('update_id')}")
+            return web.Response(status=503)
+
+        return web.json_response({})
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "queued": self.queue.qsize(),
+            "rejected": self.rejected,
+            "workers": len(self._worker_tasks)
+        })
+
+    async def start(self, host: str, port: int, reuse_port: bool = False):
+        self._worker_tasks = [
+            asyncio.create_task(self._worker()) for _ in range(self.workers)
+        ]
+
+        self._runner = web.AppRunner(self.create_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port, reuse_port=reuse_port or None)
+        await site.start()
+        logging.info(f"Webhook server listening on {host}:{port}{self.path} with {self.workers} workers")
+
+    async def stop(self, drain_timeout: float = 10):
+        """Stop accepting updates, finish queued ones and stop the workers"""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+        try:
+            await asyncio.wait_for(self.queue.join(), drain_timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"Webhook stopped with {self.queue.qsize()} updates still queued")
+
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    async def _worker(self):
+        while True:
+            update = await self.queue.get()
+            try:
+                await self.dp.feed_raw_update(self.bot, update)
+            except Exception as e:
+                logging.error(f"Error processing update {update.get('update_id')}: {e}")
+            finally:
+                self.queue.task_done()
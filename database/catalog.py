@@ -0,0 +1,295 @@
+from collections import namedtuple
+from datetime import timedelta
+import logging
+from database.queries import register
+from utils.delivery_zones import DeliveryZones
+from utils.schedule import HolidayEntry, HoursEntry, Schedule
+
+RestaurantEntry = namedtuple(
+    'RestaurantEntry',
+    'id name description image startwork endwork delivery_cost latitude longitude '
+    'restaurant_chat_id delivery_chat_id admin_telegram_id delivery_radius_km delivery_zone is_active'
+)
+CategoryEntry = namedtuple('CategoryEntry', 'id name restaurant_id is_active')
+FoodEntry = namedtuple('FoodEntry', 'id name description image price restaurant_id category_id is_active')
+
+# Same shape as the row returned by the old select_eat_by_id query
+EatDetails = namedtuple('EatDetails', 'id name description image price restaurant_name category_name')
+
+# Rows committed slightly after their updated_at was stamped must not be missed,
+# so every incremental refresh re-reads a small window behind the watermark.
+WATERMARK_OVERLAP = timedelta(seconds=60)
+
+RESTAURANTS_QUERY = """
+    SELECT id, name, description, image, startwork, endwork, delivery_cost,
+           latitude, longitude, restaurant_chat_id, delivery_chat_id,
+           admin_telegram_id, delivery_radius_km, delivery_zone, is_active, updated_at
+    FROM restaurants
+"""
+CATEGORIES_QUERY = """
+    SELECT id, name, restaurant_id, is_active, updated_at
+    FROM categories
+"""
+FOODS_QUERY = """
+    SELECT id, name, description, image, price, restaurant_id, category_id,
+           is_active, updated_at
+    FROM foods
+"""
+
+# Full loads and incremental refreshes, registered once so both run as
+# cached prepared statements
+SINCE_WATERMARK = " WHERE updated_at > :since"
+CATALOG_QUERIES = {
+    entry_type: (
+        register(f"catalog_{name}", sql),
+        register(f"catalog_{name}_since", sql + SINCE_WATERMARK)
+    )
+    for name, sql, entry_type in (
+        ("restaurants", RESTAURANTS_QUERY, RestaurantEntry),
+        ("categories", CATEGORIES_QUERY, CategoryEntry),
+        ("foods", FOODS_QUERY, FoodEntry),
+    )
+}
+
+# Deleted rows leave nothing behind to have a newer updated_at, so every
+# refresh also reads the ids still present and drops the rest
+CATALOG_ID_QUERIES = {
+    entry_type: register(f"catalog_{table}_ids", f"SELECT id FROM {table}")
+    for table, entry_type in (
+        ("restaurants", RestaurantEntry),
+        ("categories", CategoryEntry),
+        ("foods", FoodEntry),
+    )
+}
+
+# Opening hours have no updated_at and are a few rows per restaurant, so they
+# are read whole on every load and refresh, which also picks up deletions.
+# Past holidays are left out; two days back covers yesterday in any timezone.
+SCHEDULE_QUERIES = {
+    HoursEntry: register("catalog_restaurant_hours", """
+        SELECT restaurant_id, weekday, opens_at, closes_at
+        FROM restaurant_hours
+        ORDER BY id
+    """),
+    HolidayEntry: register("catalog_restaurant_holidays", """
+        SELECT restaurant_id, day, opens_at, closes_at
+        FROM restaurant_holidays
+        WHERE day >= CURRENT_DATE - 2
+        ORDER BY id
+    """),
+}
+
+
+class Catalog:
+    """Versioned in-memory snapshot of restaurants, categories, foods and opening hours"""
+
+    def __init__(self):
+        self.loaded = False
+        self.version = 0
+        self._watermark = None
+        self._restaurants = {}
+        self._categories = {}
+        self._foods = {}
+        self._hours = []
+        self._holidays = []
+        self._build_indexes()
+
+    async def load(self, session):
+        """Load the full catalog, replacing the current snapshot"""
+        restaurants = await self._fetch(session, RestaurantEntry)
+        categories = await self._fetch(session, CategoryEntry)
+        foods = await self._fetch(session, FoodEntry)
+        self._hours = await self._fetch_schedule(session, HoursEntry)
+        self._holidays = await self._fetch_schedule(session, HolidayEntry)
+
+        self._restaurants = {entry.id: entry for entry, _ in restaurants}
+        self._categories = {entry.id: entry for entry, _ in categories}
+        self._foods = {entry.id: entry for entry, _ in foods}
+        self._watermark = self._max_updated_at(None, restaurants + categories + foods)
+        self._build_indexes()
+
+        self.loaded = True
+        self.version += 1
+        logging.info(
+            f"Catalog loaded: {len(self._restaurants)} restaurants, "
+            f"{len(self._categories)} categories, {len(self._foods)} foods "
+            f"(version {self.version})"
+        )
+
+    async def refresh(self, session) -> bool:
+        """Apply rows changed since the last watermark and drop deleted ones, return True if anything changed"""
+        if not self.loaded:
+            await self.load(session)
+            return True
+
+        params = {"since": self._watermark - WATERMARK_OVERLAP} if self._watermark else None
+
+        restaurants = await self._fetch(session, RestaurantEntry, params)
+        categories = await self._fetch(session, CategoryEntry, params)
+        foods = await self._fetch(session, FoodEntry, params)
+        hours = await self._fetch_schedule(session, HoursEntry)
+        holidays = await self._fetch_schedule(session, HolidayEntry)
+
+        self._watermark = self._max_updated_at(self._watermark, restaurants + categories + foods)
+
+        changed = hours != self._hours or holidays != self._holidays
+        self._hours = hours
+        self._holidays = holidays
+        for table, entry_type, rows in (
+            (self._restaurants, RestaurantEntry, restaurants),
+            (self._categories, CategoryEntry, categories),
+            (self._foods, FoodEntry, foods),
+        ):
+            for entry, _ in rows:
+                if table.get(entry.id) != entry:
+                    table[entry.id] = entry
+                    changed = True
+
+            # Read after the changed rows, so a row deleted in between is not put back
+            result = await CATALOG_ID_QUERIES[entry_type].execute(session)
+            present = {row[0] for row in result.fetchall()}
+            for entry_id in table.keys() - present:
+                del table[entry_id]
+                changed = True
+
+        if changed:
+            self._build_indexes()
+            self.version += 1
+            logging.info(f"Catalog refreshed to version {self.version}")
+
+        return changed
+
+    def schedule_for(self, restaurants) -> Schedule:
+        """
+        Opening hours of the given restaurant rows: the catalog's schedule once
+        loaded, before that one built from the rows' own startwork/endwork
+        """
+        if self.loaded:
+            return self.schedule
+        return Schedule(restaurants)
+
+    def get_restaurants(self) -> list:
+        """Active restaurants ordered by ID"""
+        return self._active_restaurants
+
+    def get_restaurant(self, restaurant_id: int):
+        return self._restaurants.get(restaurant_id)
+
+    def get_restaurant_by_label(self, label: str):
+        """Active restaurant shown under the given button label, or None"""
+        return self._restaurants_by_label.get(label)
+
+    def get_categories(self, restaurant_id: int) -> list:
+        """Active categories of a restaurant ordered by ID"""
+        return self._categories_by_restaurant.get(restaurant_id, [])
+
+    def get_category_by_label(self, restaurant_id: int, label: str):
+        """Active category of a restaurant shown under the given button label, or None"""
+        return self._categories_by_label.get((restaurant_id, label))
+
+    def get_eats(self, restaurant_id: int, category_id: int) -> list:
+        """Active foods of a restaurant's category ordered by ID"""
+        return self._foods_by_category.get((restaurant_id, category_id), [])
+
+    def label(self, entry) -> str:
+        """
+        Button text of a restaurant or category: its name, with an ordinal
+        suffix when several active siblings share the name.
+        """
+        return self._labels.get((type(entry), entry.id), entry.name)
+
+    def get_food_images(self) -> list:
+        """Distinct image names of active foods"""
+        return sorted({
+            food.image
+            for foods in self._foods_by_category.values()
+            for food in foods
+            if food.image
+        })
+
+    def get_eat(self, food_id: int):
+        """Active food joined with its restaurant and category names, or None"""
+        food = self._foods.get(food_id)
+        if not food or not food.is_active:
+            return None
+
+        restaurant = self._restaurants.get(food.restaurant_id)
+        category = self._categories.get(food.category_id)
+        if not restaurant or not category:
+            return None
+
+        return EatDetails(
+            id=food.id,
+            name=food.name,
+            description=food.description,
+            image=food.image,
+            price=food.price,
+            restaurant_name=restaurant.name,
+            category_name=category.name
+        )
+
+    def _build_indexes(self):
+        self._active_restaurants = [
+            r for r in sorted(self._restaurants.values(), key=lambda r: r.id)
+            if r.is_active
+        ]
+
+        labels = {}
+        restaurants_by_label = {}
+        for restaurant, label in self._assign_labels(self._active_restaurants):
+            labels[(RestaurantEntry, restaurant.id)] = label
+            restaurants_by_label[label] = restaurant
+        self._restaurants_by_label = restaurants_by_label
+        self.zones = DeliveryZones(self._active_restaurants)
+        self.schedule = Schedule(self._restaurants.values(), self._hours, self._holidays)
+
+        categories_by_restaurant = {}
+        for category in sorted(self._categories.values(), key=lambda c: c.id):
+            if category.is_active:
+                categories_by_restaurant.setdefault(category.restaurant_id, []).append(category)
+        self._categories_by_restaurant = categories_by_restaurant
+
+        categories_by_label = {}
+        for restaurant_id, categories in categories_by_restaurant.items():
+            for category, label in self._assign_labels(categories):
+                labels[(CategoryEntry, category.id)] = label
+                categories_by_label[(restaurant_id, label)] = category
+        self._categories_by_label = categories_by_label
+        self._labels = labels
+
+        foods_by_category = {}
+        for food in sorted(self._foods.values(), key=lambda f: f.id):
+            restaurant = self._restaurants.get(food.restaurant_id)
+            category = self._categories.get(food.category_id)
+            if not food.is_active or not category or not restaurant or not restaurant.is_active:
+                continue
+            key = (food.restaurant_id, food.category_id)
+            foods_by_category.setdefault(key, []).append(food)
+        self._foods_by_category = foods_by_category
+
+    @staticmethod
+    def _assign_labels(entries: list):
+        """Yield (entry, label); the second entry named "Osh" becomes "Osh (2)" and so on"""
+        seen = {}
+        for entry in entries:
+            seen[entry.name] = seen.get(entry.name, 0) + 1
+            count = seen[entry.name]
+            yield entry, entry.name if count == 1 else f"{entry.name} ({count})"
+
+    @staticmethod
+    async def _fetch(session, entry_type, params=None) -> list:
+        full_query, since_query = CATALOG_QUERIES[entry_type]
+        result = await (since_query if params else full_query).execute(session, params)
+        return [(entry_type(*row[:-1]), row[-1]) for row in result.fetchall()]
+
+    @staticmethod
+    async def _fetch_schedule(session, entry_type) -> list:
+        result = await SCHEDULE_QUERIES[entry_type].execute(session)
+        return [entry_type(*row) for row in result.fetchall()]
+
+    @staticmethod
+    def _max_updated_at(current, rows):
+        for _, updated_at in rows:
+            if updated_at and (current is None or updated_at > current):
+                current = updated_at
+        return current
@@ -4,14 +4,167 @@ import logging
 from config import Config
 from sqlalchemy.sql import text
 from typing import Optional
+import asyncio
+from contextlib import asynccontextmanager
+import json
+from collections import namedtuple
+from core.latency import instrument_engine
+from database.catalog import Catalog
+from database.pool import InstrumentedPool
+from database.queries import register
+from database import tracing
+from database.scope import UpdateScope, current_scope
+from utils.cache import TTLCache
+
+# Marks a telegram_id known to have no users row, cached for a shorter time
+_NO_USER = 0
+
+# Restaurant or category as shown on a reply keyboard button
+MenuOption = namedtuple('MenuOption', 'id label')
+BasketItem = namedtuple('BasketItem', 'id name quantity price restaurant_id')
+BasketView = namedtuple('BasketView', 'items restaurants removed')
+OrderHistoryEntry = namedtuple('OrderHistoryEntry', 'id total status created_at items')
+
+# Always yields at least one row so the removal count survives an emptied basket
+BASKET_VIEW_QUERY = """
+    {removed_cte}
+    SELECT
+        {removed_count} AS removed,
+        c.id,
+        f.name,
+        c.quantity,
+        f.price,
+        f.restaurant_id,
+        r.name AS restaurant_name,
+        r.delivery_cost,
+        r.startwork,
+        r.endwork
+    FROM (SELECT 1) AS one
+    LEFT JOIN (
+        cart c
+        JOIN foods f ON c.food_id = f.id
+        JOIN restaurants r ON f.restaurant_id = r.id
+    ) ON c.user_id = :user_id
+        AND f.is_active = true
+        AND c.quantity > 0
+        {removed_filter}
+    ORDER BY f.restaurant_id, f.name
+"""
+
+ORDER_HISTORY_QUERY = """
+    SELECT
+        o.id,
+        o.total,
+        o.status,
+        o.created_at,
+        COALESCE(
+            json_agg(
+                json_build_object('name', f.name, 'quantity', oi.quantity)
+                ORDER BY oi.id
+            ) FILTER (WHERE oi.id IS NOT NULL),
+            '[]'
+        ) AS items
+    FROM (
+        SELECT id, total, status, created_at
+        FROM orders
+        WHERE user_id = :user_id
+        {cursor_filter}
+        ORDER BY created_at {direction}, id {direction}
+        LIMIT :limit
+    ) o
+    LEFT JOIN order_items oi ON oi.order_id = o.id
+    LEFT JOIN foods f ON f.id = oi.food_id
+    GROUP BY o.id, o.total, o.status, o.created_at
+    ORDER BY o.created_at {direction}, o.id {direction}
+"""
+
+USER_ID_BY_TELEGRAM_ID = register(
+    "user_id_by_telegram_id",
+    "SELECT id FROM users WHERE telegram_id = :telegram_id"
+)
+
+BASKET_ITEMS = register("basket_items", """
+    SELECT 
+        c.id,
+        f.name,
+        c.quantity,
+        f.price,
+        f.restaurant_id
+    FROM cart c
+    JOIN foods f ON c.food_id = f.id
+    WHERE c.user_id = :user_id
+    AND f.is_active = true
+    AND c.quantity > 0  -- Добавляем проверку на количество
+    ORDER BY f.restaurant_id, f.name
+""")
+
+BASKET_VIEW = register("basket_view", BASKET_VIEW_QUERY.format(
+    removed_cte="",
+    removed_count="0",
+    removed_filter=""
+))
+
+BASKET_REMOVE_AND_VIEW = register("basket_remove_and_view", BASKET_VIEW_QUERY.format(
+    removed_cte="""
+        WITH removed AS (
+            DELETE FROM cart
+            WHERE id = :cart_id AND user_id = :user_id
+            RETURNING id
+        )
+    """,
+    removed_count="(SELECT count(*) FROM removed)",
+    removed_filter="AND c.id NOT IN (SELECT id FROM removed)"
+))
+
+ORDER_HISTORY_FIRST = register("order_history_first", ORDER_HISTORY_QUERY.format(
+    cursor_filter="",
+    direction="DESC"
+))
+ORDER_HISTORY_OLDER = register("order_history_older", ORDER_HISTORY_QUERY.format(
+    cursor_filter="AND (created_at, id) < (:cursor_created_at, :cursor_id)",
+    direction="DESC"
+))
+ORDER_HISTORY_NEWER = register("order_history_newer", ORDER_HISTORY_QUERY.format(
+    cursor_filter="AND (created_at, id) > (:cursor_created_at, :cursor_id)",
+    direction="ASC"
+))
+
+EAT_BY_ID = register("eat_by_id", """
+    SELECT f.id, f.name, f.description, f.image, f.price,
+           r.name as restaurant_name, c.name as category_name
+    FROM foods f
+    JOIN restaurants r ON f.restaurant_id = r.id
+    JOIN categories c ON f.category_id = c.id
+    WHERE f.id = :food_id AND f.is_active = true
+""")
+
+ACTIVE_FOOD_EXISTS = register(
+    "active_food_exists",
+    "SELECT id FROM foods WHERE id = :food_id AND is_active = true"
+)
+
+ADD_TO_CART = register("add_to_cart", """
+    INSERT INTO cart (user_id, food_id, quantity) 
+    VALUES (:user_id, :food_id, :quantity)
+    ON CONFLICT (user_id, food_id) 
+    DO UPDATE SET quantity = cart.quantity + :quantity
+""")
 
 class Database:
     def __init__(self):
         self._engine = None
         self._session_factory = None
+        self.catalog = Catalog()
+        self.user_ids = TTLCache(
+            maxsize=Config.USER_CACHE_SIZE,
+            ttl=Config.USER_CACHE_TTL_SECONDS
+        )
 
     def _get_database_url(self):
-        return f"postgresql+asyncpg://{Config.DB_USER}:{Config.DB_PASSWORD}@{Config.DB_HOST}/{Config.DB_NAME}"
+        return (
+            f"postgresql+asyncpg://{Config.DB_USER}:{Config.DB_PASSWORD}@{Config.DB_HOST}/{Config.DB_NAME}"
+            f"?prepared_statement_cache_size={Config.DB_PREPARED_STATEMENT_CACHE_SIZE}"
+        )
 
     async def connect(self):
         if not self._engine:
@@ -19,9 +172,26 @@ class Database:
                 self._engine = create_async_engine(
                     self._get_database_url(),
                     echo=False,
-                    pool_size=20,
-                    max_overflow=10
+                    poolclass=InstrumentedPool,
+                    pool_size=Config.DB_POOL_SIZE,
+                    max_overflow=Config.DB_MAX_OVERFLOW,
+                    pool_timeout=Config.DB_POOL_TIMEOUT_SECONDS,
+                    pool_recycle=Config.DB_POOL_RECYCLE_SECONDS,
+                    pool_pre_ping=Config.DB_POOL_PRE_PING,
+                    connect_args={
+                        "server_settings": {
+                            "statement_timeout": str(Config.DB_STATEMENT_TIMEOUT_MS)
+                        }
+                    }
                 )
+                instrument_engine(self._engine)
+                if Config.QUERY_TRACING:
+                    tracing.install(
+                        self._engine,
+                        slow_ms=Config.SLOW_QUERY_MS,
+                        top_n=Config.SLOW_QUERY_TOP_N,
+                        window_seconds=Config.SLOW_QUERY_WINDOW_SECONDS
+                    )
                 self._session_factory = sessionmaker(
                     self._engine, 
                     class_=AsyncSession,
@@ -31,21 +201,114 @@ class Database:
                 logging.error(f"Database connection error: {e}")
                 raise
 
-    async def get_session(self) -> AsyncSession:
+    async def get_session(self, scoped: bool = True) -> AsyncSession:
+        """The update's shared session inside a scope; scoped=False always opens one that commits on its own"""
         if not self._session_factory:
             await self.connect()
+        scope = current_scope.get()
+        if scoped and scope and scope.active():
+            return scope.get_session()
         return self._session_factory()
 
+    @asynccontextmanager
+    async def update_scope(self):
+        """Share one session between all get_session() calls inside, committing what is left at the end"""
+        if not self._session_factory:
+            await self.connect()
+        scope = UpdateScope(self._session_factory)
+        token = current_scope.set(scope)
+        try:
+            yield scope
+        except BaseException:
+            await scope.finish(commit=False)
+            raise
+        else:
+            await scope.finish(commit=True)
+        finally:
+            current_scope.reset(token)
+
+    def on_commit(self, callback):
+        """Run callback once the current update's work is committed (at once outside a scope)"""
+        scope = current_scope.get()
+        if scope and scope.active():
+            scope.on_commit(callback)
+        else:
+            callback()
+
+    async def ping(self) -> bool:
+        """Health check: True when a connection can run a query"""
+        try:
+            async with self._engine.connect() as connection:
+                await connection.execute(text("SELECT 1"))
+            return True
+        except Exception as e:
+            logging.error(f"Database health check failed: {e}")
+            return False
+
+    async def run_pool_sizer(self, interval: float):
+        """Adapt max_overflow to observed concurrency until cancelled"""
+        pool = self._engine.pool
+        while True:
+            await asyncio.sleep(interval)
+            previous = pool._max_overflow
+            max_overflow = pool.adjust_overflow(Config.DB_POOL_MAX_CONNECTIONS, Config.DB_POOL_HEADROOM)
+            if max_overflow != previous:
+                logging.info(f"Pool max_overflow changed from {previous} to {max_overflow}")
+
+    async def load_catalog(self):
+        """Load restaurants, categories and foods into the in-memory catalog"""
+        session = await self.get_session()
+        try:
+            await self.catalog.load(session)
+        finally:
+            await session.close()
+
+    async def refresh_catalog(self) -> bool:
+        """Apply catalog rows changed since the last refresh"""
+        session = await self.get_session()
+        try:
+            return await self.catalog.refresh(session)
+        finally:
+            await session.close()
+
+    async def run_catalog_refresh(self, interval: float):
+        """Keep the catalog up to date until cancelled"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh_catalog()
+            except Exception as e:
+                logging.error(f"Error refreshing catalog: {e}")
+
+    async def get_user_id(self, telegram_id: int, session: Optional[AsyncSession] = None) -> Optional[int]:
+        """Resolve users.id for a Telegram ID through the identity cache"""
+        user_id = self.user_ids.get(telegram_id)
+        if user_id is not None:
+            return user_id or None
+
+        own_session = session is None
+        if own_session:
+            session = await self.get_session()
+        try:
+            result = await USER_ID_BY_TELEGRAM_ID.execute(session, {"telegram_id": telegram_id})
+            user = result.fetchone()
+        finally:
+            if own_session:
+                await session.close()
+
+        if not user:
+            self.user_ids.set(telegram_id, _NO_USER, ttl=Config.USER_CACHE_MISS_TTL_SECONDS)
+            return None
+
+        self.user_ids.set(telegram_id, user[0])
+        return user[0]
+
     async def add_or_update_user(self, telegram_id: int, username: str) -> tuple[bool, str | None]:
         """Add new user or update existing one"""
         session = await self.get_session()
         try:
             # Check if user exists
-            query = text("""
-                SELECT id FROM users 
-                WHERE telegram_id = :telegram_id
-            """)
-            result = await session.execute(query, {"telegram_id": telegram_id})
+            result = await USER_ID_BY_TELEGRAM_ID.execute(session, {"telegram_id": telegram_id})
             user = result.fetchone()
 
             if not user:
@@ -53,14 +316,18 @@ class Database:
                 query = text("""
                     INSERT INTO users (full_name, telegram_id, created_at) 
                     VALUES (:username, :telegram_id, CURRENT_TIMESTAMP)
+                    RETURNING id
                 """)
-                await session.execute(query, {
+                result = await session.execute(query, {
                     "username": username,
                     "telegram_id": telegram_id
                 })
+                user = result.fetchone()
                 await session.commit()
                 logging.info(f"New user added: {username} ({telegram_id})")
 
+            self.user_ids.set(telegram_id, user[0])
+
             return True, None
 
         except Exception as e:
@@ -70,44 +337,87 @@ class Database:
             await session.close()
     
     async def get_restaurants(self):
+        """Active restaurants as MenuOption(id, label) ordered by ID"""
+        if self.catalog.loaded:
+            return [
+                MenuOption(restaurant.id, self.catalog.label(restaurant))
+                for restaurant in self.catalog.get_restaurants()
+            ], None
+
         session = await self.get_session()
         try:
-            query = text("SELECT id, name FROM restaurants WHERE is_active = true")
+            query = text("SELECT id, name FROM restaurants WHERE is_active = true ORDER BY id")
             result = await session.execute(query)
-            return result.fetchall(), None
+            return [MenuOption(row.id, row.name) for row in result.fetchall()], None
         except Exception as e:
             logging.error(f"Ошибка при получении ресторанов: {e}")
             return None, "Xatolik yuz berdi."
         finally:
             await session.close()
 
-    async def get_categories(self, restaurant_name):
+    async def get_restaurant_by_label(self, label: str):
+        """
+        Resolve the restaurant button the user pressed.
+
+        Returns:
+            tuple[restaurant | None, str | None]: row with id, name, description,
+            startwork, endwork and delivery_cost, and an error message
+        """
+        if self.catalog.loaded:
+            restaurant = self.catalog.get_restaurant_by_label(label)
+            if not restaurant:
+                return None, "Restoran topilmadi."
+            return restaurant, None
+
         session = await self.get_session()
         try:
-            # Get restaurant ID with logging
-            query = text("SELECT id FROM restaurants WHERE name = :name AND is_active = true")
-            result = await session.execute(query, {"name": restaurant_name})
+            query = text("""
+                SELECT id, name, description, startwork, endwork, delivery_cost 
+                FROM restaurants 
+                WHERE name = :restaurant_name AND is_active = true
+                ORDER BY id
+                LIMIT 1
+            """)
+            result = await session.execute(query, {"restaurant_name": label})
             restaurant = result.fetchone()
-            
             if not restaurant:
-                logging.warning(f"Restaurant not found: {restaurant_name}")
-                return None, "Restoran topilmadi"
-            
-            # Get categories with logging
+                return None, "Restoran topilmadi."
+            return restaurant, None
+        except Exception as e:
+            logging.error(f"Error getting restaurant {label}: {e}")
+            return None, "Xatolik yuz berdi"
+        finally:
+            await session.close()
+
+    async def get_categories(self, restaurant_id: int):
+        """Active categories of a restaurant as MenuOption(id, label) ordered by ID"""
+        if self.catalog.loaded:
+            categories = [
+                MenuOption(category.id, self.catalog.label(category))
+                for category in self.catalog.get_categories(restaurant_id)
+            ]
+            if not categories:
+                logging.info(f"No categories found for restaurant: {restaurant_id}")
+                return None, "Bu restoranda kategoriyalar mavjud emas"
+
+            return categories, None
+
+        session = await self.get_session()
+        try:
             query = text("""
-                SELECT name 
+                SELECT id, name 
                 FROM categories
                 WHERE restaurant_id = :restaurant_id 
                 AND is_active = true
+                ORDER BY id
             """)
-            result = await session.execute(query, {"restaurant_id": restaurant[0]})
-            categories = result.fetchall()
+            result = await session.execute(query, {"restaurant_id": restaurant_id})
+            categories = [MenuOption(row.id, row.name) for row in result.fetchall()]
             
             if not categories:
-                logging.info(f"No categories found for restaurant: {restaurant_name}")
+                logging.info(f"No categories found for restaurant: {restaurant_id}")
                 return None, "Bu restoranda kategoriyalar mavjud emas"
                 
-            logging.info(f"Found {len(categories)} categories for restaurant {restaurant_name}")
             return categories, None
             
         except Exception as e:
@@ -116,43 +426,70 @@ class Database:
         finally:
             await session.close()
 
+    async def get_category_by_label(self, restaurant_id: int, label: str):
+        """
+        Resolve the category button the user pressed within a restaurant.
+
+        Returns:
+            tuple[category | None, str | None]: row with id and name, and an error message
+        """
+        if self.catalog.loaded:
+            category = self.catalog.get_category_by_label(restaurant_id, label)
+            if not category:
+                return None, "Kategoriya topilmadi"
+            return category, None
 
-    async def get_eats(self, restaurant_name, category_name):
         session = await self.get_session()
         try:
-            # Get restaurant ID
-            query = text("SELECT id FROM restaurants WHERE name = :name AND is_active = true")
-            result = await session.execute(query, {"name": restaurant_name})
-            restaurant = result.fetchone()
-            
-            if not restaurant:
-                logging.warning(f"Restaurant not found: {restaurant_name}")
-                return None, "Restoran topilmadi"
-            
-            # Get category ID and eats
             query = text("""
-                SELECT f.id, f.name 
-                FROM foods f
-                JOIN categories c ON f.category_id = c.id
-                WHERE f.restaurant_id = :restaurant_id 
-                AND c.name = :category_name 
-                AND f.is_active = true
+                SELECT id, name
+                FROM categories
+                WHERE restaurant_id = :restaurant_id
+                AND name = :name
+                AND is_active = true
+                ORDER BY id
+                LIMIT 1
+            """)
+            result = await session.execute(query, {"restaurant_id": restaurant_id, "name": label})
+            category = result.fetchone()
+            if not category:
+                return None, "Kategoriya topilmadi"
+            return category, None
+        except Exception as e:
+            logging.error(f"Error getting category {label}: {e}")
+            return None, "Xatolik yuz berdi"
+        finally:
+            await session.close()
+
+    async def get_eats(self, restaurant_id: int, category_id: int):
+        if self.catalog.loaded:
+            eats = self.catalog.get_eats(restaurant_id, category_id)
+            if not eats:
+                logging.info(f"No active eats found for category {category_id}")
+                return None, "Bu kategoriyada taomlar mavjud emas"
+
+            return eats, None
+
+        session = await self.get_session()
+        try:
+            query = text("""
+                SELECT id, name 
+                FROM foods
+                WHERE restaurant_id = :restaurant_id 
+                AND category_id = :category_id 
+                AND is_active = true
+                ORDER BY id
             """)
             result = await session.execute(query, {
-                "restaurant_id": restaurant[0],
-                "category_name": category_name
+                "restaurant_id": restaurant_id,
+                "category_id": category_id
             })
             eats = result.fetchall()
             
             if not eats:
-                logging.info(f"No active eats found for category {category_name}")
+                logging.info(f"No active eats found for category {category_id}")
                 return None, "Bu kategoriyada taomlar mavjud emas"
                 
-            # Convert to namedtuple for easier access
-            from collections import namedtuple
-            Food = namedtuple('Food', 'id name')
-            eats = [Food(id=eat[0], name=eat[1]) for eat in eats]
-            
             return eats, None
             
         except Exception as e:
@@ -161,26 +498,16 @@ class Database:
         finally:
             await session.close()
 
-    async def get_basket_items(self, telegram_id: int):
+    async def get_basket_items(self, telegram_id: int, user_db_id: Optional[int] = None):
         """Get user's basket items with restaurant information"""
         session = await self.get_session()
         try:
-            query = text("""
-                SELECT 
-                    c.id,
-                    f.name,
-                    c.quantity,
-                    f.price,
-                    f.restaurant_id
-                FROM cart c
-                JOIN foods f ON c.food_id = f.id
-                JOIN users u ON c.user_id = u.id
-                WHERE u.telegram_id = :telegram_id
-                AND f.is_active = true
-                AND c.quantity > 0  -- Добавляем проверку на количество
-                ORDER BY f.restaurant_id, f.name
-            """)
-            result = await session.execute(query, {"telegram_id": telegram_id})
+            if user_db_id is None:
+                user_db_id = await self.get_user_id(telegram_id, session)
+            if user_db_id is None:
+                return [], None
+
+            result = await BASKET_ITEMS.execute(session, {"user_id": user_db_id})
             items = result.fetchall()
             
             if not items:
@@ -192,19 +519,116 @@ class Database:
             return None, "Savatni olishda xatolik yuz berdi"
         finally:
             await session.close()
+
+    async def get_basket_view(self, telegram_id: int, user_db_id: Optional[int] = None,
+                              remove_cart_id: Optional[int] = None):
+        """
+        Get basket items together with their restaurants' hours and delivery costs
+        in a single statement, optionally deleting one cart row first.
+
+        Returns:
+            tuple[BasketView | None, str | None]: (basket view, error message)
+        """
+        session = await self.get_session()
+        try:
+            if user_db_id is None:
+                user_db_id = await self.get_user_id(telegram_id, session)
+            if user_db_id is None:
+                return BasketView([], {}, False), None
+
+            params = {"user_id": user_db_id}
+            if remove_cart_id is None:
+                query = BASKET_VIEW
+            else:
+                params["cart_id"] = remove_cart_id
+                query = BASKET_REMOVE_AND_VIEW
+
+            result = await query.execute(session, params)
+            rows = result.fetchall()
+
+            if remove_cart_id is not None:
+                await session.commit()
+
+            items = []
+            restaurants = {}
+            for row in rows:
+                if row.id is None:
+                    continue
+                items.append(BasketItem(row.id, row.name, row.quantity, row.price, row.restaurant_id))
+                restaurants.setdefault(row.restaurant_id, {
+                    "name": row.restaurant_name,
+                    "delivery_cost": row.delivery_cost or 0,
+                    "startwork": row.startwork,
+                    "endwork": row.endwork
+                })
+
+            removed = bool(rows and rows[0].removed)
+            return BasketView(items, restaurants, removed), None
+
+        except Exception as e:
+            logging.error(f"Error getting basket view: {e}")
+            await session.rollback()
+            return None, "Savatni olishda xatolik yuz berdi"
+        finally:
+            await session.close()
+
+    async def get_order_history(self, user_db_id: int, limit: int,
+                                before: Optional[tuple] = None,
+                                after: Optional[tuple] = None):
+        """
+        Get one page of a user's orders, newest first, each with its items.
+        Pages are addressed by keyset cursors on (created_at, id): pass the last
+        order's cursor as before for older orders, or the first one's as after
+        for newer orders.
+
+        Returns:
+            tuple[list | None, bool, str | None]: (orders, has_more, error message)
+            where has_more tells whether more orders exist in the requested direction
+        """
+        session = await self.get_session()
+        try:
+            params = {"user_id": user_db_id, "limit": limit + 1}
+            if after:
+                query = ORDER_HISTORY_NEWER
+                params["cursor_created_at"], params["cursor_id"] = after
+            elif before:
+                query = ORDER_HISTORY_OLDER
+                params["cursor_created_at"], params["cursor_id"] = before
+            else:
+                query = ORDER_HISTORY_FIRST
+
+            result = await query.execute(session, params)
+            orders = result.fetchall()
+
+            has_more = len(orders) > limit
+            orders = [
+                OrderHistoryEntry(
+                    order.id, order.total, order.status, order.created_at,
+                    json.loads(order.items) if isinstance(order.items, str) else order.items
+                )
+                for order in orders[:limit]
+            ]
+            if after:
+                orders.reverse()
+
+            return orders, has_more, None
+
+        except Exception as e:
+            logging.error(f"Error getting order history: {e}")
+            return None, False, "Buyurtmalarni olishda xatolik yuz berdi"
+        finally:
+            await session.close()
             
     async def select_eat_by_id(self, food_id: int):
+        if self.catalog.loaded:
+            eat = self.catalog.get_eat(food_id)
+            if not eat:
+                logging.warning(f"Food item not found: ID {food_id}")
+            return eat
+
         session = await self.get_session()
         try:
-            query = text("""
-                SELECT f.id, f.name, f.description, f.image, f.price,
-                       r.name as restaurant_name, c.name as category_name
-                FROM foods f
-                JOIN restaurants r ON f.restaurant_id = r.id
-                JOIN categories c ON f.category_id = c.id
-                WHERE f.id = :food_id AND f.is_active = true
-            """)
-            result = await session.execute(query, {"food_id": food_id})
+            result = await EAT_BY_ID.execute(session, {"food_id": food_id})
             eat = result.fetchone()
             
             if not eat:
@@ -224,35 +648,25 @@ class Database:
         if self._engine:
             await self._engine.dispose()
             
-    async def add_to_cart(self, user_id: int, eat_id: int, quantity: int) -> tuple[bool, str | None]:
+    async def add_to_cart(self, user_id: int, eat_id: int, quantity: int,
+                          user_db_id: Optional[int] = None) -> tuple[bool, str | None]:
         """Add or update item in cart"""
         session = await self.get_session()
         try:
             # First get user's database id from telegram_id
-            query = text("SELECT id FROM users WHERE telegram_id = :telegram_id")
-            result = await session.execute(query, {"telegram_id": user_id})
-            user = result.fetchone()
+            if user_db_id is None:
+                user_db_id = await self.get_user_id(user_id, session)
             
-            if not user:
+            if not user_db_id:
                 return False, "Foydalanuvchi topilmadi"
-                
-            user_db_id = user[0]
             
             # Check if food exists and is active
-            query = text("SELECT id FROM foods WHERE id = :food_id AND is_active = true")
-            result = await session.execute(query, {"food_id": eat_id})
+            result = await ACTIVE_FOOD_EXISTS.execute(session, {"food_id": eat_id})
             if not result.fetchone():
                 return False, "Kechirasiz, bu taom mavjud emas"
                 
             # Add or update cart item
-            query = text("""
-                INSERT INTO cart (user_id, food_id, quantity) 
-                VALUES (:user_id, :food_id, :quantity)
-                ON CONFLICT (user_id, food_id) 
-                DO UPDATE SET quantity = cart.quantity + :quantity
-            """)
-            
-            await session.execute(query, {
+            await ADD_TO_CART.execute(session, {
                 "user_id": user_db_id,
                 "food_id": eat_id,
                 "quantity": quantity
@@ -292,16 +706,16 @@ class Database:
             await session.close()
             
     async def add_user_address(self, telegram_id: int, address_name: str, 
-                         latitude: float, longitude: float) -> Optional[int]:
+                         latitude: float, longitude: float,
+                         user_db_id: Optional[int] = None) -> Optional[int]:
         """Add new address for user and return address ID"""
         session = await self.get_session()
         try:
             # Get user ID
-            query = text("SELECT id FROM users WHERE telegram_id = :telegram_id")
-            result = await session.execute(query, {"telegram_id": telegram_id})
-            user = result.fetchone()
+            if user_db_id is None:
+                user_db_id = await self.get_user_id(telegram_id, session)
             
-            if not user:
+            if not user_db_id:
                 return None
 
             # Insert new address
@@ -311,7 +725,7 @@ class Database:
                 RETURNING id
             """)
             result = await session.execute(query, {
-                "user_id": user[0],
+                "user_id": user_db_id,
                 "address_name": address_name,
                 "latitude": latitude,
                 "longitude": longitude
@@ -0,0 +1,266 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, Optional
+from weakref import WeakKeyDictionary
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from sqlalchemy.sql import text
+from config import Config
+from database.scope import current_scope
+from utils.cache import TTLCache
+
+SELECT_RECORD = text("""
+    SELECT state, data
+    FROM fsm_storage
+    WHERE key = :key
+    AND (expires_at IS NULL OR expires_at > NOW())
+""")
+
+UPSERT_RECORD = text("""
+    INSERT INTO fsm_storage (key, state, data, expires_at, updated_at)
+    VALUES (
+        :key,
+        :state,
+        CAST(:data AS JSONB),
+        CASE WHEN CAST(:ttl AS FLOAT) > 0
+             THEN NOW() + make_interval(secs => CAST(:ttl AS FLOAT))
+        END,
+        NOW()
+    )
+    ON CONFLICT (key) DO UPDATE SET
+        state = EXCLUDED.state,
+        data = EXCLUDED.data,
+        expires_at = EXCLUDED.expires_at,
+        updated_at = EXCLUDED.updated_at
+""")
+
+DELETE_RECORDS = text("DELETE FROM fsm_storage WHERE key = ANY(:keys)")
+
+PURGE_EXPIRED = text("DELETE FROM fsm_storage WHERE expires_at <= NOW()")
+
+_EMPTY = (None, {})
+
+
+class PostgresStorage(BaseStorage):
+    """
+    FSM storage kept in the fsm_storage table so several bot workers share state.
+
+    Writes go straight to Postgres in their own transaction, so the next
+    update of the user sees them on whichever worker it lands, and a handler
+    that later rolls back its own work keeps its state. Within one update a
+    record is read once and then served from memory.
+
+    cache_ttl and flush_interval trade that away for fewer round trips: a
+    process-wide read cache and writes flushed in batches after
+    flush_interval seconds. Both are only safe with a single worker.
+
+    Records that fail to store are retried after retry_delay seconds,
+    doubling up to max_retry_delay while Postgres keeps failing. Until a
+    retry succeeds, new writes queue behind it so they land in order.
+    """
+
+    def __init__(
+        self,
+        database,
+        ttl: float = 0,
+        state_ttls: Optional[Dict[str, float]] = None,
+        cache_ttl: float = 0,
+        cache_size: int = 10000,
+        flush_interval: float = 0,
+        retry_delay: float = 1,
+        max_retry_delay: float = 60,
+        purge_interval: float = 300
+    ):
+        self._db = database
+        self._ttl = ttl
+        self._state_ttls = state_ttls or {}
+        self._cache = TTLCache(maxsize=cache_size, ttl=cache_ttl) if cache_ttl > 0 else None
+        # update scope -> {storage_key: record} read or written during that update
+        self._update_records = WeakKeyDictionary()
+        self._pending = {}
+        self._flush_interval = flush_interval
+        self._retry_delay = retry_delay
+        self._max_retry_delay = max_retry_delay
+        self._failures = 0  # consecutive failed stores
+        self._flush_task = None
+        self._purge_interval = purge_interval
+        self._last_purge = time.monotonic()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        _, data = await self._get_record(key)
+        state = state.state if isinstance(state, State) else state
+        await self._write(key, state, data)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _ = await self._get_record(key)
+        return state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        state, _ = await self._get_record(key)
+        await self._write(key, state, data.copy())
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data = await self._get_record(key)
+        return data.copy()
+
+    async def close(self) -> None:
+        # Let a scheduled flush finish instead of cancelling it mid-write
+        if self._flush_task:
+            await self._flush_task
+        await self.flush()
+
+    async def flush(self):
+        """Write all pending records to Postgres"""
+        if not self._pending:
+            return
+
+        pending, self._pending = self._pending, {}
+        if await self._store(pending):
+            self._failures = 0
+            if self._pending:
+                self._schedule_flush(self._flush_interval)
+            return
+
+        # Keep newer writes made while flushing, retry the rest
+        for storage_key, record in pending.items():
+            self._pending.setdefault(storage_key, record)
+        self._schedule_retry()
+
+    async def _store(self, records: Dict[str, tuple]) -> bool:
+        """Upsert or delete the records in one transaction of their own"""
+        upserts = []
+        deletes = []
+        for storage_key, (state, data) in records.items():
+            if state is None and not data:
+                deletes.append(storage_key)
+            else:
+                upserts.append({
+                    "key": storage_key,
+                    "state": state,
+                    "data": json.dumps(data),
+                    "ttl": self._state_ttls.get(state, self._ttl)
+                })
+
+        session = await self._db.get_session(scoped=False)
+        try:
+            if upserts:
+                await session.execute(UPSERT_RECORD, upserts)
+            if deletes:
+                await session.execute(DELETE_RECORDS, {"keys": deletes})
+            if time.monotonic() - self._last_purge > self._purge_interval:
+                await session.execute(PURGE_EXPIRED)
+                self._last_purge = time.monotonic()
+            await session.commit()
+            return True
+        except Exception as e:
+            logging.error(f"Error writing FSM storage: {e}")
+            await session.rollback()
+            return False
+        finally:
+            await session.close()
+
+    async def _get_record(self, key: StorageKey) -> tuple[Optional[str], Dict[str, Any]]:
+        storage_key = self._build_key(key)
+        records = self._records()
+
+        record = self._pending.get(storage_key) or records.get(storage_key)
+        if record is None and self._cache is not None:
+            record = self._cache.get(storage_key)
+        if record is not None:
+            return record
+
+        session = await self._db.get_session(scoped=False)
+        try:
+            result = await session.execute(SELECT_RECORD, {"key": storage_key})
+            row = result.fetchone()
+        finally:
+            await session.close()
+
+        if row:
+            data = json.loads(row.data) if isinstance(row.data, str) else (row.data or {})
+            record = (row.state, data)
+        else:
+            record = _EMPTY
+
+        records[storage_key] = record
+        if self._cache is not None:
+            self._cache.set(storage_key, record)
+        return record
+
+    async def _write(self, key: StorageKey, state: Optional[str], data: Dict[str, Any]):
+        storage_key = self._build_key(key)
+        record = (state, data)
+        self._records()[storage_key] = record
+        if self._cache is not None:
+            self._cache.set(storage_key, record)
+
+        if self._flush_interval > 0 or self._failures:
+            self._pending[storage_key] = record
+            if not self._failures:
+                self._schedule_flush(self._flush_interval)
+        elif not await self._store({storage_key: record}):
+            # Not lost: retried in the background with backoff
+            self._pending[storage_key] = record
+            self._schedule_retry()
+
+    def _records(self) -> dict:
+        """Records seen by the current update; a throwaway dict outside one"""
+        scope = current_scope.get()
+        if scope is None or not scope.active():
+            return {}
+        return self._update_records.setdefault(scope, {})
+
+    def _schedule_retry(self):
+        self._failures += 1
+        delay = min(self._retry_delay * 2 ** (self._failures - 1), self._max_retry_delay)
+        self._schedule_flush(delay)
+
+    def _schedule_flush(self, delay: float):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later(delay))
+
+    async def _flush_later(self, delay: float):
+        await asyncio.sleep(delay)
+        self._flush_task = None
+        await self.flush()
+
+    @staticmethod
+    def _build_key(key: StorageKey) -> str:
+        return ":".join(str(part) if part is not None else "" for part in (
+            key.bot_id,
+            key.chat_id,
+            key.thread_id,
+            key.user_id,
+            getattr(key, "business_connection_id", None),
+            key.destiny
+        ))
+
+
+def create_storage(database) -> BaseStorage:
+    """Build the FSM storage selected by Config.FSM_STORAGE"""
+    if Config.FSM_STORAGE == "memory":
+        return MemoryStorage()
+
+    if Config.FSM_STORAGE == "redis":
+        # Optional dependency, only needed when Redis is selected
+        from aiogram.fsm.storage.redis import RedisStorage
+        return RedisStorage.from_url(
+            Config.REDIS_URL,
+            state_ttl=Config.FSM_TTL_SECONDS or None,
+            data_ttl=Config.FSM_TTL_SECONDS or None
+        )
+
+    if Config.FSM_STORAGE == "postgres":
+        return PostgresStorage(
+            database,
+            ttl=Config.FSM_TTL_SECONDS,
+            cache_ttl=Config.FSM_CACHE_TTL_SECONDS,
+            flush_interval=Config.FSM_FLUSH_INTERVAL_SECONDS,
+            retry_delay=Config.FSM_RETRY_SECONDS,
+            max_retry_delay=Config.FSM_MAX_RETRY_SECONDS
+        )
+
+    raise ValueError(f"Unknown FSM storage: {Config.FSM_STORAGE}")
@@ -1,4 +1,5 @@
 from sqlalchemy import *
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
@@ -31,6 +32,10 @@ class Address(Base):
     
     user = relationship("User", back_populates="addresses")
 
+    __table_args__ = (
+        Index('ix_addresses_user_name', 'user_id', 'address_name'),
+    )
+
 class Restaurant(Base):
     __tablename__ = 'restaurants'
     
@@ -47,9 +52,48 @@ class Restaurant(Base):
     startwork = Column(Time)
     endwork = Column(Time)
     delivery_cost = Column(Float, default=0)
+    # Own delivery area: a [[lat, lon], ...] polygon wins over the radius;
+    # with neither the restaurant delivers anywhere in the city area
+    delivery_radius_km = Column(Float)
+    delivery_zone = Column(JSONB)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
     categories = relationship("Category", back_populates="restaurant", cascade="all, delete")
     foods = relationship("Food", back_populates="restaurant", cascade="all, delete")
 
+    __table_args__ = (
+        Index('ix_restaurants_name_active', 'name', postgresql_where=text('is_active = true')),
+    )
+
+class RestaurantHours(Base):
+    __tablename__ = 'restaurant_hours'
+
+    # Per-weekday hours replacing startwork/endwork; weekday 0 is Monday and
+    # closes_at at or before opens_at runs past midnight
+    id = Column(Integer, primary_key=True)
+    restaurant_id = Column(Integer, ForeignKey('restaurants.id', ondelete="CASCADE"), nullable=False)
+    weekday = Column(SmallInteger, nullable=False)
+    opens_at = Column(Time, nullable=False)
+    closes_at = Column(Time, nullable=False)
+
+    __table_args__ = (
+        Index('ix_restaurant_hours_restaurant', 'restaurant_id'),
+    )
+
+class RestaurantHoliday(Base):
+    __tablename__ = 'restaurant_holidays'
+
+    # restaurant_id NULL applies to every restaurant; without times the day is off
+    id = Column(Integer, primary_key=True)
+    restaurant_id = Column(Integer, ForeignKey('restaurants.id', ondelete="CASCADE"), nullable=True)
+    day = Column(Date, nullable=False)
+    opens_at = Column(Time, nullable=True)
+    closes_at = Column(Time, nullable=True)
+    note = Column(String(255))
+
+    __table_args__ = (
+        Index('ix_restaurant_holidays_day', 'day'),
+    )
+
 class Category(Base):
     __tablename__ = 'categories'
     
@@ -57,10 +101,15 @@ class Category(Base):
     name = Column(String(100), nullable=False)
     restaurant_id = Column(Integer, ForeignKey('restaurants.id', ondelete="CASCADE"), nullable=False)
     is_active = Column(Boolean, default=True)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
     
     restaurant = relationship("Restaurant", back_populates="categories")
     foods = relationship("Food", back_populates="category", cascade="all, delete")
 
+    __table_args__ = (
+        Index('ix_categories_restaurant_active', 'restaurant_id', postgresql_where=text('is_active = true')),
+    )
+
 class Food(Base):
     __tablename__ = 'foods'
     
@@ -72,12 +121,18 @@ class Food(Base):
     restaurant_id = Column(Integer, ForeignKey('restaurants.id', ondelete="CASCADE"), nullable=False)
     category_id = Column(Integer, ForeignKey('categories.id', ondelete="CASCADE"), nullable=False)
     is_active = Column(Boolean, default=True)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
     
     restaurant = relationship("Restaurant", back_populates="foods")
     category = relationship("Category", back_populates="foods")
     cart_items = relationship("Cart", back_populates="food", cascade="all, delete")
     order_items = relationship("OrderItem", back_populates="food", cascade="all, delete")
 
+    __table_args__ = (
+        Index('ix_foods_restaurant_category_active', 'restaurant_id', 'category_id',
+              postgresql_where=text('is_active = true')),
+    )
+
 class Cart(Base):
     __tablename__ = 'cart'
     
@@ -104,7 +159,8 @@ class Order(Base):
     cancellation_reason = Column(String(255), nullable=True)
     latitude = Column(Float)
     longitude = Column(Float)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    # Order history pages by (created_at, id), so it is never NULL
+    created_at = Column(DateTime, default=datetime.utcnow, server_default=func.now(), nullable=False)
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now()) 
     restaurant_id = Column(Integer, ForeignKey('restaurants.id', ondelete="SET NULL"))
     active_delivery_person_id = Column(Integer, ForeignKey('delivery_persons.id', ondelete="SET NULL"))
@@ -113,6 +169,13 @@ class Order(Base):
     user = relationship("User", back_populates="orders")
     items = relationship("OrderItem", back_populates="order", cascade="all, delete")
 
+    __table_args__ = (
+        # Matches the keyset order of the order history pages
+        Index('ix_orders_user_created', 'user_id', 'created_at', 'id'),
+        Index('ix_orders_restaurant_status', 'restaurant_id', 'status'),
+        Index('ix_orders_courier_status', 'active_delivery_person_id', 'status'),
+    )
+
 class OrderItem(Base):
     __tablename__ = 'order_items'
     
@@ -126,6 +189,10 @@ class OrderItem(Base):
     order = relationship("Order", back_populates="items")
     food = relationship("Food", back_populates="order_items")
 
+    __table_args__ = (
+        Index('ix_order_items_order_id', 'order_id'),
+    )
+
 class DeliveryPerson(Base):
     __tablename__ = 'delivery_persons'
     
@@ -145,4 +212,97 @@ class DeliveryMessage(Base):
     type = Column(String(50), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     
-    order = relationship("Order", back_populates="delivery_messages")
\ No newline at end of file
+    order = relationship("Order", back_populates="delivery_messages")
+
+class OrderStatusHistory(Base):
+    __tablename__ = 'order_status_history'
+
+    id = Column(BigInteger, primary_key=True)
+    order_id = Column(Integer, ForeignKey('orders.id', ondelete="CASCADE"), nullable=False)
+    from_status = Column(String(50), nullable=True)
+    to_status = Column(String(50), nullable=False)
+    actor_telegram_id = Column(BIGINT, nullable=True)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index('ix_order_status_history_order_created', 'order_id', 'created_at'),
+        Index('ix_order_status_history_created', 'created_at'),
+    )
+
+class FSMRecord(Base):
+    __tablename__ = 'fsm_storage'
+
+    key = Column(String(255), primary_key=True)
+    state = Column(String(255), nullable=True)
+    data = Column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))
+    expires_at = Column(DateTime, nullable=True, index=True)
+    updated_at = Column(DateTime, server_default=func.now())
+
+
+class NotificationOutbox(Base):
+    __tablename__ = 'notification_outbox'
+
+    id = Column(BigInteger, primary_key=True)
+    chat_id = Column(BIGINT, nullable=False)
+    text = Column(Text, nullable=False)
+    reply_markup = Column(JSONB, nullable=True)
+    order_id = Column(Integer, ForeignKey('orders.id', ondelete="CASCADE"), nullable=True)
+    message_type = Column(String(50), nullable=True)
+    status = Column(String(20), nullable=False, server_default='pending')
+    attempts = Column(Integer, nullable=False, server_default='0')
+    available_at = Column(DateTime, nullable=False, server_default=func.now())
+    last_error = Column(Text, nullable=True)
+    message_id = Column(BigInteger, nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index('ix_notification_outbox_due', 'available_at', postgresql_where=text("status = 'pending'")),
+    )
+
+
+class TelegramFile(Base):
+    __tablename__ = 'telegram_files'
+
+    id = Column(Integer, primary_key=True)
+    path = Column(String(255), nullable=False)
+    content_hash = Column(String(64), nullable=False)
+    file_id = Column(String(255), nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint('path', 'content_hash', name='uix_telegram_file_path_hash'),
+    )
+
+
+class FoodCardStep(Base):
+    __tablename__ = 'food_card_steps'
+
+    # Quantity chosen on a food card message, shared by all workers; shown is
+    # the quantity its caption and buttons were last rendered with
+    chat_id = Column(BIGINT, primary_key=True)
+    message_id = Column(BigInteger, primary_key=True)
+    quantity = Column(Integer, nullable=False)
+    shown = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index('ix_food_card_steps_updated', 'updated_at'),
+    )
+
+
+class DeliveryOffer(Base):
+    __tablename__ = 'delivery_offers'
+
+    # Exclusive offers of an order to one courier; pending until the courier
+    # answers or it runs out, so any worker can record a decline
+    order_id = Column(Integer, ForeignKey('orders.id', ondelete="CASCADE"), primary_key=True)
+    courier_telegram_id = Column(BIGINT, primary_key=True)
+    status = Column(String(20), nullable=False, server_default='pending')
+    offered_at = Column(DateTime, nullable=False, server_default=func.now())
+    answered_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index('ix_delivery_offers_courier_pending', 'courier_telegram_id',
+              postgresql_where=text("status = 'pending'")),
+    )
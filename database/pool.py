@@ -0,0 +1,72 @@
+import math
+import time
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from core.latency import add_db_time
+from core.metrics import registry
+
+POOL_CHECKOUTS = registry.counter("db_pool_checkouts_total", "Connections checked out of the pool")
+POOL_OVERFLOW_CHECKOUTS = registry.counter(
+    "db_pool_overflow_checkouts_total", "Checkouts made while overflow connections were open"
+)
+POOL_TIMEOUTS = registry.counter("db_pool_timeouts_total", "Checkouts that gave up after pool_timeout")
+POOL_WAIT = registry.histogram("db_pool_wait_seconds", "Time spent getting a connection from the pool")
+POOL_IN_USE = registry.gauge("db_pool_in_use", "Connections currently checked out")
+POOL_WAITING = registry.gauge("db_pool_waiting", "Checkouts currently waiting for a connection")
+POOL_OVERFLOW = registry.gauge("db_pool_overflow", "Overflow connections beyond pool_size")
+POOL_MAX_OVERFLOW = registry.gauge("db_pool_max_overflow", "Current max_overflow, changed by adaptive sizing")
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """
+    Queue pool that reports checkouts, wait time, overflow and timeouts, and
+    remembers the highest concurrent use since the last adjust_overflow().
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.peak_in_use = 0
+        POOL_MAX_OVERFLOW.set(self._max_overflow)
+
+    def _do_get(self):
+        POOL_WAITING.inc()
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            POOL_TIMEOUTS.inc()
+            raise
+        finally:
+            POOL_WAITING.dec()
+            waited = time.perf_counter() - started
+            POOL_WAIT.observe(waited)
+            add_db_time(waited)
+
+        in_use = self.checkedout()
+        self.peak_in_use = max(self.peak_in_use, in_use)
+        POOL_CHECKOUTS.inc()
+        POOL_IN_USE.set(in_use)
+        if self.overflow() > 0:
+            POOL_OVERFLOW_CHECKOUTS.inc()
+        POOL_OVERFLOW.set(max(self.overflow(), 0))
+        return connection
+
+    def _do_return_conn(self, record):
+        super()._do_return_conn(record)
+        POOL_IN_USE.set(self.checkedout())
+        POOL_OVERFLOW.set(max(self.overflow(), 0))
+
+    def adjust_overflow(self, max_connections: int, headroom: float) -> int:
+        """
+        Size max_overflow from the peak concurrency seen since the last call.
+        Grows at once, shrinks by one connection per call. Returns the new value.
+        """
+        target = math.ceil(self.peak_in_use * headroom) - self.size()
+        target = min(max(target, 0), max(max_connections - self.size(), 0))
+        if target < self._max_overflow:
+            target = self._max_overflow - 1
+
+        self._max_overflow = target
+        self.peak_in_use = self.checkedout()
+        POOL_MAX_OVERFLOW.set(target)
+        return target
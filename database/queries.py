@@ -0,0 +1,54 @@
+import time
+from typing import Any, Optional
+from sqlalchemy.sql import text
+from core.metrics import registry
+
+QUERY_LATENCY = registry.histogram("db_query_seconds", "Execution time of registered queries", ("query",))
+QUERY_ERRORS = registry.counter("db_query_errors_total", "Registered queries that raised", ("query",))
+
+_queries = {}
+
+
+class Query:
+    """
+    A named statement built once at import time.
+
+    Every execution sends the exact same SQL text, so the asyncpg dialect's
+    per-connection prepared statement cache (DB_PREPARED_STATEMENT_CACHE_SIZE)
+    serves it without another parse and plan after the first call.
+    """
+
+    def __init__(self, name: str, sql: str):
+        self.name = name
+        self.sql = sql
+        self.statement = text(sql)
+
+    async def execute(self, session, params: Optional[Any] = None):
+        started = time.perf_counter()
+        try:
+            return await session.execute(self.statement, params or {})
+        except Exception:
+            QUERY_ERRORS.inc(query=self.name)
+            raise
+        finally:
+            QUERY_LATENCY.observe(time.perf_counter() - started, query=self.name)
+
+    def __repr__(self) -> str:
+        return f"Query({self.name!r})"
+
+
+def register(name: str, sql: str) -> Query:
+    """Add a query to the registry; names must be unique"""
+    if name in _queries:
+        raise ValueError(f"Query already registered: {name}")
+    query = Query(name, sql)
+    _queries[name] = query
+    return query
+
+
+def get_query(name: str) -> Query:
+    return _queries[name]
+
+
+def registered_queries() -> list[Query]:
+    return list(_queries.values())
@@ -0,0 +1,119 @@
+import asyncio
+from contextvars import ContextVar
+import logging
+from typing import Callable, Optional
+from sqlalchemy.exc import DBAPIError
+from core.latency import db_span
+from core.metrics import registry
+
+UPDATE_SCOPES = registry.counter(
+    "db_update_scopes_total", "Updates handled inside a session scope, by outcome", ("outcome",)
+)
+
+current_scope: ContextVar[Optional["UpdateScope"]] = ContextVar("db_update_scope", default=None)
+
+
+class ScopedSession:
+    """
+    AsyncSession proxy handed out by Database.get_session() inside an update scope.
+
+    commit() commits the scope's transaction and runs its commit callbacks,
+    and close() does nothing, so the code written for one session per call
+    keeps working: what a handler committed stays committed whatever happens
+    after. rollback(), and a database error, which leaves Postgres refusing
+    further statements in the transaction, discard only the work since the
+    last commit.
+    """
+
+    def __init__(self, scope: "UpdateScope"):
+        self._scope = scope
+
+    def __getattr__(self, name):
+        return getattr(self._scope.session, name)
+
+    async def execute(self, *args, **kwargs):
+        try:
+            return await self._scope.session.execute(*args, **kwargs)
+        except DBAPIError:
+            await self._scope.rollback()
+            raise
+
+    async def commit(self):
+        await self._scope.commit()
+
+    async def rollback(self):
+        await self._scope.rollback()
+
+    async def close(self):
+        pass
+
+
+class UpdateScope:
+    """One lazily opened session shared by everything an update does"""
+
+    def __init__(self, session_factory):
+        self._session_factory = session_factory
+        # Tasks spawned during the update inherit the context variable but
+        # must not share the session, so only the owning task uses the scope
+        self._owner = asyncio.current_task()
+        self._after_commit = []
+        self._committed = False
+        self.session = None
+        self.closed = False
+
+    def active(self) -> bool:
+        return not self.closed and asyncio.current_task() is self._owner
+
+    def get_session(self) -> ScopedSession:
+        if self.session is None:
+            self.session = self._session_factory()
+        return ScopedSession(self)
+
+    def on_commit(self, callback: Callable[[], None]):
+        # Nothing uncommitted to wait for, e.g. right after a handler's commit
+        if self.session is None or not self.session.in_transaction():
+            callback()
+            return
+        self._after_commit.append(callback)
+
+    async def commit(self):
+        """Commit what the update has done so far and run its commit callbacks"""
+        if self.session is not None and self.session.in_transaction():
+            async with db_span():
+                await self.session.commit()
+            self._committed = True
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            callback()
+
+    async def rollback(self):
+        """Discard the work since the last commit and the callbacks waiting on it"""
+        if self.session is not None:
+            await self.session.rollback()
+        self._after_commit.clear()
+
+    async def finish(self, commit: bool):
+        self.closed = True
+        if self.session is None or not self.session.in_transaction():
+            UPDATE_SCOPES.inc(outcome="commit" if self._committed else "empty")
+            if self.session is not None:
+                await self.session.close()
+        else:
+            try:
+                async with db_span():
+                    if commit:
+                        await self.session.commit()
+                    else:
+                        await self.session.rollback()
+                UPDATE_SCOPES.inc(outcome="commit" if commit else "rollback")
+            except Exception as e:
+                logging.error(f"Error committing update session: {e}")
+                UPDATE_SCOPES.inc(outcome="rollback")
+                await self.session.rollback()
+                self._after_commit.clear()
+            finally:
+                await self.session.close()
+
+        if commit:
+            for callback in self._after_commit:
+                callback()
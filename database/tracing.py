@@ -0,0 +1,191 @@
+"""
+Statement tracing on the SQLAlchemy engine.
+
+Every statement is timed between before_cursor_execute and
+after_cursor_execute and attributed to the project function that issued it,
+found by walking the stack out of SQLAlchemy's greenlet into the awaiting
+coroutines. Timings go to db_statement_seconds{call_site}. Statements slower
+than SLOW_QUERY_MS are logged with their parameters redacted to types, and
+the slowest SLOW_QUERY_TOP_N of the last two SLOW_QUERY_WINDOW_SECONDS
+windows are kept for /slow-queries on the metrics server.
+"""
+import heapq
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Optional
+from greenlet import getcurrent
+from sqlalchemy import event
+from core.metrics import registry
+
+STATEMENT_LATENCY = registry.histogram(
+    "db_statement_seconds", "Execution time of every statement by calling function", ("call_site",)
+)
+SLOW_STATEMENTS = registry.counter(
+    "db_slow_statements_total", "Statements slower than SLOW_QUERY_MS by calling function", ("call_site",)
+)
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+# Plumbing between a caller and the driver, never the call site itself
+_SKIPPED_FILES = {
+    os.path.join(_PROJECT_ROOT, "database", name)
+    for name in ("tracing.py", "queries.py", "scope.py", "pool.py")
+} | {os.path.join(_PROJECT_ROOT, "core", "latency.py")}
+_MAX_STATEMENT_LENGTH = 500
+
+
+def call_site() -> str:
+    """module:function of the innermost project frame, across greenlet boundaries"""
+    frame = sys._getframe(1)
+    glet = getcurrent()
+    while True:
+        while frame is not None:
+            filename = frame.f_code.co_filename
+            if (filename.startswith(_PROJECT_ROOT) and filename not in _SKIPPED_FILES
+                    and "site-packages" not in filename):
+                module = os.path.splitext(filename[len(_PROJECT_ROOT):])[0].replace(os.sep, ".")
+                return f"{module}:{frame.f_code.co_name}"
+            frame = frame.f_back
+        # SQLAlchemy runs the driver in a child greenlet; the awaiting
+        # coroutines are suspended in its parent
+        glet = glet.parent
+        if glet is None:
+            return "unknown"
+        frame = glet.gr_frame
+
+
+def redact(parameters) -> str:
+    """Parameter types and sizes without their values"""
+    if parameters is None:
+        return "()"
+    if isinstance(parameters, list):
+        return f"[{len(parameters)} rows of {redact(parameters[0]) if parameters else '()'}]"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{name}: {_describe(value)}" for name, value in parameters.items()) + "}"
+    return "(" + ", ".join(_describe(value) for value in parameters) + ")"
+
+
+def _describe(value) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, (str, bytes, list, tuple, dict)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+
+def _normalize(statement: str) -> str:
+    statement = " ".join(statement.split())
+    if len(statement) > _MAX_STATEMENT_LENGTH:
+        statement = statement[:_MAX_STATEMENT_LENGTH] + "..."
+    return statement
+
+
+class SlowQueryLog:
+    """
+    The slowest statements of the current and previous window.
+
+    Each window keeps a min-heap of at most top_n entries, so recording is
+    O(log top_n) and a fast statement only costs a comparison with the root.
+    """
+
+    def __init__(self, top_n: int, window_seconds: float):
+        self.top_n = top_n
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._window_started = time.monotonic()
+        self._current = []
+        self._previous = []
+        self._sequence = 0  # tie breaker, entries themselves do not compare
+
+    def record(self, seconds: float, statement: str, parameters: str, site: str):
+        with self._lock:
+            self._rotate()
+            if len(self._current) >= self.top_n and seconds <= self._current[0][0]:
+                return
+            self._sequence += 1
+            entry = (seconds, self._sequence, {
+                "ms": round(seconds * 1000, 1),
+                "call_site": site,
+                "statement": _normalize(statement),
+                "parameters": parameters,
+                "at": time.strftime("%Y-%m-%d %H:%M:%S")
+            })
+            if len(self._current) < self.top_n:
+                heapq.heappush(self._current, entry)
+            else:
+                heapq.heapreplace(self._current, entry)
+
+    def top(self) -> list[dict]:
+        with self._lock:
+            self._rotate()
+            entries = self._current + self._previous
+        return [entry for _, _, entry in heapq.nlargest(self.top_n, entries)]
+
+    def _rotate(self):
+        now = time.monotonic()
+        if now - self._window_started < self.window_seconds:
+            return
+        # An idle period longer than a window leaves nothing worth keeping
+        self._previous = self._current if now - self._window_started < 2 * self.window_seconds else []
+        self._current = []
+        self._window_started = now
+
+
+class QueryTracer:
+    def __init__(self, slow_ms: float, top_n: int, window_seconds: float):
+        self.slow_seconds = slow_ms / 1000 if slow_ms else None
+        self.slow_queries = SlowQueryLog(top_n, window_seconds)
+
+    def install(self, engine):
+        sync_engine = getattr(engine, "sync_engine", engine)
+        event.listen(sync_engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(sync_engine, "handle_error", self._handle_error)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("trace_started", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("trace_started")
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        site = call_site()
+        STATEMENT_LATENCY.observe(elapsed, call_site=site)
+
+        if self.slow_seconds is not None and elapsed >= self.slow_seconds:
+            redacted = redact(parameters)
+            SLOW_STATEMENTS.inc(call_site=site)
+            self.slow_queries.record(elapsed, statement, redacted, site)
+            logging.warning(
+                f"Slow query {elapsed * 1000:.0f} ms in {site}: {_normalize(statement)} params {redacted}"
+            )
+
+    def _handle_error(self, exception_context):
+        connection = exception_context.connection
+        if connection is not None and exception_context.cursor is not None:
+            started = connection.info.get("trace_started")
+            if started:
+                started.pop()
+
+    def top(self) -> list[dict]:
+        return self.slow_queries.top()
+
+
+_tracer: Optional[QueryTracer] = None
+
+
+def install(engine, slow_ms: float, top_n: int, window_seconds: float) -> QueryTracer:
+    """Trace the engine's statements; one tracer per process"""
+    global _tracer
+    if _tracer is None:
+        _tracer = QueryTracer(slow_ms, top_n, window_seconds)
+    _tracer.install(engine)
+    return _tracer
+
+
+def slow_queries() -> list[dict]:
+    """Slowest recent statements, slowest first; empty before install()"""
+    return _tracer.top() if _tracer else []
@@ -1,6 +1,7 @@
 from keyboards.reply import main_menu
 from aiogram import Dispatcher, Bot, types
 from aiogram.fsm.context import FSMContext
+import asyncio
 import logging
 from aiogram.filters import StateFilter
 from states.states import OrderState
@@ -8,40 +9,12 @@ from keyboards.restaurants_buttons import *
 from typing import Union
 from keyboards.basket import *
 from database.db import db
+from database.queries import register
+from utils.schedule import DailyHours
+from config import Config
+from core.photo_cache import photo_cache
 from sqlalchemy import text
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
-from datetime import datetime
-import pytz
-from datetime import datetime, time, timedelta
-
-def is_restaurant_open(current_time: time, start_time: time, end_time: time) -> bool:
-    if not all([current_time, start_time, end_time]):
-        return False
-        
-    if end_time < start_time:
-        return current_time >= start_time or current_time <= end_time
-    
-    return start_time <= current_time <= end_time
-
-def get_next_open_time(current_time: time, start_time: time, end_time: time) -> str:
-    if not all([current_time, start_time, end_time]):
-        return "Ish vaqti noaniq"
-
-    if is_restaurant_open(current_time, start_time, end_time):
-        return ""
-
-    # Format times for display
-    start_str = start_time.strftime("%H:%M")
-    
-    # If current time is after closing, next opening is tomorrow
-    if current_time > end_time:
-        return f"Ertaga soat {start_str}"
-    
-    # If current time is before opening, opening is today
-    if current_time < start_time:
-        return f"Bugun soat {start_str}"
-        
-    return f"Ertaga soat {start_str}"
 
 async def back_to_main_menu(message: types.Message, state: FSMContext):
     await state.clear()
@@ -68,13 +41,13 @@ async def back(message: types.Message, state: FSMContext):
             
         elif current_state == OrderState.selecting_food:
             # Return to category selection
-            restaurant_name = data.get('restaurant')
-            if not restaurant_name:
-                logging.error("Restaurant name not found in state data")
+            restaurant_id = data.get('restaurant_id')
+            if not restaurant_id:
+                logging.error("Restaurant id not found in state data")
                 await back_to_main_menu(message, state)
                 return
                 
-            buttons, error = await create_category_buttons(restaurant_name)
+            buttons, error = await create_category_buttons(restaurant_id)
             if error:
                 await message.answer(error)
                 await back_to_main_menu(message, state)
@@ -92,109 +65,108 @@ async def back(message: types.Message, state: FSMContext):
         await message.answer("Xatolik yuz berdi. Iltimos qaytadan urinib ko'ring.")
         await back_to_main_menu(message, state)
 
-async def calculate_basket_totals(items):
-    """Calculate basket totals including delivery costs"""
+async def get_basket_restaurants(items) -> dict | None:
+    """Get name, delivery cost and working hours of the restaurants in the basket"""
+    rest_ids = list(set(item[4] for item in items if item[4] is not None))
+    if not rest_ids:
+        return None
+
+    session = await db.get_session()
+    try:
+        query = text("""
+            SELECT id, name, delivery_cost, startwork, endwork 
+            FROM restaurants 
+            WHERE id = ANY(:rest_ids)
+        """)
+        result = await session.execute(query, {"rest_ids": rest_ids})
+        return {r[0]: {
+            "name": r[1], 
+            "delivery_cost": r[2] or 0,
+            "startwork": r[3],
+            "endwork": r[4]
+        } for r in result}
+    finally:
+        await session.close()
+
+async def calculate_basket_totals(items, restaurants: dict | None = None):
+    """
+    Calculate basket totals including delivery costs.
+    Pass restaurants from Database.get_basket_view to skip the restaurant lookup.
+    """
     try:
         if not items:
             return "Sizning savatingiz bo'sh 🛒", 0, 0
 
-        session = await db.get_session()
-        try:
-            # Get current time in Tashkent
-            tz = pytz.timezone('Asia/Tashkent')
-            current_time = datetime.now(tz).time()
-            
-            # Get restaurant information including working hours
-            rest_ids = list(set(item[4] for item in items if item[4] is not None))
-            if not rest_ids:
-                return "Xatolik: Restoran ma'lumotlari topilmadi", 0, 0
-                
-            query = text("""
-                SELECT id, name, delivery_cost, startwork, endwork 
-                FROM restaurants 
-                WHERE id = ANY(:rest_ids)
-            """)
-            result = await session.execute(query, {"rest_ids": rest_ids})
-            restaurants = {r[0]: {
-                "name": r[1], 
-                "delivery_cost": r[2] or 0,
-                "startwork": r[3],
-                "endwork": r[4]
-            } for r in result}
-
-            message = "🛒 Sizning savatingiz:\n\n"
-            current_rest_id = None
-            closed_restaurants = []
-            total_sum = 0
-
-            # Process items and check restaurant hours
-            for item in sorted(items, key=lambda x: (x[4] or 0)):
-                cart_id, name, quantity, price, rest_id = item
-                
-                if not all([name, quantity, price, rest_id]):
-                    continue
+        # Get restaurant information including working hours
+        if restaurants is None:
+            restaurants = await get_basket_restaurants(items)
+        if not restaurants:
+            return "Xatolik: Restoran ma'lumotlari topilmadi", 0, 0
 
-                rest_info = restaurants.get(rest_id)
-                if not rest_info:
-                    continue
+        schedule = db.catalog.schedule_for(
+            DailyHours(rest_id, info['startwork'], info['endwork'])
+            for rest_id, info in restaurants.items()
+        )
 
-                is_open = is_restaurant_open(
-                    current_time, 
-                    rest_info['startwork'], 
-                    rest_info['endwork']
-                )
+        message = "🛒 Sizning savatingiz:\n\n"
+        current_rest_id = None
+        closed_restaurants = []
+        total_sum = 0
+
+        # Process items and check restaurant hours
+        for item in sorted(items, key=lambda x: (x[4] or 0)):
+            cart_id, name, quantity, price, rest_id = item
+
+            if not all([name, quantity, price, rest_id]):
+                continue
 
-                if not is_open and rest_id not in closed_restaurants:
-                    closed_restaurants.append(rest_id)
-                    next_open = get_next_open_time(
-                        current_time,
-                        rest_info['startwork'],
-                        rest_info['endwork']
-                    )
-                    message += f"\n⚠️ {rest_info['name']} hozir yopiq! {next_open} da ochiladi.\n"
-                    continue
-
-                try:
-                    quantity = int(quantity)
-                    price = float(price)
-                    item_total = quantity * price
-                    
-                    if current_rest_id != rest_id:
-                        current_rest_id = rest_id
-                        message += f"\n🏪 {rest_info['name']}:\n"
-                    
-                    if rest_id not in closed_restaurants:
-                        total_sum += item_total
-                        message += f"  {name}\n    {quantity} x {price:,.0f} = {item_total:,.0f} so'm\n"
-                    
-                except (ValueError, TypeError) as e:
-                    logging.error(f"Error processing item {name}: {e}")
-                    continue
-
-            # Add delivery costs for open restaurants only
-            if restaurants:
-                message += "\n🚚 Yetkazib berish:\n"
-                delivery_total = 0
-                for rest_id, rest_info in restaurants.items():
-                    if rest_id not in closed_restaurants:
-                        try:
-                            delivery_cost = float(rest_info['delivery_cost'])
-                            delivery_total += delivery_cost
-                            message += f"  {rest_info['name']}: {delivery_cost:,.0f} so'm\n"
-                        except (ValueError, TypeError) as e:
-                            logging.error(f"Error processing delivery cost for restaurant {rest_info['name']}: {e}")
-                            continue
-
-                final_total = total_sum + delivery_total
-                message += f"\n💵 Jami: {final_total:,.0f} so'm"
-
-                if closed_restaurants:
-                    message += "\n\n⚠️ Buyurtma berish uchun yopiq restoranlardan mahsulotlarni o'chirib tashlang!"
-
-            return message, len(items), total_sum
-
-        finally:
-            await session.close()
+            rest_info = restaurants.get(rest_id)
+            if not rest_info:
+                continue
+
+            if not schedule.is_open(rest_id) and rest_id not in closed_restaurants:
+                closed_restaurants.append(rest_id)
+                message += f"\n⚠️ {rest_info['name']} hozir yopiq! {schedule.opening_text(rest_id)}.\n"
+                continue
+
+            try:
+                quantity = int(quantity)
+                price = float(price)
+                item_total = quantity * price
+
+                if current_rest_id != rest_id:
+                    current_rest_id = rest_id
+                    message += f"\n🏪 {rest_info['name']}:\n"
+
+                if rest_id not in closed_restaurants:
+                    total_sum += item_total
+                    message += f"  {name}\n    {quantity} x {price:,.0f} = {item_total:,.0f} so'm\n"
+
+            except (ValueError, TypeError) as e:
+                logging.error(f"Error processing item {name}: {e}")
+                continue
+
+        # Add delivery costs for open restaurants only
+        if restaurants:
+            message += "\n🚚 Yetkazib berish:\n"
+            delivery_total = 0
+            for rest_id, rest_info in restaurants.items():
+                if rest_id not in closed_restaurants:
+                    try:
+                        delivery_cost = float(rest_info['delivery_cost'])
+                        delivery_total += delivery_cost
+                        message += f"  {rest_info['name']}: {delivery_cost:,.0f} so'm\n"
+                    except (ValueError, TypeError) as e:
+                        logging.error(f"Error processing delivery cost for restaurant {rest_info['name']}: {e}")
+                        continue
+
+            final_total = total_sum + delivery_total
+            message += f"\n💵 Jami: {final_total:,.0f} so'm"
+
+            if closed_restaurants:
+                message += "\n\n⚠️ Buyurtma berish uchun yopiq restoranlardan mahsulotlarni o'chirib tashlang!"
+
+        return message, len(items), total_sum
 
     except Exception as e:
         logging.error(f"Error calculating basket totals: {e}")
@@ -203,10 +175,11 @@ async def calculate_basket_totals(items):
 async def view_basket(message: types.Message, state: FSMContext, show_simple_back: bool = False):
     """Show user's basket with items grouped by restaurant"""
     try:
-        items, error = await db.get_basket_items(message.from_user.id)
+        basket, error = await db.get_basket_view(message.from_user.id)
         if error:
             await message.answer("Savat ma'lumotlarini olishda xatolik yuz berdi")
             return
+        items = basket.items
         if not items:
             await message.answer(
                 "Sizning savatingiz bo'sh 🛒",
@@ -214,7 +187,7 @@ async def view_basket(message: types.Message, state: FSMContext, show_simple_bac
             )
             return
         # Calculate totals and format message
-        response_text, _, _ = await calculate_basket_totals(items)
+        response_text, _, _ = await calculate_basket_totals(items, basket.restaurants)
         
         # Create keyboard with just back button if requested
         if show_simple_back:
@@ -234,12 +207,50 @@ async def view_basket(message: types.Message, state: FSMContext, show_simple_bac
         logging.error(f"Error showing basket: {e}")
         await message.answer("Savatchani ko'rsatishda xatolik yuz berdi")
 
+def format_eat_caption(eat, quantity: int) -> str:
+    """Caption of the food card for the given quantity"""
+    total_price = eat.price * quantity
+    return (
+        f"🍽 {eat.name}\n\n"
+        f"{eat.description}\n\n"
+        f"Narxi: {eat.price:,} so'm\n"
+        f"Soni: {quantity}\n"
+        f"Umumiy: {total_price:,} so'm"
+    )
+
+def create_eat_keyboard(eat_id: int, quantity: int) -> InlineKeyboardMarkup:
+    """Quantity stepper and add-to-cart buttons of the food card"""
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text="➖", 
+                    callback_data=f"decrease_{eat_id}_{quantity}"
+                ),
+                InlineKeyboardButton(
+                    text=f"{quantity}", 
+                    callback_data="quantity"
+                ),
+                InlineKeyboardButton(
+                    text="➕", 
+                    callback_data=f"increase_{eat_id}_{quantity}"
+                )
+            ],
+            [
+                InlineKeyboardButton(
+                    text="🛒 Savatga qo'shish", 
+                    callback_data=f"add_to_cart_{eat_id}_{quantity}"  # Формат: add_to_cart_[id]_[quantity]
+                )
+            ]
+        ]
+    )
+
 async def send_eat_info(message_or_callback: Union[types.Message, types.CallbackQuery], 
                        food_id: int,
                        quantity: int = 1) -> None:
     """Send food item information with image and inline keyboard"""
     try:
-        eat = await db.select_eat_by_id(food_id)  # Новый метод в db
+        eat = await db.select_eat_by_id(food_id)  # Served from the catalog when it is loaded
         if not eat:
             chat_id = (message_or_callback.from_user.id 
                       if isinstance(message_or_callback, types.CallbackQuery) 
@@ -250,45 +261,10 @@ async def send_eat_info(message_or_callback: Union[types.Message, types.Callback
             )
             return
 
-        # Unpack eat details
-        eat_id, name, description, image, price, restaurant_name, category_name = eat
-        total_price = price * quantity
+        image = eat.image
         image_path = f'images/{image}'
-
-        # Format caption
-        caption = (
-            f"🍽 {name}\n\n"
-            f"{description}\n\n"
-            f"Narxi: {price:,} so'm\n"
-            f"Soni: {quantity}\n"
-            f"Umumiy: {total_price:,} so'm"
-        )
-
-        # Create inline keyboard with proper callback_data format
-        buttons = InlineKeyboardMarkup(
-            inline_keyboard=[
-                [
-                    InlineKeyboardButton(
-                        text="➖", 
-                        callback_data=f"decrease_{eat_id}_{quantity}"
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{quantity}", 
-                        callback_data="quantity"
-                    ),
-                    InlineKeyboardButton(
-                        text="➕", 
-                        callback_data=f"increase_{eat_id}_{quantity}"
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text="🛒 Savatga qo'shish", 
-                        callback_data=f"add_to_cart_{eat_id}_{quantity}"  # Формат: add_to_cart_[id]_[quantity]
-                    )
-                ]
-            ]
-        )
+        caption = format_eat_caption(eat, quantity)
+        buttons = create_eat_keyboard(eat.id, quantity)
 
         if isinstance(message_or_callback, types.CallbackQuery):
             # Update existing message
@@ -299,9 +275,10 @@ async def send_eat_info(message_or_callback: Union[types.Message, types.Callback
         else:
             # Send new message with photo
             try:
-                await message_or_callback.bot.send_photo(
+                await photo_cache.send_photo(
+                    message_or_callback.bot,
                     chat_id=message_or_callback.chat.id,
-                    photo=types.FSInputFile(image_path),
+                    image=image,
                     caption=caption,
                     reply_markup=buttons
                 )
@@ -324,4 +301,148 @@ async def send_eat_info(message_or_callback: Union[types.Message, types.Callback
         await message_or_callback.bot.send_message(
             chat_id=chat_id,
             text="Xatolik yuz berdi. Iltimos qaytadan urinib ko'ring."
-        )
\ No newline at end of file
+        )
+
+# Taps on one card can reach any worker, so the quantity chosen on a food
+# card lives in food_card_steps and is changed with single statements
+ENSURE_EAT_STEP = register("ensure_eat_step", """
+    INSERT INTO food_card_steps (chat_id, message_id, quantity, shown, updated_at)
+    VALUES (:chat_id, :message_id, :shown, :shown, NOW())
+    ON CONFLICT (chat_id, message_id) DO NOTHING
+""")
+STEP_EAT_QUANTITY = register("step_eat_quantity", """
+    UPDATE food_card_steps
+    SET quantity = quantity + :delta, updated_at = NOW()
+    WHERE chat_id = :chat_id AND message_id = :message_id
+    AND quantity + :delta >= 1
+    RETURNING quantity
+""")
+SELECT_EAT_STEP = register("select_eat_step", """
+    SELECT quantity, shown, EXTRACT(EPOCH FROM NOW() - updated_at) AS idle_seconds
+    FROM food_card_steps
+    WHERE chat_id = :chat_id AND message_id = :message_id
+""")
+# Only the worker whose update succeeds edits the caption
+CLAIM_EAT_CAPTION = register("claim_eat_caption", """
+    UPDATE food_card_steps
+    SET shown = quantity
+    WHERE chat_id = :chat_id AND message_id = :message_id
+    AND quantity = :quantity AND shown <> quantity
+    RETURNING quantity
+""")
+DELETE_EAT_STEP = register("delete_eat_step", """
+    DELETE FROM food_card_steps
+    WHERE chat_id = :chat_id AND message_id = :message_id
+""")
+# Cards that were never added to the cart
+PURGE_EAT_STEPS = register("purge_eat_steps", """
+    DELETE FROM food_card_steps WHERE updated_at < NOW() - INTERVAL '1 day'
+""")
+EAT_STEPS_PURGE_INTERVAL = 3600
+
+# (chat_id, message_id) -> this worker's caption task for a food card
+_step_tasks = {}
+_last_steps_purge = 0.0
+
+async def step_eat_quantity(callback: types.CallbackQuery, eat_id: int,
+                            shown_quantity: int, delta: int) -> None:
+    """
+    Change the quantity on a food card by delta.
+
+    Taps are answered at once. The caption is edited only after taps on the
+    message stop for STEPPER_DEBOUNCE_SECONDS, so a burst of taps costs one
+    edit. Until then the buttons still carry the old quantity, so the pending
+    quantity is kept in food_card_steps, where every worker sees it.
+    """
+    key = {"chat_id": callback.message.chat.id, "message_id": callback.message.message_id}
+    session = await db.get_session()
+    try:
+        await ENSURE_EAT_STEP.execute(session, {**key, "shown": shown_quantity})
+        result = await STEP_EAT_QUANTITY.execute(session, {**key, "delta": delta})
+        row = result.fetchone()
+        # Release the row at once, taps on other workers wait on it
+        await session.commit()
+    finally:
+        await session.close()
+
+    if row is None:
+        await callback.answer("1 dan kam buyurtma berish mumkin emas!", show_alert=True)
+        return
+
+    await callback.answer(f"Soni: {row.quantity}")
+
+    task_key = (key["chat_id"], key["message_id"])
+    if task_key not in _step_tasks:
+        _step_tasks[task_key] = asyncio.create_task(_flush_eat_quantity(callback.message, eat_id, key))
+
+async def pending_eat_quantity(message: types.Message, quantity: int) -> int:
+    """Quantity chosen on a food card, including taps not rendered yet"""
+    session = await db.get_session()
+    try:
+        result = await SELECT_EAT_STEP.execute(session, {
+            "chat_id": message.chat.id,
+            "message_id": message.message_id
+        })
+        row = result.fetchone()
+    finally:
+        await session.close()
+    return row.quantity if row else quantity
+
+async def forget_eat_quantity(message: types.Message) -> None:
+    """Drop the stepper state of a food card that is gone"""
+    session = await db.get_session()
+    try:
+        await DELETE_EAT_STEP.execute(session, {
+            "chat_id": message.chat.id,
+            "message_id": message.message_id
+        })
+        await session.commit()
+    finally:
+        await session.close()
+
+async def _flush_eat_quantity(message: types.Message, eat_id: int, key: dict) -> None:
+    global _last_steps_purge
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            session = await db.get_session()
+            try:
+                result = await SELECT_EAT_STEP.execute(session, key)
+                row = result.fetchone()
+                if row is None or row.quantity == row.shown:
+                    return
+
+                # Taps on any worker push the deadline back
+                delay = Config.STEPPER_DEBOUNCE_SECONDS - float(row.idle_seconds)
+                if delay > 0:
+                    claimed = None
+                else:
+                    result = await CLAIM_EAT_CAPTION.execute(session, {**key, "quantity": row.quantity})
+                    claimed = result.fetchone()
+                    if loop.time() - _last_steps_purge > EAT_STEPS_PURGE_INTERVAL:
+                        await PURGE_EAT_STEPS.execute(session)
+                        _last_steps_purge = loop.time()
+                    await session.commit()
+            finally:
+                await session.close()
+
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            if claimed is None:
+                # A tap landed in between, or another worker is editing
+                continue
+
+            eat = await db.select_eat_by_id(eat_id)
+            if not eat:
+                return
+
+            await message.edit_caption(
+                caption=format_eat_caption(eat, claimed.quantity),
+                reply_markup=create_eat_keyboard(eat_id, claimed.quantity)
+            )
+            # Taps that arrived during the edit changed the quantity; go round again
+    except Exception as e:
+        logging.error(f"Error updating food quantity: {e}")
+    finally:
+        _step_tasks.pop((key["chat_id"], key["message_id"]), None)
@@ -2,137 +2,125 @@ from aiogram import types
 from aiogram.fsm.context import FSMContext
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, Message, ReplyKeyboardMarkup, KeyboardButton
 import logging
+import json
 from database.db import db
+from database.queries import register
 from sqlalchemy import text
-from datetime import datetime
+from datetime import datetime, timedelta
 from states.states import OrderState
-from geopy.distance import geodesic
+from utils.delivery_zones import check_delivery_distance
 from functions.functions import *
-from typing import Optional
+from typing import Iterable, Optional
+from config import Config
 from core.bot import get_bot
+from core import order_lifecycle
 
-CITY_CENTER_LATITUDE = 38.27559016902529
-CITY_CENTER_LONGITUDE = 67.89505672163146
-MAX_DISTANCE_KM = 15
+ORDERS_PER_PAGE = 3
+CURSOR_EPOCH = datetime(1970, 1, 1)
+
+def encode_order_cursor(order) -> str:
+    """Encode an order's (created_at, id) keyset position for callback data"""
+    micros = (order.created_at - CURSOR_EPOCH) // timedelta(microseconds=1)
+    return f"{micros}_{order.id}"
+
+def decode_order_cursor(cursor: str) -> tuple[datetime, int]:
+    micros, order_id = cursor.split('_')
+    return CURSOR_EPOCH + timedelta(microseconds=int(micros)), int(order_id)
 
 async def show_orders(
     message: types.Message,
     telegram_id: int,
     state: FSMContext,
-    page: int,
-    edit_message: bool = False
+    before: Optional[tuple] = None,
+    after: Optional[tuple] = None,
+    edit_message: bool = False,
+    user_db_id: Optional[int] = None
 ):
+    """
+    Show one page of the user's order history.
+    before/after are (created_at, id) cursors of the page boundary being left.
+    """
     try:
-        session = await db.get_session()
-        try:
-            # Get user's database ID
-            query = text("""
-                SELECT id FROM users WHERE telegram_id = :telegram_id
-            """)
-            result = await session.execute(query, {"telegram_id": telegram_id})
-            user = result.fetchone()
-            
-            if not user:
-                await message.answer("Foydalanuvchi topilmadi")
-                await state.clear()
-                return
+        # Get user's database ID
+        user_id = user_db_id or await db.get_user_id(telegram_id)
+        
+        if not user_id:
+            await message.answer("Foydalanuvchi topilmadi")
+            await state.clear()
+            return
 
-            user_id = user[0]
-            
-            # Get last 6 orders with pagination
-            query = text("""
-                SELECT o.id, o.total, o.status, o.created_at 
-                FROM orders o 
-                WHERE o.user_id = :user_id
-                ORDER BY o.created_at DESC
-                LIMIT 6
-            """)
-            result = await session.execute(query, {"user_id": user_id})
-            all_orders = result.fetchall()
-            
-            if not all_orders:
-                await message.answer("Sizda hech qanday buyurtma yo'q")
-                await state.clear()
-                return
-
-            # Calculate pagination
-            orders_per_page = 3
-            start_idx = (page - 1) * orders_per_page
-            end_idx = start_idx + orders_per_page
-            orders = all_orders[start_idx:end_idx]
-            total_pages = (len(all_orders) + orders_per_page - 1) // orders_per_page
+        orders, has_more, error = await db.get_order_history(
+            user_id,
+            ORDERS_PER_PAGE,
+            before=before,
+            after=after
+        )
+        if error:
+            await message.answer(error)
+            return
+        
+        if not orders:
+            if before or after:
+                # The page boundary moved (e.g. orders were deleted), start over
+                return await show_orders(message, telegram_id, state, edit_message=edit_message, user_db_id=user_id)
+            await message.answer("Sizda hech qanday buyurtma yo'q")
+            await state.clear()
+            return
 
-            # Format message
-            orders_message = await format_orders_message(session, orders)
+        has_newer = has_more if after else bool(before)
+        has_older = has_more if not after else True
 
-            # Create pagination keyboard
-            markup = create_pagination_keyboard(page, total_pages)
+        # Format message
+        orders_message = format_orders_message(orders)
 
-            # Send or edit message
-            if edit_message and hasattr(message, 'edit_text'):
-                await message.edit_text(orders_message, reply_markup=markup)
-            else:
-                await message.answer(orders_message, reply_markup=markup)
+        # Create pagination keyboard
+        markup = create_pagination_keyboard(
+            newer_cursor=encode_order_cursor(orders[0]) if has_newer else None,
+            older_cursor=encode_order_cursor(orders[-1]) if has_older else None
+        )
 
-        finally:
-            await session.close()
+        # Send or edit message
+        if edit_message and hasattr(message, 'edit_text'):
+            await message.edit_text(orders_message, reply_markup=markup)
+        else:
+            await message.answer(orders_message, reply_markup=markup)
 
     except Exception as e:
         logging.error(f"Error showing orders for user {telegram_id}: {e}")
         await message.answer("Buyurtmalarni ko'rsatishda xatolik yuz berdi")
         await state.clear()
 
-async def format_orders_message(session, orders) -> str:
-    status_mapping = {
-        'pending': '🕔 Kutilmoqda',
-        'completed': '✅ Tugallangan',
-        'in_delivery': '🕐 Taom tayyorlanyapdi',
-        'cancelled': '❌ Bekor qilindi',
-        'accepted_by_delivery': '🚚 Yetkazuvchi tomonidan qabul qilindi'
-    }
-
+def format_orders_message(orders) -> str:
     message = "🛒 Sizning buyurtmalaringiz:\n\n"
     
     for order in orders:
-        order_id, total_price, status, created_at = order
-        
-        # Get order items
-        query = text("""
-            SELECT f.name, oi.quantity
-            FROM order_items oi 
-            JOIN foods f ON oi.food_id = f.id 
-            WHERE oi.order_id = :order_id
-        """)
-        result = await session.execute(query, {"order_id": order_id})
-        items = result.fetchall()
-
         # Format order details
         message += (
-            f"📝 Buyurtma #{order_id}\n"
-            f"💰 Jami: {total_price:,.0f} so'm\n"
-            f"📊 Holati: {status_mapping.get(status, status)}\n"
-            f"📅 Sana: {created_at.strftime('%Y-%m-%d %H:%M')}\n"
+            f"📝 Buyurtma #{order.id}\n"
+            f"💰 Jami: {order.total:,.0f} so'm\n"
+            f"📊 Holati: {order_lifecycle.status_label(order.status)}\n"
+            f"📅 Sana: {order.created_at.strftime('%Y-%m-%d %H:%M')}\n"
             f"🍽 Taomlar:\n"
         )
         
-        for name, quantity in items:
-            message += f"  • {name} x{quantity}\n"
+        for item in order.items:
+            message += f"  • {item['name']} x{item['quantity']}\n"
         
         message += "\n"
 
     return message
 
-def create_pagination_keyboard(current_page: int, total_pages: int) -> InlineKeyboardMarkup:
+def create_pagination_keyboard(newer_cursor: Optional[str], older_cursor: Optional[str]) -> InlineKeyboardMarkup:
     buttons = []
-    if current_page > 1:
+    if newer_cursor:
         buttons.append(InlineKeyboardButton(
             text="⬅️ Oldingi",
-            callback_data=f"orders_page_{current_page - 1}"
+            callback_data=f"orders_newer_{newer_cursor}"
         ))
-    if current_page < total_pages:
+    if older_cursor:
         buttons.append(InlineKeyboardButton(
             text="Keyingi ➡️",
-            callback_data=f"orders_page_{current_page + 1}"
+            callback_data=f"orders_older_{older_cursor}"
         ))
     
     return InlineKeyboardMarkup(inline_keyboard=[buttons]) if buttons else None
@@ -151,12 +139,13 @@ async def get_user_data(telegram_id: int):
     finally:
         await session.close()
 
-async def get_user_addresses(telegram_id: int) -> tuple[list | None, str | None]:
+async def get_user_addresses(telegram_id: int, user_db_id: Optional[int] = None) -> tuple[list | None, str | None]:
     """
     Get user addresses from database
     
     Args:
         telegram_id (int): User's Telegram ID
+        user_db_id (int, optional): Already resolved users.id
         
     Returns:
         tuple[list | None, str | None]: (addresses list, error message)
@@ -164,15 +153,9 @@ async def get_user_addresses(telegram_id: int) -> tuple[list | None, str | None]
     session = await db.get_session()
     try:
         # First get user's database ID
-        user_query = text("""
-            SELECT id 
-            FROM users 
-            WHERE telegram_id = :telegram_id
-        """)
-        result = await session.execute(user_query, {"telegram_id": telegram_id})
-        user = result.fetchone()
+        user_id = user_db_id or await db.get_user_id(telegram_id, session)
         
-        if not user:
+        if not user_id:
             return None, "Foydalanuvchi topilmadi"
             
         # Then get user's addresses
@@ -182,7 +165,7 @@ async def get_user_addresses(telegram_id: int) -> tuple[list | None, str | None]
             WHERE a.user_id = :user_id
             ORDER BY a.created_at DESC
         """)
-        result = await session.execute(address_query, {"user_id": user[0]})
+        result = await session.execute(address_query, {"user_id": user_id})
         addresses = result.fetchall()
         
         return addresses, None
@@ -264,19 +247,55 @@ async def back(message: Message, state: FSMContext):
         logging.error(f"Error in back function: {e}")
         await back_to_main_menu(message, state)
 
-async def validate_delivery_location(latitude: float, longitude: float) -> bool:
+def delivery_location_error(latitude: float, longitude: float,
+                            restaurant_ids: Iterable[int] = ()) -> Optional[str]:
+    """
+    Message explaining why the point cannot be delivered to, or None if it can.
+    With restaurant_ids every one of them must deliver there, without them at
+    least one restaurant must.
+    """
+    is_deliverable, distance = check_delivery_distance(latitude, longitude)
+    if not is_deliverable:
+        return (
+            f"❌ Kechirasiz, bu manzil yetkazib berish doirasidan tashqarida.\n"
+            f"Maksimal masofa: {Config.MAX_DISTANCE_KM:g} km\n"
+            f"Sizning manzilingizgacha: {distance:.1f} km"
+        )
+
+    catalog = db.catalog
+    if not catalog.loaded:
+        return None
+
+    restaurant_ids = list(restaurant_ids)
+    if not restaurant_ids:
+        if not catalog.zones.covered(latitude, longitude):
+            return "❌ Kechirasiz, hech bir restoran bu manzilga yetkazib bermaydi."
+        return None
+
+    names = [
+        restaurant.name
+        for restaurant in map(catalog.get_restaurant, restaurant_ids)
+        if restaurant and not catalog.zones.delivers_to(restaurant.id, latitude, longitude)
+    ]
+    if names:
+        return f"❌ Kechirasiz, {', '.join(names)} bu manzilga yetkazib bermaydi."
+    return None
+
+async def validate_delivery_location(latitude: float, longitude: float,
+                                     restaurant_ids: Iterable[int] = ()) -> bool:
     """Check if delivery is possible to given coordinates"""
     try:
-        user_location = (latitude, longitude)
-        city_center = (CITY_CENTER_LATITUDE, CITY_CENTER_LONGITUDE)
-        distance = geodesic(user_location, city_center).kilometers
-        
-        return distance <= MAX_DISTANCE_KM
+        return delivery_location_error(latitude, longitude, restaurant_ids) is None
         
     except Exception as e:
         logging.error(f"Error validating location: {e}")
         return False
 
+async def cart_restaurant_ids(telegram_id: int, user_db_id: Optional[int] = None) -> set[int]:
+    """Restaurants the user's basket orders from"""
+    items, _ = await db.get_basket_items(telegram_id, user_db_id)
+    return {item[4] for item in items or () if item[4] is not None}
+
 async def process_address_selection(message: Message, state: FSMContext):
     """Process selected address for order"""
     try:
@@ -285,17 +304,26 @@ async def process_address_selection(message: Message, state: FSMContext):
         
         try:
             query = text("""
-                SELECT id FROM addresses 
-                WHERE user_id = (SELECT id FROM users WHERE telegram_id = :telegram_id)
+                SELECT id, latitude, longitude FROM addresses 
+                WHERE user_id = :user_id
                 AND address_name = :address_name
             """)
             result = await session.execute(query, {
-                "telegram_id": message.from_user.id,
+                "user_id": await db.get_user_id(message.from_user.id, session),
                 "address_name": address_name
             })
             address = result.fetchone()
             
             if address:
+                if address.latitude is not None and address.longitude is not None:
+                    error = delivery_location_error(
+                        address.latitude, address.longitude,
+                        await cart_restaurant_ids(message.from_user.id)
+                    )
+                    if error:
+                        await message.answer(f"{error}\n\nIltimos, boshqa manzil tanlang.")
+                        return
+
                 await state.update_data(selected_address_id=address[0])
                 await complete_order_process(message, message.from_user.id, state)
             else:
@@ -308,16 +336,15 @@ async def process_address_selection(message: Message, state: FSMContext):
         logging.error(f"Error processing address selection: {e}")
         await message.answer("Xatolik yuz berdi")
 
-async def save_address(user_id: int, address_name: str, state_data: dict) -> Optional[int]:
+async def save_address(user_id: int, address_name: str, state_data: dict,
+                       user_db_id: Optional[int] = None) -> Optional[int]:
     """Save new address and return its ID"""
     session = await db.get_session()
     try:
         # Get user's database ID
-        query = text("SELECT id FROM users WHERE telegram_id = :telegram_id")
-        result = await session.execute(query, {"telegram_id": user_id})
-        user = result.fetchone()
+        user_db_id = user_db_id or await db.get_user_id(user_id, session)
         
-        if not user:
+        if not user_db_id:
             return None
             
         # Insert new address
@@ -327,7 +354,7 @@ async def save_address(user_id: int, address_name: str, state_data: dict) -> Opt
             RETURNING id
         """)
         result = await session.execute(query, {
-            "user_id": user[0],
+            "user_id": user_db_id,
             "address_name": address_name,
             "latitude": state_data.get('new_address_latitude'),
             "longitude": state_data.get('new_address_longitude')
@@ -531,21 +558,15 @@ async def request_address_name(message: Message, state: FSMContext):
     )
     await state.set_state(OrderState.adding_new_address_name)
 
-async def create_order_in_db(telegram_id: int, state_data: dict, session) -> Optional[int]:
+async def create_order_in_db(telegram_id: int, state_data: dict, session,
+                             user_db_id: Optional[int] = None) -> Optional[int]:
     """Create new order in database and return order ID"""
     try:
         # Get user's database ID
-        query = text("""
-            SELECT id FROM users 
-            WHERE telegram_id = :telegram_id
-        """)
-        result = await session.execute(query, {"telegram_id": telegram_id})
-        user = result.fetchone()
-        if not user:
+        user_id = user_db_id or await db.get_user_id(telegram_id, session)
+        if not user_id:
             return None
 
-        user_id = user[0]
-
         # Get cart items and calculate total
         query = text("""
             SELECT c.food_id, c.quantity, f.price, f.restaurant_id
@@ -627,6 +648,7 @@ async def create_order_in_db(telegram_id: int, state_data: dict, session) -> Opt
             return None
 
         order_id = order[0]
+        await order_lifecycle.record_created(session, order_id)
 
         # Add order items
         query = text("""
@@ -636,22 +658,13 @@ async def create_order_in_db(telegram_id: int, state_data: dict, session) -> Opt
                 quantity, 
                 price,
                 status
-            ) VALUES (
-                :order_id,
-                :food_id,
-                :quantity,
-                :price,
-                'pending'
             )
+            SELECT :order_id, c.food_id, c.quantity, f.price, 'pending'
+            FROM cart c
+            JOIN foods f ON c.food_id = f.id
+            WHERE c.user_id = :user_id
         """)
-
-        for food_id, quantity, price, _ in cart_items:
-            await session.execute(query, {
-                "order_id": order_id,
-                "food_id": food_id,
-                "quantity": quantity,
-                "price": price
-            })
+        await session.execute(query, {"order_id": order_id, "user_id": user_id})
 
         # Clear user's cart
         query = text("DELETE FROM cart WHERE user_id = :user_id")
@@ -855,20 +868,24 @@ async def save_notification(order_id: int, message_id: int, chat_id: int, type:
     except Exception as e:
         logging.error(f"Error saving notification: {e}")
 
-async def get_address_id(telegram_id: int, address_name: str) -> Optional[int]:
+async def get_address_id(telegram_id: int, address_name: str,
+                         user_db_id: Optional[int] = None) -> Optional[int]:
     """Get address ID by name and user's telegram ID"""
     try:
         session = await db.get_session()
         try:
+            user_id = user_db_id or await db.get_user_id(telegram_id, session)
+            if not user_id:
+                return None
+
             query = text("""
-                SELECT a.id 
-                FROM addresses a
-                JOIN users u ON a.user_id = u.id
-                WHERE u.telegram_id = :telegram_id
-                AND a.address_name = :address_name
+                SELECT id 
+                FROM addresses
+                WHERE user_id = :user_id
+                AND address_name = :address_name
             """)
             result = await session.execute(query, {
-                "telegram_id": telegram_id,
+                "user_id": user_id,
                 "address_name": address_name
             })
             address = result.fetchone()
@@ -882,8 +899,13 @@ async def get_address_id(telegram_id: int, address_name: str) -> Optional[int]:
         logging.error(f"Error getting address ID: {e}")
         return None
 
-async def group_cart_items_by_restaurant(user_id: int, session) -> dict:
+async def group_cart_items_by_restaurant(user_id: int, session,
+                                        user_db_id: Optional[int] = None) -> dict:
     """Group cart items by restaurant"""
+    user_db_id = user_db_id or await db.get_user_id(user_id, session)
+    if not user_db_id:
+        return {}
+
     query = text("""
         SELECT 
             c.id as cart_id,
@@ -896,9 +918,9 @@ async def group_cart_items_by_restaurant(user_id: int, session) -> dict:
         FROM cart c
         JOIN foods f ON c.food_id = f.id
         JOIN restaurants r ON f.restaurant_id = r.id
-        WHERE c.user_id = (SELECT id FROM users WHERE telegram_id = :user_id)
+        WHERE c.user_id = :user_id
     """)
-    result = await session.execute(query, {"user_id": user_id})
+    result = await session.execute(query, {"user_id": user_db_id})
     items = result.fetchall()
     
     grouped_items = {}
@@ -927,16 +949,15 @@ async def create_restaurant_order(
     user_id: int, 
     restaurant_data: dict, 
     state_data: dict, 
-    session
+    session,
+    user_db_id: Optional[int] = None
 ) -> int:
     """Create order for specific restaurant"""
     try:
         # Get user record ID
-        user_query = text("SELECT id FROM users WHERE telegram_id = :telegram_id")
-        user_result = await session.execute(user_query, {"telegram_id": user_id})
-        user_record = user_result.fetchone()
+        user_db_id = user_db_id or await db.get_user_id(user_id, session)
         
-        if not user_record:
+        if not user_db_id:
             return None
 
         # Get address coordinates
@@ -966,7 +987,7 @@ async def create_restaurant_order(
         """)
         
         order_result = await session.execute(order_query, {
-            "user_id": user_record.id,
+            "user_id": user_db_id,
             "restaurant_id": restaurant_data['restaurant_id'],
             "total": restaurant_data['total'],
             "phone_number": state_data.get('phone_number'),
@@ -977,6 +998,7 @@ async def create_restaurant_order(
         })
         
         order_id = order_result.fetchone().id
+        await order_lifecycle.record_created(session, order_id)
         
         # Create order items
         items_query = text("""
@@ -984,18 +1006,134 @@ async def create_restaurant_order(
             SELECT :order_id, c.food_id, c.quantity, f.price
             FROM cart c
             JOIN foods f ON c.food_id = f.id
-            WHERE c.id = :cart_id
+            WHERE c.id = ANY(:cart_ids)
         """)
-        
-        for item in restaurant_data['items']:
-            await session.execute(items_query, {
-                "order_id": order_id,
-                "cart_id": item['cart_id']
-            })
+        await session.execute(items_query, {
+            "order_id": order_id,
+            "cart_ids": [item['cart_id'] for item in restaurant_data['items']]
+        })
         
         return order_id
         
     except Exception as e:
         logging.error(f"Error creating restaurant order: {e}")
         await session.rollback()
-        return None
\ No newline at end of file
+        return None
+
+CART_DELIVERY_TARGET = register("cart_delivery_target", """
+    SELECT a.latitude, a.longitude,
+           ARRAY(
+               SELECT DISTINCT f.restaurant_id
+               FROM cart c
+               JOIN foods f ON c.food_id = f.id
+               WHERE c.user_id = :user_id
+           ) AS restaurant_ids
+    FROM addresses a
+    WHERE a.id = :address_id AND a.user_id = :user_id
+""")
+
+CREATE_ORDERS_FROM_CART = register("create_orders_from_cart", """
+    WITH address AS (
+        SELECT latitude, longitude
+        FROM addresses
+        WHERE id = :address_id AND user_id = :user_id
+    ),
+    cart_rows AS (
+        SELECT c.id, c.food_id, c.quantity, f.name, f.price, f.restaurant_id
+        FROM cart c
+        JOIN foods f ON c.food_id = f.id
+        JOIN restaurants r ON f.restaurant_id = r.id
+        WHERE c.user_id = :user_id
+        FOR UPDATE OF c
+    ),
+    totals AS (
+        SELECT restaurant_id, SUM(quantity * price) AS total
+        FROM cart_rows
+        GROUP BY restaurant_id
+    ),
+    new_orders AS (
+        INSERT INTO orders (
+            user_id, restaurant_id, status, total,
+            phone_number, latitude, longitude,
+            restaurant_message, delivery_message, created_at
+        )
+        SELECT
+            CAST(:user_id AS INTEGER), t.restaurant_id, 'pending', t.total,
+            CAST(:phone_number AS VARCHAR), a.latitude, a.longitude,
+            CAST(:restaurant_message AS VARCHAR), CAST(:delivery_message AS VARCHAR),
+            CURRENT_TIMESTAMP
+        FROM totals t
+        LEFT JOIN address a ON true
+        RETURNING id, restaurant_id, total
+    ),
+    new_history AS (
+        INSERT INTO order_status_history (order_id, from_status, to_status, created_at)
+        SELECT id, NULL, 'pending', CURRENT_TIMESTAMP FROM new_orders
+    ),
+    new_items AS (
+        INSERT INTO order_items (order_id, food_id, quantity, price, status)
+        SELECT o.id, cr.food_id, cr.quantity, cr.price, 'pending'
+        FROM cart_rows cr
+        JOIN new_orders o ON o.restaurant_id = cr.restaurant_id
+    ),
+    cleared AS (
+        DELETE FROM cart
+        WHERE id IN (SELECT id FROM cart_rows)
+    )
+    SELECT
+        o.id,
+        o.total,
+        r.name AS restaurant_name,
+        r.restaurant_chat_id,
+        json_agg(json_build_object(
+            'name', cr.name,
+            'quantity', cr.quantity,
+            'price', cr.price,
+            'total', cr.quantity * cr.price
+        ) ORDER BY cr.id) AS items
+    FROM new_orders o
+    JOIN restaurants r ON r.id = o.restaurant_id
+    JOIN cart_rows cr ON cr.restaurant_id = o.restaurant_id
+    GROUP BY o.id, o.total, r.name, r.restaurant_chat_id
+    ORDER BY o.id
+""")
+
+async def create_orders_from_cart(user_db_id: int, state_data: dict, session) -> tuple[list[dict], str | None]:
+    """
+    Create one order per restaurant in the user's cart, insert all order items
+    and clear the cart with a single statement, whatever the basket size.
+    Nothing is created when a restaurant in the cart does not deliver to the
+    selected address. The caller commits.
+
+    Returns:
+        tuple[list[dict], str | None]: created orders with id, restaurant_name,
+        restaurant_chat_id, total and items, and an error message
+    """
+    target = (await CART_DELIVERY_TARGET.execute(session, {
+        "user_id": user_db_id,
+        "address_id": state_data.get('selected_address_id')
+    })).fetchone()
+    if target and target.latitude is not None and target.longitude is not None:
+        error = delivery_location_error(target.latitude, target.longitude, target.restaurant_ids)
+        if error:
+            return [], error
+
+    result = await CREATE_ORDERS_FROM_CART.execute(session, {
+        "user_id": user_db_id,
+        "address_id": state_data.get('selected_address_id'),
+        "phone_number": state_data.get('phone_number'),
+        "restaurant_message": state_data.get('restaurant_message'),
+        "delivery_message": state_data.get('delivery_message')
+    })
+
+    orders = []
+    for row in result.fetchall():
+        items = json.loads(row.items) if isinstance(row.items, str) else row.items
+        orders.append({
+            'id': row.id,
+            'restaurant_name': row.restaurant_name,
+            'items': items,
+            'total': row.total,
+            'restaurant_chat_id': row.restaurant_chat_id
+        })
+    return orders, None
@@ -12,7 +12,7 @@ from functions.functions import *
 
 router = Router()
 @router.message(lambda message: message.text == "🛒 Savat")
-async def view_basket_selection(message: types.Message, state: FSMContext):
+async def view_basket_selection(message: types.Message, state: FSMContext, user_db_id: int | None = None):
     try:
         if StateFilter(None):
             await state.set_state(OrderState.viewing_cart)
@@ -20,7 +20,7 @@ async def view_basket_selection(message: types.Message, state: FSMContext):
             await message.answer("Qaysi bo'limga o'tmoqchisiz.\nBo'limni tanlang", reply_markup=basket_kb)
         else:
             # Get basket items from database
-            items, error = await db.get_basket_items(message.from_user.id)
+            basket, error = await db.get_basket_view(message.from_user.id, user_db_id)
             
             if error:
                 logging.error(f"Error getting basket items: {error}")
@@ -28,7 +28,8 @@ async def view_basket_selection(message: types.Message, state: FSMContext):
                 return
 
             # Calculate totals and generate message
-            response_text, total_items, total_sum = await calculate_basket_totals(items or [])
+            items = basket.items
+            response_text, total_items, total_sum = await calculate_basket_totals(items, basket.restaurants)
 
             # Generate keyboard based on basket contents
             keyboard = await generate_basket_keyboard(
@@ -54,9 +55,9 @@ async def view_basket_selection(message: types.Message, state: FSMContext):
         await state.clear()
         
 @router.message(lambda message: message.text == "🛒 Savatim", StateFilter(OrderState.viewing_cart))
-async def view_basket(message: types.Message, state: FSMContext):
+async def view_basket(message: types.Message, state: FSMContext, user_db_id: int | None = None):
     try:
-        items, error = await db.get_basket_items(message.from_user.id)
+        basket, error = await db.get_basket_view(message.from_user.id, user_db_id)
             
         if error:
             logging.error(f"Error getting basket items: {error}")
@@ -64,7 +65,8 @@ async def view_basket(message: types.Message, state: FSMContext):
             return
 
         # Calculate totals and generate message
-        response_text, total_items, total_sum = await calculate_basket_totals(items or [])
+        items = basket.items
+        response_text, total_items, total_sum = await calculate_basket_totals(items, basket.restaurants)
 
         # Generate keyboard based on basket contents
         keyboard = await generate_basket_keyboard(
@@ -86,20 +88,23 @@ async def view_basket(message: types.Message, state: FSMContext):
         await state.clear()
 
 @router.callback_query(lambda c: c.data.startswith('remove_'))
-async def remove_from_cart(callback: types.CallbackQuery, state: FSMContext):
+async def remove_from_cart(callback: types.CallbackQuery, state: FSMContext, user_db_id: int | None = None):
     try:
         cart_id = int(callback.data.split('_')[1])
-        success, error = await db.remove_from_cart(cart_id)
+        # Delete the row and read back the updated basket in one statement
+        basket, error = await db.get_basket_view(
+            callback.from_user.id,
+            user_db_id,
+            remove_cart_id=cart_id
+        )
+        if not error and not basket.removed:
+            error = "Mahsulot topilmadi"
         
         if not error:
             await callback.answer("✅ Mahsulot savatdan o'chirildi")
             
             # Обновляем содержимое корзины
-            items, error = await db.get_basket_items(callback.from_user.id)
-            if error:
-                await callback.message.answer("Savat ma'lumotlarini olishda xatolik")
-                return
-                
+            items = basket.items
             if not items:
                 await callback.message.edit_text(
                     "Sizning savatingiz bo'sh 🛒",
@@ -108,7 +113,7 @@ async def remove_from_cart(callback: types.CallbackQuery, state: FSMContext):
                 return
                 
             # Показываем обновленную корзину
-            response_text, _, _ = await calculate_basket_totals(items)
+            response_text, _, _ = await calculate_basket_totals(items, basket.restaurants)
             await callback.message.edit_text(
                 response_text,
                 reply_markup=await generate_basket_keyboard(items, is_empty=False)
@@ -133,10 +138,11 @@ async def back_from_basket_restaurant(message: types.Message, state: FSMContext)
     await state.set_state(OrderState.selecting_food)
     # Restore previous restaurant menu
     data = await state.get_data()
-    restaurant = data.get('restaurant')
+    restaurant_id = data.get('restaurant_id')
+    category_id = data.get('category_id')
     category = data.get('category')
-    if restaurant and category:
-        buttons, _ = await create_eat_buttons(restaurant, category)
+    if restaurant_id and category_id:
+        buttons, _ = await create_eat_buttons(restaurant_id, category_id)
         await message.answer(f"Kategoriya: {category}", reply_markup=buttons)
     else:
         # Fallback to main menu if no restaurant data
@@ -1,9 +1,12 @@
-from aiogram import Router, types
+from aiogram import Router, types, F
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 import logging
 from database.db import db
 from sqlalchemy import text
 from core.bot import get_bot
+from core.dispatch import dispatcher
+from core.outbox import outbox, outbox_message
+from core import order_lifecycle
 
 router = Router()
 
@@ -12,67 +15,21 @@ async def handle_delivery_acceptance(callback: types.CallbackQuery):
     """Handle delivery acceptance by delivery person"""
     try:
         order_id = int(callback.data.split('_')[2])
+
+        # Served from memory for known couriers
+        if not await dispatcher.is_courier(callback.from_user.id):
+            await callback.answer("Yetkazib beruvchi ma'lumotlari topilmadi", show_alert=True)
+            return
+
         session = await db.get_session()
         
         try:
-            # Get order details
-            query = text("""
-                SELECT 
-                    o.id, o.total, o.phone_number, o.latitude, o.longitude,
-                    o.delivery_message, o.restaurant_message,
-                    u.telegram_id as customer_telegram_id,
-                    r.name as restaurant_name,
-                    r.latitude as restaurant_lat,
-                    r.longitude as restaurant_lon
-                FROM orders o
-                JOIN users u ON o.user_id = u.id
-                JOIN restaurants r ON o.restaurant_id = r.id
-                WHERE o.id = :order_id
-            """)
-            result = await session.execute(query, {"order_id": order_id})
-            order_data = result.fetchone()
+            order_data = await order_lifecycle.claim_delivery(session, order_id, callback.from_user.id)
 
             if not order_data:
-                await callback.answer("Buyurtma topilmadi", show_alert=True)
+                await callback.answer("Bu buyurtma allaqachon olingan", show_alert=True)
                 return
 
-            # Update order with delivery person info
-            update_query = text("""
-                UPDATE orders 
-                SET status = 'delivering',
-                    active_delivery_person_id = (
-                        SELECT id FROM delivery_persons 
-                        WHERE telegram_id = :telegram_id
-                    )
-                WHERE id = :order_id
-                RETURNING id
-            """)
-            await session.execute(
-                update_query, 
-                {
-                    "telegram_id": callback.from_user.id,
-                    "order_id": order_id
-                }
-            )
-
-            # Get delivery person info
-            delivery_query = text("""
-                SELECT name, phone_number, telegram_id
-                FROM delivery_persons
-                WHERE telegram_id = :telegram_id
-            """)
-            delivery_result = await session.execute(
-                delivery_query,
-                {"telegram_id": callback.from_user.id}
-            )
-            delivery_person = delivery_result.fetchone()
-
-            if not delivery_person:
-                await callback.answer("Yetkazib beruvchi ma'lumotlari topilmadi", show_alert=True)
-                return
-
-            await session.commit()
-
             # Format detailed order info for delivery person
             delivery_info = (
                 f"🆕 Yangi buyurtma #{order_id}\n"
@@ -97,33 +54,39 @@ async def handle_delivery_acceptance(callback: types.CallbackQuery):
                 cust_maps_link = f"https://www.google.com/maps?q={order_data.latitude},{order_data.longitude}"
                 delivery_info += f"\n📍 Mijoz manzili: {cust_maps_link}"
 
-            bot = get_bot()
-            
-            # Send info to delivery person's private chat
-            await bot.send_message(
-                chat_id=delivery_person.telegram_id,
-                text=delivery_info,
-                reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                    [InlineKeyboardButton(
-                        text="✅ Men yetib keldim",
-                        callback_data=f"arrived_{order_id}"
-                    )]
-                ])
-            )
-
             # Send notification to customer
             customer_message = (
                 f"🚚 Sizning #{order_id} raqamli buyurtmangiz yo'lga chiqdi!\n\n"
                 f"Yetkazib beruvchi ma'lumotlari:\n"
-                f"👤 Ism: {delivery_person.name}\n"
-                f"📞 Telefon: {delivery_person.phone_number}"
-            )
-            
-            await bot.send_message(
-                chat_id=order_data.customer_telegram_id,
-                text=customer_message
+                f"👤 Ism: {order_data.courier_name}\n"
+                f"📞 Telefon: {order_data.courier_phone}"
             )
 
+            # Messages are committed with the assignment and sent by the outbox
+            await outbox.enqueue(session, [
+                # Info for delivery person's private chat
+                outbox_message(
+                    chat_id=order_data.courier_telegram_id,
+                    message_text=delivery_info,
+                    reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+                        [InlineKeyboardButton(
+                            text="✅ Men yetib keldim",
+                            callback_data=f"arrived_{order_id}"
+                        )]
+                    ])
+                ),
+                outbox_message(
+                    chat_id=order_data.customer_telegram_id,
+                    message_text=customer_message
+                )
+            ])
+            # Release the order row before talking to Telegram, so competing
+            # claims get their answer without waiting on these calls
+            await session.commit()
+            db.on_commit(outbox.wake)
+            # Ends an exclusive offer if this courier had one
+            db.on_commit(lambda: dispatcher.resolve(order_id, callback.from_user.id, True))
+
             # Update original message in delivery group
             await callback.message.edit_text(
                 f"{callback.message.text}\n\n✅ Buyurtma qabul qilindi!",
@@ -143,6 +106,42 @@ async def handle_delivery_acceptance(callback: types.CallbackQuery):
         logging.error(f"Error handling delivery acceptance: {e}")
         await callback.answer("Xatolik yuz berdi", show_alert=True)
         
+@router.callback_query(lambda c: c.data.startswith('decline_delivery_'))
+async def handle_delivery_decline(callback: types.CallbackQuery):
+    """Courier turns down an order offered to them personally"""
+    try:
+        order_id = int(callback.data.split('_')[2])
+        if not await dispatcher.decline(order_id, callback.from_user.id):
+            await callback.answer("Bu taklif endi amal qilmaydi", show_alert=True)
+            return
+
+        await callback.message.edit_text(
+            f"{callback.message.text}\n\n❌ Buyurtma rad etildi.",
+            reply_markup=None
+        )
+        await callback.answer()
+
+    except Exception as e:
+        logging.error(f"Error handling delivery decline: {e}")
+        await callback.answer("Xatolik yuz berdi", show_alert=True)
+
+# Live locations arrive as a message with live_period, then as edits of it
+@router.message(F.location.live_period, F.chat.type == "private")
+@router.edited_message(F.location, F.chat.type == "private")
+async def handle_courier_location(message: types.Message):
+    """Track a courier's live location for dispatch"""
+    try:
+        if not await dispatcher.is_courier(message.from_user.id):
+            return
+
+        dispatcher.update_location(
+            message.from_user.id,
+            message.location.latitude,
+            message.location.longitude
+        )
+    except Exception as e:
+        logging.error(f"Error tracking courier location: {e}")
+
 @router.callback_query(lambda c: c.data.startswith('arrived_'))
 async def handle_delivery_arrival(callback: types.CallbackQuery):
     """Handle delivery person arrival"""
@@ -151,6 +150,19 @@ async def handle_delivery_arrival(callback: types.CallbackQuery):
         session = await db.get_session()
         
         try:
+            moved = await order_lifecycle.transition(
+                session, order_id, order_lifecycle.ARRIVED, callback.from_user.id
+            )
+            if not moved:
+                await callback.answer("Buyurtma topilmadi", show_alert=True)
+                return
+            if not moved.changed:
+                # Repeated tap: the customer has already been told
+                await callback.answer(
+                    f"Buyurtma holati: {order_lifecycle.status_label(moved.status)}", show_alert=True
+                )
+                return
+
             # Get customer telegram ID
             query = text("""
                 SELECT u.telegram_id
@@ -160,18 +172,6 @@ async def handle_delivery_arrival(callback: types.CallbackQuery):
             """)
             result = await session.execute(query, {"order_id": order_id})
             customer_data = result.fetchone()
-
-            if not customer_data:
-                await callback.answer("Buyurtma topilmadi", show_alert=True)
-                return
-
-            # Update order status
-            update_query = text("""
-                UPDATE orders 
-                SET status = 'arrived'
-                WHERE id = :order_id
-            """)
-            await session.execute(update_query, {"order_id": order_id})
             await session.commit()
 
             # Notify customer
@@ -215,14 +215,13 @@ async def handle_order_received(callback: types.CallbackQuery):
         session = await db.get_session()
         
         try:
-            # Update order status
-            update_query = text("""
-                UPDATE orders 
-                SET status = 'completed'
-                WHERE id = :order_id
-            """)
-            await session.execute(update_query, {"order_id": order_id})
+            # Also frees the courier unless they carry another order
+            completed = await order_lifecycle.complete(session, order_id, callback.from_user.id)
             await session.commit()
+            if not completed:
+                # Repeated tap on an already completed order
+                await callback.answer()
+                return
 
             # Update message for customer
             await callback.message.edit_text(
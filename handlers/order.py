@@ -4,17 +4,16 @@ from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMar
 from states.states import OrderState
 from functions.order_functions import *
 import logging
-from utils.distance import check_delivery_distance
-from config import Config
+from core.outbox import outbox, outbox_message
 
 router = Router()
 
 @router.callback_query(lambda call: call.data == "complete_order")
-async def start_order_process(callback: types.CallbackQuery, state: FSMContext):
+async def start_order_process(callback: types.CallbackQuery, state: FSMContext, user_db_id: int | None = None):
     """Start order process by requesting phone number"""
     try:
         # Проверяем наличие товаров в корзине
-        items, error = await db.get_basket_items(callback.from_user.id)
+        items, error = await db.get_basket_items(callback.from_user.id, user_db_id)
         if not items:
             await callback.answer("Savatingiz bo'sh!", show_alert=True)
             return
@@ -38,11 +37,11 @@ async def start_order_process(callback: types.CallbackQuery, state: FSMContext):
         await callback.answer("Xatolik yuz berdi", show_alert=True)
 
 @router.message(OrderState.waiting_for_phone, F.contact)
-async def handle_phone(message: types.Message, state: FSMContext):
+async def handle_phone(message: types.Message, state: FSMContext, user_db_id: int | None = None):
     """Save phone and show address selection"""
     try:
         await state.update_data(phone_number=message.contact.phone_number)
-        addresses, error = await get_user_addresses(message.from_user.id)
+        addresses, error = await get_user_addresses(message.from_user.id, user_db_id)
         
         if error:
             logging.error(f"Error getting addresses: {error}")
@@ -64,16 +63,15 @@ async def handle_phone(message: types.Message, state: FSMContext):
 async def handle_location(message: types.Message, state: FSMContext):
     """Handle received location and save as new address"""
     try:
-        # Check if location is within delivery range
-        user_location = (message.location.latitude, message.location.longitude)
-        city_center = (CITY_CENTER_LATITUDE, CITY_CENTER_LONGITUDE)
-        distance = geodesic(city_center, user_location).km
+        # Check if location is within delivery range of the basket's restaurants
+        error = delivery_location_error(
+            message.location.latitude,
+            message.location.longitude,
+            await cart_restaurant_ids(message.from_user.id)
+        )
 
-        if distance > Config.MAX_DISTANCE_KM:
-            await message.answer(
-                "Kechirasiz, bu manzil yetkazib berish doirasidan tashqarida. "
-                "Iltimos boshqa manzil tanlang."
-            )
+        if error:
+            await message.answer(f"{error}\n\nIltimos boshqa manzil tanlang.")
             return
 
         # Save location temporarily in state
@@ -100,7 +98,7 @@ async def handle_location(message: types.Message, state: FSMContext):
         await message.answer("Xatolik yuz berdi. Iltimos qaytadan urinib ko'ring.")
 
 @router.message(OrderState.adding_new_address_name)
-async def handle_address_name(message: types.Message, state: FSMContext):
+async def handle_address_name(message: types.Message, state: FSMContext, user_db_id: int | None = None):
     """Handle address name input"""
     try:
         if message.text == "⬅️ Orqaga":
@@ -120,7 +118,8 @@ async def handle_address_name(message: types.Message, state: FSMContext):
             message.from_user.id,
             message.text,
             latitude,
-            longitude
+            longitude,
+            user_db_id=user_db_id
         )
 
         if not address_id:
@@ -136,7 +135,7 @@ async def handle_address_name(message: types.Message, state: FSMContext):
         await message.answer("Xatolik yuz berdi")
 
 @router.message(OrderState.waiting_for_address)
-async def handle_address_selection(message: types.Message, state: FSMContext):
+async def handle_address_selection(message: types.Message, state: FSMContext, user_db_id: int | None = None):
     """Handle address selection or request new address"""
     try:
         if message.text == "➕ Yangi manzil qo'shish":
@@ -148,7 +147,7 @@ async def handle_address_selection(message: types.Message, state: FSMContext):
             return
 
         if message.text.startswith("📍 "):
-            address_id = await get_address_id(message.from_user.id, message.text[2:])
+            address_id = await get_address_id(message.from_user.id, message.text[2:], user_db_id)
             if not address_id:
                 await message.answer("Manzil topilmadi")
                 return
@@ -210,49 +209,30 @@ async def handle_delivery_message(message: types.Message, state: FSMContext):
         await message.answer("Xatolik yuz berdi")
 
 @router.callback_query(lambda c: c.data == "confirm_order")
-async def final_order_confirmation(callback: types.CallbackQuery, state: FSMContext):
+async def final_order_confirmation(callback: types.CallbackQuery, state: FSMContext, user_db_id: int | None = None):
     """Create orders in database and send notifications"""
     session = await db.get_session()
     try:
         state_data = await state.get_data()
-        grouped_items = await group_cart_items_by_restaurant(callback.from_user.id, session)
-        
-        if not grouped_items:
+        user_db_id = user_db_id or await db.get_user_id(callback.from_user.id, session)
+        if not user_db_id:
             await callback.answer("Savatingiz bo'sh!", show_alert=True)
             return
-            
-        created_orders = []
-        for restaurant_id, restaurant_data in grouped_items.items():
-            restaurant_data['restaurant_id'] = restaurant_id
-            order_id = await create_restaurant_order(
-                callback.from_user.id,
-                restaurant_data,
-                state_data,
-                session
-            )
-            
-            if order_id:
-                created_orders.append({
-                    'id': order_id,
-                    'restaurant_name': restaurant_data['restaurant_name'],
-                    'items': restaurant_data['items'],
-                    'total': restaurant_data['total'],
-                    'restaurant_chat_id': restaurant_data['restaurant_chat_id'] # Changed from admin_telegram_id
-                })
 
-        if not created_orders:
-            await callback.answer("Buyurtmani saqlashda xatolik", show_alert=True)
+        # Orders, order items and cart cleanup in one statement and one transaction
+        created_orders, error = await create_orders_from_cart(user_db_id, state_data, session)
+
+        if error:
+            await callback.answer(error, show_alert=True)
             return
 
-        # Clear cart after successful order creation
-        await session.execute(
-            text("DELETE FROM cart WHERE user_id = (SELECT id FROM users WHERE telegram_id = :telegram_id)"),
-            {"telegram_id": callback.from_user.id}
-        )
-        await session.commit()
+        if not created_orders:
+            await callback.answer("Savatingiz bo'sh!", show_alert=True)
+            return
 
-        bot = get_bot()
-        # Send notifications for each order
+        # Restaurant notifications are committed together with the orders
+        # and delivered by the outbox dispatcher
+        notifications = []
         for order in created_orders:
             # Format order items
             items_text = "\n".join([
@@ -271,10 +251,9 @@ async def final_order_confirmation(callback: types.CallbackQuery, state: FSMCont
             if state_data.get('restaurant_message'):
                 restaurant_message += f"💬 Xabar: {state_data['restaurant_message']}\n"
 
-            # Send to restaurant group chat
-            rest_msg = await bot.send_message(
+            notifications.append(outbox_message(
                 chat_id=order['restaurant_chat_id'], # Using restaurant_chat_id instead of admin_telegram_id
-                text=restaurant_message,
+                message_text=restaurant_message,
                 reply_markup=InlineKeyboardMarkup(inline_keyboard=[
                     [InlineKeyboardButton(
                         text="✅ Qabul qilish",
@@ -284,16 +263,14 @@ async def final_order_confirmation(callback: types.CallbackQuery, state: FSMCont
                         text="❌ Bekor qilish",
                         callback_data=f"cancel_order_{order['id']}"
                     )]
-                ])
-            )
-
-            # Save notification message for future reference
-            await save_notification(
+                ]),
                 order_id=order['id'],
-                message_id=rest_msg.message_id,
-                chat_id=order['restaurant_chat_id'],
-                type='restaurant'
-            )
+                message_type='restaurant'
+            ))
+
+        await outbox.enqueue(session, notifications)
+        await session.commit()
+        db.on_commit(outbox.wake)
 
         # Message for customer
         orders_text = ""
@@ -358,9 +335,9 @@ async def back_from_address(message: types.Message, state: FSMContext):
     await message.answer("Buyurtma berish uchun telefon raqamingizni yuboring:", reply_markup=keyboard)
 
 @router.message(lambda message: message.text == "⬅️ Orqaga", OrderState.waiting_restaurant_message)
-async def back_from_restaurant_message(message: types.Message, state: FSMContext):
+async def back_from_restaurant_message(message: types.Message, state: FSMContext, user_db_id: int | None = None):
     """Return to address selection"""
-    addresses, _ = await get_user_addresses(message.from_user.id)
+    addresses, _ = await get_user_addresses(message.from_user.id, user_db_id)
     await state.set_state(OrderState.waiting_for_address)
     await show_address_selection(message, addresses, state)
 
@@ -375,11 +352,11 @@ async def back_from_delivery_message(message: types.Message, state: FSMContext):
     await message.answer("Restoran uchun xabar qoldiring yoki o'tkazib yuboring:", reply_markup=keyboard)
 
 @router.message(lambda message: message.text == "⬅️ Orqaga", OrderState.adding_new_address_location)
-async def back_from_new_address_location(message: types.Message, state: FSMContext):
+async def back_from_new_address_location(message: types.Message, state: FSMContext, user_db_id: int | None = None):
     """Return to address selection from new address location request"""
     try:
         # Get existing addresses
-        addresses, error = await get_user_addresses(message.from_user.id)
+        addresses, error = await get_user_addresses(message.from_user.id, user_db_id)
         
         if error:
             logging.error(f"Error getting addresses: {error}")
@@ -410,19 +387,14 @@ async def back_from_new_address_location(message: types.Message, state: FSMConte
 async def handle_new_address_location(message: types.Message, state: FSMContext):
     """Handle location for new address"""
     try:
-        # Check delivery distance
-        is_deliverable, distance = check_delivery_distance(
+        # Check the city area and the restaurants' own delivery areas
+        error = delivery_location_error(
             message.location.latitude,
             message.location.longitude
         )
         
-        if not is_deliverable:
-            await message.answer(
-                f"❌ Kechirasiz, bu manzil yetkazib berish doirasidan tashqarida.\n"
-                f"Maksimal masofa: {Config.MAX_DISTANCE_KM} km\n"
-                f"Sizning manzilingizgacha: {distance:.1f} km\n\n"
-                f"Iltimos, boshqa manzil tanlang."
-            )
+        if error:
+            await message.answer(f"{error}\n\nIltimos, boshqa manzil tanlang.")
             return
             
         # Save location data in state
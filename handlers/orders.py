@@ -3,25 +3,35 @@ from aiogram.fsm.context import FSMContext
 from aiogram.filters import StateFilter
 from states.states import OrderState
 import logging
-from functions.order_functions import show_orders
+from functions.order_functions import show_orders, decode_order_cursor
 
 router = Router()
 
 @router.message(lambda message: message.text == "🛒 Buyurtmalarim", StateFilter("*"))
-async def my_orders_handler(message: types.Message, state: FSMContext):
+async def my_orders_handler(message: types.Message, state: FSMContext, user_db_id: int | None = None):
     await state.set_state(OrderState.viewing_orders)
-    await show_orders(message, message.from_user.id, state, page=1)
+    await show_orders(message, message.from_user.id, state, user_db_id=user_db_id)
 
-@router.callback_query(lambda c: c.data.startswith('orders_page_'))
-async def process_orders_page(callback: types.CallbackQuery, state: FSMContext):
+@router.callback_query(lambda c: c.data.startswith('orders_'))
+async def process_orders_page(callback: types.CallbackQuery, state: FSMContext, user_db_id: int | None = None):
     try:
-        page = int(callback.data.split('_')[-1])
+        # Format: orders_older_[cursor] / orders_newer_[cursor]
+        # Buttons from the old orders_page_[n] format restart at the first page
+        _, direction, cursor = callback.data.split('_', 2)
+        before = after = None
+        if direction == "older":
+            before = decode_order_cursor(cursor)
+        elif direction == "newer":
+            after = decode_order_cursor(cursor)
+
         await show_orders(
             message=callback.message,
             telegram_id=callback.from_user.id,
             state=state,
-            page=page,
-            edit_message=True
+            before=before,
+            after=after,
+            edit_message=True,
+            user_db_id=user_db_id
         )
     except Exception as e:
         logging.error(f"Error processing orders page: {e}")
@@ -9,9 +9,11 @@ from keyboards.reply import main_menu
 from keyboards.restaurants_buttons import *
 from functions.functions import *
 from core.bot import get_bot
+from core import order_lifecycle
+from core.dispatch import dispatcher, DispatchRequest
+from core.outbox import outbox, outbox_message
+from database.queries import register
 from aiogram.fsm.storage.base import StorageKey
-from datetime import datetime, time
-import pytz
 
 router = Router()
 @router.message(lambda msg: msg.text == "🚚 Ovqat buyurtma qilish", StateFilter(None))
@@ -39,89 +41,55 @@ async def handle_restaurant_selection(message: types.Message, state: FSMContext)
             await back_to_main_menu(message, state)
             return
 
-        # Get current time in Tashkent
-        tz = pytz.timezone('Asia/Tashkent')
-        current_time = datetime.now(tz).time()
-
-        session = await db.get_session()
-        try:
-            query = text("""
-                SELECT name, description, startwork, endwork, delivery_cost 
-                FROM restaurants 
-                WHERE name = :restaurant_name AND is_active = true
-            """)
-            result = await session.execute(query, {"restaurant_name": message.text})
-            restaurant_data = result.fetchone()
-            
-            if not restaurant_data:
-                await message.answer("Restoran topilmadi.")
-                await back_to_main_menu(message, state)
-                return
-
-            # Check if restaurant is open
-            start_time = restaurant_data.startwork
-            end_time = restaurant_data.endwork
-            is_open = is_restaurant_open(current_time, start_time, end_time)
+        restaurant_data, error = await db.get_restaurant_by_label(message.text)
+        if error:
+            await message.answer(error)
+            await back_to_main_menu(message, state)
+            return
 
-            # Format restaurant info
-            info_text = f"🏪 {restaurant_data.name}\n\n"
-            
-            if restaurant_data.description:
-                info_text += f"{restaurant_data.description}\n\n"
-            
-            # Add operating hours info
-            info_text += f"⏰ Ish vaqti: {start_time.strftime('%H:%M')} - {end_time.strftime('%H:%M')}\n"
-            
-            if restaurant_data.delivery_cost is not None:
-                if restaurant_data.delivery_cost == 0:
-                    info_text += "🚚 Yetkazib berish: Bepul\n"
-                else:
-                    info_text += f"🚚 Yetkazib berish: {restaurant_data.delivery_cost:,.0f} so'm\n"
-
-            if not is_open:
-                next_open = get_next_open_time(current_time, start_time, end_time)
-                info_text += f"\n❌ Hozir yopiq!\n⏰ {next_open} da ochiladi."
-                await message.answer(info_text)
-                return
+        # Check if restaurant is open
+        schedule = db.catalog.schedule_for([restaurant_data])
+        is_open = schedule.is_open(restaurant_data.id)
 
-            # Get category buttons and continue only if restaurant is open
-            buttons, error_message = await create_category_buttons(message.text)
-            
-            if error_message:
-                logging.error(f"Error getting categories for {message.text}: {error_message}")
-                await message.answer(error_message)
-                await back_to_main_menu(message, state)
-                return
-            
-            await state.update_data(restaurant=message.text)
+        # Format restaurant info
+        info_text = f"🏪 {restaurant_data.name}\n\n"
+        
+        if restaurant_data.description:
+            info_text += f"{restaurant_data.description}\n\n"
+        
+        # Add operating hours info
+        info_text += f"⏰ Ish vaqti: {schedule.hours_text(restaurant_data.id)}\n"
+        
+        if restaurant_data.delivery_cost is not None:
+            if restaurant_data.delivery_cost == 0:
+                info_text += "🚚 Yetkazib berish: Bepul\n"
+            else:
+                info_text += f"🚚 Yetkazib berish: {restaurant_data.delivery_cost:,.0f} so'm\n"
+
+        if not is_open:
+            info_text += f"\n❌ Hozir yopiq!\n⏰ {schedule.opening_text(restaurant_data.id)}."
             await message.answer(info_text)
-            await message.answer("Iltimos, kategoriyani tanlang:", reply_markup=buttons)
-            await state.set_state(OrderState.selecting_category)
+            return
 
-        finally:
-            await session.close()
+        # Get category buttons and continue only if restaurant is open
+        buttons, error_message = await create_category_buttons(restaurant_data.id)
+        
+        if error_message:
+            logging.error(f"Error getting categories for {restaurant_data.id}: {error_message}")
+            await message.answer(error_message)
+            await back_to_main_menu(message, state)
+            return
+        
+        await state.update_data(restaurant_id=restaurant_data.id, restaurant=restaurant_data.name)
+        await message.answer(info_text)
+        await message.answer("Iltimos, kategoriyani tanlang:", reply_markup=buttons)
+        await state.set_state(OrderState.selecting_category)
 
     except Exception as e:
         logging.error(f"Error in restaurant selection: {e}")
         await message.answer("Xatolik yuz berdi. Iltimos qaytadan urinib ko'ring.")
         await back_to_main_menu(message, state)
 
-def is_restaurant_open(current_time: time, start_time: time, end_time: time) -> bool:
-    """Check if restaurant is currently open"""
-    if start_time <= end_time:
-        return start_time <= current_time <= end_time
-    else:  # Handle case when restaurant works past midnight
-        return current_time >= start_time or current_time <= end_time
-
-def get_next_open_time(current_time: time, start_time: time, end_time: time) -> str:
-    """Get formatted string of when restaurant will next open"""
-    if current_time > end_time:
-        # If it's after closing time, opens tomorrow at start_time
-        return f"Ertaga {start_time.strftime('%H:%M')}"
-    else:
-        # If it's before opening time today
-        return start_time.strftime('%H:%M')
-
 @router.message(StateFilter(OrderState.selecting_category))
 async def choose_eat(message: types.Message, state: FSMContext):
     try:
@@ -137,25 +105,34 @@ async def choose_eat(message: types.Message, state: FSMContext):
             await back(message, state)
             return
             
-        # Get restaurant name from state
+        # Get restaurant from state
         data = await state.get_data()
-        restaurant_name = data.get('restaurant')
+        restaurant_id = data.get('restaurant_id')
         
-        if not restaurant_name:
-            logging.error("Restaurant name not found in state data")
+        if not restaurant_id:
+            logging.error("Restaurant id not found in state data")
             await message.answer("Xatolik yuz berdi. Iltimos qaytadan urinib ko'ring.")
             await back_to_main_menu(message, state)
             return
+
+        category, error_message = await db.get_category_by_label(restaurant_id, category_name)
+        if error_message:
+            buttons, _ = await create_category_buttons(restaurant_id)
+            await message.answer(
+                "Iltimos, quyidagi kategoriyalardan birini tanlang:",
+                reply_markup=buttons
+            )
+            return
             
         # Update state with selected category
-        await state.update_data(category=category_name)
+        await state.update_data(category_id=category.id, category=category_name)
         
         # Get food items buttons for selected category
-        buttons, error_message = await create_eat_buttons(restaurant_name, category_name)
+        buttons, error_message = await create_eat_buttons(restaurant_id, category.id)
         
         if error_message:
-            logging.error(f"Error getting food items for {restaurant_name}/{category_name}: {error_message}")
-            buttons, _ = await create_category_buttons(restaurant_name)
+            logging.error(f"Error getting food items for {restaurant_id}/{category.id}: {error_message}")
+            buttons, _ = await create_category_buttons(restaurant_id)
             await message.answer(
                 "Kechirasiz, bu kategoriyada taomlar mavjud emas. Iltimos, boshqa kategoriyani tanlang:",
                 reply_markup=buttons
@@ -205,17 +182,9 @@ async def increase_quantity(callback_query: types.CallbackQuery):
     try:
         # Parse callback data (format: increase_[eat_id]_[quantity])
         _, eat_id, current_quantity = callback_query.data.split('_')
-        
-        # Convert to appropriate types
-        eat_id = int(eat_id)
-        quantity = int(current_quantity) + 1
-        
-        # Update food info display with new quantity
-        await send_eat_info(
-            callback_query, 
-            food_id=eat_id,
-            quantity=quantity
-        )
+
+        # Caption is re-rendered from the catalog once the taps settle
+        await step_eat_quantity(callback_query, int(eat_id), int(current_quantity), 1)
         
     except Exception as e:
         logging.error(f"Error in increase_quantity: {e}")
@@ -229,25 +198,9 @@ async def decrease_quantity(callback_query: types.CallbackQuery):
     try:
         # Parse callback data (format: decrease_[eat_id]_[quantity])
         _, eat_id, current_quantity = callback_query.data.split('_')
-        
-        # Convert to appropriate types
-        eat_id = int(eat_id)
-        quantity = int(current_quantity) - 1
-        
-        # Check minimum quantity
-        if quantity < 1:
-            await callback_query.answer(
-                "1 dan kam buyurtma berish mumkin emas!", 
-                show_alert=True
-            )
-            return
-            
-        # Update food info display with new quantity
-        await send_eat_info(
-            callback_query, 
-            food_id=eat_id,
-            quantity=quantity
-        )
+
+        # Minimum quantity is checked against the pending quantity
+        await step_eat_quantity(callback_query, int(eat_id), int(current_quantity), -1)
         
     except Exception as e:
         logging.error(f"Error in decrease_quantity: {e}")
@@ -257,15 +210,17 @@ async def decrease_quantity(callback_query: types.CallbackQuery):
         )
         
 @router.callback_query(lambda c: c.data.startswith('add_to_cart_'))
-async def confirm_add_to_cart(callback_query: types.CallbackQuery, state: FSMContext):
+async def confirm_add_to_cart(callback_query: types.CallbackQuery, state: FSMContext, user_db_id: int | None = None):
     try:
         parts = callback_query.data.split('_')
         eat_id = int(parts[-2])
-        quantity = int(parts[-1])
+        # The button may still show the quantity from before the last taps
+        quantity = await pending_eat_quantity(callback_query.message, int(parts[-1]))
         success, error = await db.add_to_cart(
             user_id=callback_query.from_user.id,
             eat_id=eat_id,
-            quantity=quantity
+            quantity=quantity,
+            user_db_id=user_db_id
         )
 
         if not success:
@@ -275,6 +230,7 @@ async def confirm_add_to_cart(callback_query: types.CallbackQuery, state: FSMCon
         await callback_query.answer("🛒 Mahsulot savatchaga qo'shildi!", show_alert=True)
         
         await callback_query.message.delete()
+        await forget_eat_quantity(callback_query.message)
 
     except ValueError as ve:
         logging.error(f"Invalid callback data format: {callback_query.data}")
@@ -284,6 +240,18 @@ async def confirm_add_to_cart(callback_query: types.CallbackQuery, state: FSMCon
         await callback_query.answer("Xatolik yuz berdi", show_alert=True)
         
         
+ORDER_FOR_ACCEPTANCE = register("order_for_acceptance", """
+    SELECT 
+        o.id, o.user_id, o.total, o.phone_number,
+        o.latitude, o.longitude, o.delivery_message,
+        u.telegram_id, r.delivery_chat_id, r.name as restaurant_name,
+        r.latitude as restaurant_lat, r.longitude as restaurant_lon
+    FROM orders o
+    JOIN users u ON o.user_id = u.id
+    JOIN restaurants r ON o.restaurant_id = r.id
+    WHERE o.id = :order_id
+""")
+
 @router.callback_query(lambda c: c.data.startswith('accept_order_'))
 async def handle_order_acceptance(callback: types.CallbackQuery):
     """Handle order acceptance by restaurant"""
@@ -291,43 +259,31 @@ async def handle_order_acceptance(callback: types.CallbackQuery):
         order_id = int(callback.data.split('_')[2])
         session = await db.get_session()
         try:
-            # Updated query without address join
-            query = text("""
-                SELECT 
-                    o.id, o.user_id, o.total, o.phone_number,
-                    o.latitude, o.longitude, o.delivery_message,
-                    u.telegram_id, r.delivery_chat_id, r.name as restaurant_name
-                FROM orders o
-                JOIN users u ON o.user_id = u.id
-                JOIN restaurants r ON o.restaurant_id = r.id
-                WHERE o.id = :order_id
-            """)
-            result = await session.execute(query, {"order_id": order_id})
-            order_data = result.fetchone()
+            moved = await order_lifecycle.transition(
+                session, order_id, order_lifecycle.ACCEPTED, callback.from_user.id
+            )
+            if not moved:
+                await callback.answer("Buyurtma topilmadi", show_alert=True)
+                return
+            if not moved.changed:
+                # Second tap or a tap after cancellation: nothing to send again
+                await callback.answer(
+                    f"Buyurtma holati: {order_lifecycle.status_label(moved.status)}", show_alert=True
+                )
+                return
 
+            result = await ORDER_FOR_ACCEPTANCE.execute(session, {"order_id": order_id})
+            order_data = result.fetchone()
             if not order_data:
+                await session.rollback()
                 await callback.answer("Buyurtma topilmadi", show_alert=True)
                 return
 
-            # Update order status
-            update_query = text("""
-                UPDATE orders 
-                SET status = 'accepted' 
-                WHERE id = :order_id
-                RETURNING id
-            """)
-            await session.execute(update_query, {"order_id": order_id})
-            await session.commit()
-
             # Notify customer
-            bot = get_bot()
-            await bot.send_message(
-                chat_id=order_data.telegram_id,
-                text=(
-                    f"✅ Sizning #{order_id} raqamli buyurtmangiz "
-                    f"{order_data.restaurant_name} tomonidan qabul qilindi!\n"
-                    "🚗 Yetkazib beruvchi tayinlanishi kutilmoqda."
-                )
+            customer_message = (
+                f"✅ Sizning #{order_id} raqamli buyurtmangiz "
+                f"{order_data.restaurant_name} tomonidan qabul qilindi!\n"
+                "🚗 Yetkazib beruvchi tayinlanishi kutilmoqda."
             )
 
             # Format message for delivery group
@@ -346,17 +302,28 @@ async def handle_order_acceptance(callback: types.CallbackQuery):
             if order_data.delivery_message:
                 delivery_message += f"\n💬 Xabar: {order_data.delivery_message}"
 
-            # Send to delivery group with accept button
-            await bot.send_message(
-                chat_id=order_data.delivery_chat_id,
+            # The customer message is committed with the status change and sent by the outbox
+            await outbox.enqueue(session, [
+                outbox_message(
+                    chat_id=order_data.telegram_id,
+                    message_text=customer_message
+                )
+            ])
+            # Repeated taps wait on the order row until this commits
+            await session.commit()
+            db.on_commit(outbox.wake)
+
+            # Couriers go to the restaurant first; the delivery group gets the
+            # order if no nearby courier takes it
+            has_restaurant_location = order_data.restaurant_lat is not None and order_data.restaurant_lon is not None
+            request = DispatchRequest(
+                order_id=order_id,
+                latitude=order_data.restaurant_lat if has_restaurant_location else order_data.latitude,
+                longitude=order_data.restaurant_lon if has_restaurant_location else order_data.longitude,
                 text=delivery_message,
-                reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                    [InlineKeyboardButton(
-                        text="✅ Qabul qilish",
-                        callback_data=f"accept_delivery_{order_id}"
-                    )]
-                ])
+                group_chat_id=order_data.delivery_chat_id
             )
+            db.on_commit(lambda: dispatcher.start(request))
 
             original_text = callback.message.text
             await callback.message.edit_text(
@@ -537,19 +504,15 @@ async def handle_cancellation_reason(message: types.Message, state: FSMContext):
                 await message.answer("Siz bu buyurtmani bekor qila olmaysiz.")
                 return
 
-            # Update order status
-            update_query = text("""
-                UPDATE orders 
-                SET status = 'cancelled', 
-                    cancellation_reason = :reason,
-                    updated_at = NOW()
-                WHERE id = :order_id
-            """)
-            await session.execute(update_query, {
-                "reason": message.text,
-                "order_id": order_id
-            })
+            moved = await order_lifecycle.transition(
+                session, order_id, order_lifecycle.CANCELLED, message.from_user.id, reason=message.text
+            )
             await session.commit()
+            if not moved or not moved.changed:
+                status = order_lifecycle.status_label(moved.status) if moved else "topilmadi"
+                await message.answer(f"Buyurtmani bekor qilib bo'lmaydi. Holati: {status}")
+                await state.clear()
+                return
 
             bot = get_bot()
 
@@ -618,9 +581,9 @@ async def back_from_category_selection(message: types.Message, state: FSMContext
 async def back_from_food_selection(message: types.Message, state: FSMContext):
     """Return to category selection"""
     data = await state.get_data()
-    restaurant = data.get('restaurant')
-    if restaurant:
-        buttons, _ = await create_category_buttons(restaurant)
+    restaurant_id = data.get('restaurant_id')
+    if restaurant_id:
+        buttons, _ = await create_category_buttons(restaurant_id)
         await state.set_state(OrderState.selecting_category)
         await message.answer("Iltimos, kategoriya tanlang:", reply_markup=buttons)
     else:
@@ -7,11 +7,12 @@ from database.db import db
 from sqlalchemy import text as atext
 import logging
 from keyboards.reply import *
+from functions.order_functions import delivery_location_error
 
 router = Router()
 
 @router.message(lambda message: message.text == "⚙️ Sozlamalar")
-async def settings_menu(message: types.Message, state: FSMContext):
+async def settings_menu(message: types.Message, state: FSMContext, user_db_id: int | None = None):
     """Handle settings menu"""
     current_state = await state.get_state()
     if current_state:
@@ -24,11 +25,10 @@ async def settings_menu(message: types.Message, state: FSMContext):
             query = atext("""
                 SELECT a.id, a.address_name, a.latitude, a.longitude
                 FROM addresses a
-                JOIN users u ON a.user_id = u.id
-                WHERE u.telegram_id = :telegram_id
+                WHERE a.user_id = :user_id
                 ORDER BY a.created_at DESC
             """)
-            result = await session.execute(query, {"telegram_id": message.from_user.id})
+            result = await session.execute(query, {"user_id": user_db_id})
             addresses = result.fetchall()
             
             # Create inline keyboard for addresses
@@ -80,7 +80,7 @@ async def settings_menu(message: types.Message, state: FSMContext):
         await message.answer("Xatolik yuz berdi.")
 
 @router.message(OrderState.viewing_settings, F.text == "📍 Mening manzillarim")
-async def show_addresses(message: types.Message, state: FSMContext):
+async def show_addresses(message: types.Message, state: FSMContext, user_db_id: int | None = None):
     """Show user's saved addresses"""
     try:
         session = await db.get_session()
@@ -89,11 +89,10 @@ async def show_addresses(message: types.Message, state: FSMContext):
             query = atext("""
                 SELECT a.id, a.address_name, a.latitude, a.longitude
                 FROM addresses a
-                JOIN users u ON a.user_id = u.id
-                WHERE u.telegram_id = :telegram_id
+                WHERE a.user_id = :user_id
                 ORDER BY a.created_at DESC
             """)
-            result = await session.execute(query, {"telegram_id": message.from_user.id})
+            result = await session.execute(query, {"user_id": user_db_id})
             addresses = result.fetchall()
 
             if not addresses:
@@ -136,7 +135,7 @@ async def show_addresses(message: types.Message, state: FSMContext):
         await message.answer("Manzillarni ko'rsatishda xatolik yuz berdi")
 
 @router.callback_query(lambda c: c.data.startswith("show_address_"))
-async def show_address_details(callback: types.CallbackQuery, state: FSMContext):
+async def show_address_details(callback: types.CallbackQuery, state: FSMContext, user_db_id: int | None = None):
     """Show detailed address information"""
     try:
         address_id = int(callback.data.split("_")[2])
@@ -146,12 +145,11 @@ async def show_address_details(callback: types.CallbackQuery, state: FSMContext)
             query = atext("""
                 SELECT a.address_name, a.latitude, a.longitude
                 FROM addresses a
-                JOIN users u ON a.user_id = u.id
-                WHERE a.id = :address_id AND u.telegram_id = :telegram_id
+                WHERE a.id = :address_id AND a.user_id = :user_id
             """)
             result = await session.execute(query, {
                 "address_id": address_id,
-                "telegram_id": callback.from_user.id
+                "user_id": user_db_id
             })
             address = result.fetchone()
             
@@ -199,18 +197,18 @@ async def edit_address_start(callback: types.CallbackQuery, state: FSMContext):
         reply_markup=keyboard
     )
 
-async def create_address_keyboard(telegram_id: int) -> tuple[InlineKeyboardMarkup, str]:
+async def create_address_keyboard(telegram_id: int, user_db_id: int | None = None) -> tuple[InlineKeyboardMarkup, str]:
     """Create keyboard with addresses and return appropriate message text"""
     session = await db.get_session()
     try:
+        user_db_id = user_db_id or await db.get_user_id(telegram_id, session)
         query = atext("""
             SELECT a.id, a.address_name, a.latitude, a.longitude
             FROM addresses a
-            JOIN users u ON a.user_id = u.id
-            WHERE u.telegram_id = :telegram_id
+            WHERE a.user_id = :user_id
             ORDER BY a.created_at DESC
         """)
-        result = await session.execute(query, {"telegram_id": telegram_id})
+        result = await session.execute(query, {"user_id": user_db_id})
         addresses = result.fetchall()
 
         keyboard = []
@@ -236,7 +234,7 @@ async def create_address_keyboard(telegram_id: int) -> tuple[InlineKeyboardMarku
         await session.close()
 
 @router.callback_query(lambda c: c.data.startswith("delete_address_"))
-async def delete_address(callback: types.CallbackQuery, state: FSMContext):
+async def delete_address(callback: types.CallbackQuery, state: FSMContext, user_db_id: int | None = None):
     """Delete selected address and update keyboard"""
     try:
         address_id = int(callback.data.split("_")[2])
@@ -247,15 +245,12 @@ async def delete_address(callback: types.CallbackQuery, state: FSMContext):
             query = atext("""
                 DELETE FROM addresses
                 WHERE id = :address_id 
-                AND user_id = (
-                    SELECT id FROM users 
-                    WHERE telegram_id = :telegram_id
-                )
+                AND user_id = :user_id
                 RETURNING id
             """)
             result = await session.execute(query, {
                 "address_id": address_id,
-                "telegram_id": callback.from_user.id
+                "user_id": user_db_id
             })
             
             if result.fetchone():
@@ -263,7 +258,7 @@ async def delete_address(callback: types.CallbackQuery, state: FSMContext):
                 await callback.answer("Manzil o'chirildi", show_alert=True)
                 
                 # Create new keyboard and update message
-                markup, text = await create_address_keyboard(callback.from_user.id)
+                markup, text = await create_address_keyboard(callback.from_user.id, user_db_id)
                 await callback.message.edit_text(text=text, reply_markup=markup)
             else:
                 await callback.answer("Manzil topilmadi", show_alert=True)
@@ -279,6 +274,11 @@ async def delete_address(callback: types.CallbackQuery, state: FSMContext):
 async def handle_new_address_location(message: types.Message, state: FSMContext):
     """Handle location for new address"""
     try:
+        error = delivery_location_error(message.location.latitude, message.location.longitude)
+        if error:
+            await message.answer(f"{error}\n\nIltimos, boshqa manzil tanlang.")
+            return
+
         # Save location data in state
         await state.update_data(
             new_address_lat=message.location.latitude,
@@ -303,7 +303,7 @@ async def handle_new_address_location(message: types.Message, state: FSMContext)
         await message.answer("Xatolik yuz berdi")
 
 @router.message(OrderState.handle_new_address_name)
-async def handle_new_address_name(message: types.Message, state: FSMContext):
+async def handle_new_address_name(message: types.Message, state: FSMContext, user_db_id: int | None = None):
     """Handle name for new address"""
     try:
         # Get location data from state
@@ -318,14 +318,7 @@ async def handle_new_address_name(message: types.Message, state: FSMContext):
             
         session = await db.get_session()
         try:
-            # Get user_id from telegram_id
-            user_query = atext("""
-                SELECT id FROM users WHERE telegram_id = :telegram_id
-            """)
-            result = await session.execute(user_query, {"telegram_id": message.from_user.id})
-            user_data = result.fetchone()
-            
-            if not user_data:
+            if not user_db_id:
                 await message.answer("Foydalanuvchi topilmadi")
                 return
                 
@@ -336,7 +329,7 @@ async def handle_new_address_name(message: types.Message, state: FSMContext):
             """)
             
             await session.execute(insert_query, {
-                "user_id": user_data.id,
+                "user_id": user_db_id,
                 "address_name": message.text,
                 "latitude": latitude,
                 "longitude": longitude
@@ -344,7 +337,7 @@ async def handle_new_address_name(message: types.Message, state: FSMContext):
             
             await session.commit()
             
-            markup, text = await create_address_keyboard(message.from_user.id)
+            markup, text = await create_address_keyboard(message.from_user.id, user_db_id)
             await message.answer("✅ Yangi manzil qo'shildi!", reply_markup=markup)
             await state.set_state(OrderState.viewing_settings)
             
@@ -403,7 +396,7 @@ async def edit_address_name_start(message: types.Message, state: FSMContext):
     )
 
 @router.message(OrderState.editing_address_location, F.location)
-async def handle_edited_location(message: types.Message, state: FSMContext):
+async def handle_edited_location(message: types.Message, state: FSMContext, user_db_id: int | None = None):
     """Handle new location for existing address"""
     try:
         state_data = await state.get_data()
@@ -420,20 +413,20 @@ async def handle_edited_location(message: types.Message, state: FSMContext):
                 UPDATE addresses 
                 SET latitude = :latitude, longitude = :longitude
                 WHERE id = :address_id 
-                AND user_id = (SELECT id FROM users WHERE telegram_id = :telegram_id)
+                AND user_id = :user_id
                 RETURNING id
             """)
             
             result = await session.execute(query, {
                 "address_id": address_id,
-                "telegram_id": message.from_user.id,
+                "user_id": user_db_id,
                 "latitude": message.location.latitude,
                 "longitude": message.location.longitude
             })
             
             if result.fetchone():
                 await session.commit()
-                markup, text = await create_address_keyboard(message.from_user.id)
+                markup, text = await create_address_keyboard(message.from_user.id, user_db_id)
                 await message.answer("✅ Manzil lokatsiyasi o'zgartirildi!", reply_markup=markup)
                 await state.set_state(OrderState.viewing_settings)
             else:
@@ -451,11 +444,11 @@ async def handle_edited_location(message: types.Message, state: FSMContext):
         await message.answer("Xatolik yuz berdi")
 
 @router.message(OrderState.editing_address_name)
-async def handle_edited_name(message: types.Message, state: FSMContext):
+async def handle_edited_name(message: types.Message, state: FSMContext, user_db_id: int | None = None):
     """Handle new name for existing address"""
     try:
         if message.text == "⬅️ Orqaga":
-            markup, text = await create_address_keyboard(message.from_user.id)
+            markup, text = await create_address_keyboard(message.from_user.id, user_db_id)
             await message.answer(text, reply_markup=markup)
             await state.set_state(OrderState.viewing_settings)
             return
@@ -474,19 +467,19 @@ async def handle_edited_name(message: types.Message, state: FSMContext):
                 UPDATE addresses 
                 SET address_name = :address_name
                 WHERE id = :address_id 
-                AND user_id = (SELECT id FROM users WHERE telegram_id = :telegram_id)
+                AND user_id = :user_id
                 RETURNING id
             """)
             
             result = await session.execute(query, {
                 "address_id": address_id,
-                "telegram_id": message.from_user.id,
+                "user_id": user_db_id,
                 "address_name": message.text
             })
             
             if result.fetchone():
                 await session.commit()
-                markup, text = await create_address_keyboard(message.from_user.id)
+                markup, text = await create_address_keyboard(message.from_user.id, user_db_id)
                 await message.answer("✅ Manzil nomi o'zgartirildi!", reply_markup=markup)
                 await state.set_state(OrderState.viewing_settings)
             else:
@@ -2,7 +2,47 @@ from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
 import logging
 from database.db import db
 
+# Markups are built once per catalog version and shared between users,
+# keyed by ('restaurants',), ('categories', restaurant_id) or
+# ('eats', restaurant_id, category_id).
+_keyboard_cache = {}
+_keyboard_cache_version = None
+
+async def _cached_keyboard(key, build):
+    global _keyboard_cache_version
+
+    if not db.catalog.loaded:
+        return await build()
+
+    if _keyboard_cache_version != db.catalog.version:
+        _keyboard_cache.clear()
+        _keyboard_cache_version = db.catalog.version
+
+    cached = _keyboard_cache.get(key)
+    if cached:
+        return cached
+
+    buttons, error = await build()
+    if not error:
+        _keyboard_cache[key] = (buttons, None)
+    return buttons, error
+
 async def create_restaurant_buttons():
+    return await _cached_keyboard(('restaurants',), _build_restaurant_buttons)
+
+async def create_category_buttons(restaurant_id: int):
+    return await _cached_keyboard(
+        ('categories', restaurant_id),
+        lambda: _build_category_buttons(restaurant_id)
+    )
+
+async def create_eat_buttons(restaurant_id: int, category_id: int) -> tuple[ReplyKeyboardMarkup, str | None]:
+    return await _cached_keyboard(
+        ('eats', restaurant_id, category_id),
+        lambda: _build_eat_buttons(restaurant_id, category_id)
+    )
+
+async def _build_restaurant_buttons():
     restaurants, error = await db.get_restaurants()
     if error:
         logging.error(f"Error getting restaurants: {error}")
@@ -13,7 +53,7 @@ async def create_restaurant_buttons():
     try:
         buttons = ReplyKeyboardMarkup(
             keyboard=[
-                [KeyboardButton(text=str(restaurant[1]))] for restaurant in restaurants
+                [KeyboardButton(text=str(restaurant.label))] for restaurant in restaurants
             ] + [[KeyboardButton(text="⬅️ Orqaga")]],
             resize_keyboard=True
         )
@@ -21,14 +61,14 @@ async def create_restaurant_buttons():
     except Exception as e:
         logging.error(f"Error creating restaurant buttons: {e}")
         return None, "Xatolik yuz berdi"    
-async def create_category_buttons(restaurant_name):
-    categories, error = await db.get_categories(restaurant_name)
+async def _build_category_buttons(restaurant_id: int):
+    categories, error = await db.get_categories(restaurant_id)
     if error:
         return None, error
     if not categories:
         return None, "Kechirasiz, bu restoranda hozircha faol kategoriyalar mavjud emas."
 
-    category_buttons = [KeyboardButton(text=str(name[0])) for name in categories]
+    category_buttons = [KeyboardButton(text=str(category.label)) for category in categories]
     grouped_category_buttons = [category_buttons[i:i+2] for i in range(0, len(category_buttons), 2)]
 
     control_buttons = [[KeyboardButton(text="🛒 Savat")], [KeyboardButton(text="⬅️ Orqaga")]]
@@ -40,10 +80,10 @@ async def create_category_buttons(restaurant_name):
 
     return buttons, None
 
-async def create_eat_buttons(restaurant_name: str, category_name: str) -> tuple[ReplyKeyboardMarkup, str | None]:
+async def _build_eat_buttons(restaurant_id: int, category_id: int) -> tuple[ReplyKeyboardMarkup, str | None]:
     try:
         # Get eats from database
-        eats, error = await db.get_eats(restaurant_name, category_name)
+        eats, error = await db.get_eats(restaurant_id, category_id)
         
         if error:
             logging.error(f"Error fetching eats: {error}")
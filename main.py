@@ -1,7 +1,7 @@
 import asyncio
 import logging
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.fsm.storage.base import BaseStorage
 from config import Config
 from handlers.user import router as user_router
 from handlers.restaurant import router as restaurant_router
@@ -11,7 +11,67 @@ from handlers.order import router as order_router
 from handlers.settings import router as settings_router
 from handlers.delivery import router as delivery_router
 from database.db import db
+from database.fsm_storage import create_storage
+from database.tracing import slow_queries
 from core.bot import set_bot
+from core.dispatch import dispatcher
+from core.latency import TelegramApiTiming
+from core.metrics import start_metrics_server
+from core.outbox import outbox
+from core.photo_cache import photo_cache
+from core.webhook import WebhookServer
+from middlewares.db_session import DbSessionMiddleware
+from middlewares.latency import HandlerLabelMiddleware, UpdateLatencyMiddleware
+from middlewares.user_identity import UserIdentityMiddleware
+
+def create_dispatcher(storage: BaseStorage) -> Dispatcher:
+    dp = Dispatcher(storage=storage)
+    # Outermost, so the timing includes the session scope's commit
+    dp.update.outer_middleware(UpdateLatencyMiddleware())
+    # The session scope wraps identity lookup and handlers alike
+    dp.update.outer_middleware(DbSessionMiddleware())
+    dp.update.outer_middleware(UserIdentityMiddleware())
+    # Inner middlewares see the matched handler; nested routers inherit them
+    for observer in (dp.message, dp.edited_message, dp.callback_query):
+        observer.middleware(HandlerLabelMiddleware())
+
+    # Register routers
+    dp.include_router(user_router)
+    dp.include_router(restaurant_router)
+    dp.include_router(basket_router)
+    dp.include_router(orders_router)
+    dp.include_router(order_router)
+    dp.include_router(settings_router)
+    dp.include_router(delivery_router)
+    return dp
+
+async def run_webhook(dp: Dispatcher, bot: Bot):
+    server = WebhookServer(
+        dp,
+        bot,
+        path=Config.WEBHOOK_PATH,
+        secret_token=Config.WEBHOOK_SECRET or None,
+        queue_size=Config.WEBHOOK_QUEUE_SIZE,
+        workers=Config.WEBHOOK_WORKERS
+    )
+
+    await dp.emit_startup(bot=bot)
+    try:
+        await server.start(Config.WEBHOOK_HOST, Config.WEBHOOK_PORT, Config.WEBHOOK_REUSE_PORT)
+
+        # With several processes behind one proxy only one of them needs to register
+        if Config.WEBHOOK_SET_ON_START:
+            await bot.set_webhook(
+                url=Config.WEBHOOK_URL.rstrip("/") + Config.WEBHOOK_PATH,
+                secret_token=Config.WEBHOOK_SECRET or None,
+                allowed_updates=dp.resolve_used_update_types()
+            )
+            logging.info("Webhook registered")
+
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+        await dp.emit_shutdown(bot=bot)
 
 async def main():
     logging.basicConfig(
@@ -21,32 +81,63 @@ async def main():
 
     Config.validate()
 
-    storage = MemoryStorage()
-    
+    storage = create_storage(db)
+
     bot = Bot(token=Config.BOT_TOKEN)
+    bot.session.middleware(TelegramApiTiming())
     set_bot(bot)  # Set bot instance globally
-    dp = Dispatcher(storage=storage)
-    
-    # Register routers
-    dp.include_router(user_router)
-    dp.include_router(restaurant_router)
-    dp.include_router(basket_router)
-    dp.include_router(orders_router)
-    dp.include_router(order_router)
-    dp.include_router(settings_router)
-    dp.include_router(delivery_router)
+    dp = create_dispatcher(storage)
+    catalog_task = None
+    outbox_task = None
+    pool_task = None
+    metrics_runner = None
     try:
         await db.connect()
         logging.info("Database connection established")
-        
-        await dp.start_polling(bot)
+
+        if Config.DB_POOL_ADAPTIVE:
+            pool_task = asyncio.create_task(db.run_pool_sizer(Config.DB_POOL_ADAPT_INTERVAL_SECONDS))
+        if Config.METRICS_PORT:
+            metrics_runner = await start_metrics_server(
+                Config.METRICS_HOST, Config.METRICS_PORT, db.ping,
+                json_routes={"/slow-queries": slow_queries}
+            )
+
+        await db.load_catalog()
+        await photo_cache.load()
+        catalog_task = asyncio.create_task(
+            db.run_catalog_refresh(Config.CATALOG_REFRESH_SECONDS)
+        )
+        outbox_task = asyncio.create_task(outbox.run(bot))
+
+        if Config.BOT_MODE == "webhook":
+            await run_webhook(dp, bot)
+        else:
+            # getUpdates is refused while a webhook is registered
+            await bot.delete_webhook()
+            await dp.start_polling(bot)
     except Exception as e:
         logging.error(f"Error during startup: {e}")
         raise
     finally:
+        if catalog_task:
+            catalog_task.cancel()
+        if outbox_task:
+            outbox_task.cancel()
+        if pool_task:
+            pool_task.cancel()
+        if metrics_runner:
+            await metrics_runner.cleanup()
+
+        # Orders still being offered to couriers fall back to their delivery group
+        await dispatcher.close()
+
+        # Flush pending FSM writes while the database is still open
+        await storage.close()
+
         # Close database connection
         await db.close()
-        
+
         # Close bot session
         if bot.session:
             await bot.session.close()
@@ -57,4 +148,4 @@ if __name__ == '__main__':
     except (KeyboardInterrupt, SystemExit):
         logging.info("Bot stopped!")
     except Exception as e:
-        logging.error(f"Error: {e}")
\ No newline at end of file
+        logging.error(f"Error: {e}")
@@ -0,0 +1,19 @@
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from database.db import db
+
+
+class DbSessionMiddleware(BaseMiddleware):
+    """Run each update in one database session, committed or rolled back once"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        async with db.update_scope():
+            # Opened lazily, so updates that never touch the database cost nothing
+            data["session"] = await db.get_session()
+            return await handler(event, data)
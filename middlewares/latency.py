@@ -0,0 +1,37 @@
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from core.latency import UpdateTimer, current_timer
+
+
+class UpdateLatencyMiddleware(BaseMiddleware):
+    """Time each update, split into database, Telegram API and Python time"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        timer = UpdateTimer()
+        token = current_timer.set(timer)
+        try:
+            return await handler(event, data)
+        finally:
+            current_timer.reset(token)
+            timer.finish()
+
+
+class HandlerLabelMiddleware(BaseMiddleware):
+    """Inner middleware: tells the update's timer which handler it reached"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        timer = current_timer.get()
+        if timer is not None:
+            timer.label(data.get("handler"))
+        return await handler(event, data)
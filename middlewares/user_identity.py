@@ -0,0 +1,18 @@
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from database.db import db
+
+
+class UserIdentityMiddleware(BaseMiddleware):
+    """Resolve users.id once per update and expose it to handlers as user_db_id"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        data["user_db_id"] = await db.get_user_id(user.id) if user else None
+        return await handler(event, data)
@@ -0,0 +1,168 @@
+import json
+import logging
+import math
+from typing import Iterable, Optional, Sequence
+import numpy as np
+from config import Config
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance; within 0.5% of geodesic anywhere on Earth"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def equirectangular_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Flat-Earth approximation; well under 0.1% off at city distances"""
+    x = math.radians(lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return EARTH_RADIUS_KM * math.hypot(x, y)
+
+
+def point_in_polygon(lat: float, lon: float, polygon: np.ndarray) -> bool:
+    """Even-odd ray casting over an (n, 2) array of [lat, lon] vertices"""
+    lat1, lon1 = polygon[:, 0], polygon[:, 1]
+    lat2, lon2 = np.roll(lat1, -1), np.roll(lon1, -1)
+    crosses = (lat1 > lat) != (lat2 > lat)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        lon_at_lat = lon1 + (lat - lat1) * (lon2 - lon1) / (lat2 - lat1)
+    return bool(np.count_nonzero(crosses & (lon < lon_at_lat)) % 2)
+
+
+def check_delivery_distance(lat: float, lon: float) -> tuple[bool, float]:
+    """
+    Check if delivery is possible to given coordinates
+    Returns: (is_deliverable: bool, distance: float)
+    """
+    distance = haversine_km(Config.CITY_CENTER_LATITUDE, Config.CITY_CENTER_LONGITUDE, lat, lon)
+    return distance <= Config.MAX_DISTANCE_KM, distance
+
+
+class DeliveryZones:
+    """
+    Delivery areas of all restaurants packed into NumPy arrays, so one
+    customer point is scored against every restaurant in a single call.
+
+    A restaurant's area is its delivery_zone polygon when set, otherwise a
+    circle of delivery_radius_km around it. Restaurants with neither deliver
+    anywhere inside the city area (check_delivery_distance). Restaurants
+    without coordinates are left out, and deliver anywhere too.
+    """
+
+    def __init__(self, restaurants: Iterable = ()):
+        restaurants = list(restaurants)
+        located = [r for r in restaurants if r.latitude is not None and r.longitude is not None]
+        self._unlocated = len(located) < len(restaurants)
+
+        self.ids = np.array([r.id for r in located], dtype=np.int64)
+        self._lat = np.radians(np.array([r.latitude for r in located], dtype=np.float64))
+        self._lon = np.radians(np.array([r.longitude for r in located], dtype=np.float64))
+        self._cos_lat = np.cos(self._lat)
+        self._radius = np.array([
+            r.delivery_radius_km if r.delivery_radius_km is not None else np.inf
+            for r in located
+        ], dtype=np.float64)
+
+        # index -> (n, 2) vertices; bounding boxes skip the exact test for far points
+        self._polygons = {}
+        for index, restaurant in enumerate(located):
+            polygon = _parse_polygon(restaurant.delivery_zone)
+            if polygon is not None:
+                self._polygons[index] = (polygon, polygon.min(axis=0), polygon.max(axis=0))
+
+        self._index = {int(restaurant_id): index for index, restaurant_id in enumerate(self.ids)}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def distances_km(self, lat: float, lon: float, method: str = "haversine") -> np.ndarray:
+        """Distance from the point to every restaurant, aligned with self.ids"""
+        phi, lam = math.radians(lat), math.radians(lon)
+        if method == "equirectangular":
+            x = (self._lon - lam) * np.cos((self._lat + phi) / 2)
+            y = self._lat - phi
+            return EARTH_RADIUS_KM * np.hypot(x, y)
+
+        a = (np.sin((self._lat - phi) / 2) ** 2
+             + math.cos(phi) * self._cos_lat * np.sin((self._lon - lam) / 2) ** 2)
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+    def distance_matrix_km(self, lats: Sequence[float], lons: Sequence[float]) -> np.ndarray:
+        """Haversine distances of many points to every restaurant, shape (points, restaurants)"""
+        phi = np.radians(np.asarray(lats, dtype=np.float64))[:, None]
+        lam = np.radians(np.asarray(lons, dtype=np.float64))[:, None]
+        a = (np.sin((self._lat - phi) / 2) ** 2
+             + np.cos(phi) * self._cos_lat * np.sin((self._lon - lam) / 2) ** 2)
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+    def coverage(self, lat: float, lon: float, distances: Optional[np.ndarray] = None) -> np.ndarray:
+        """Boolean mask, aligned with self.ids, of restaurants delivering to the point"""
+        if distances is None:
+            distances = self.distances_km(lat, lon)
+        mask = distances <= self._radius
+
+        point = (lat, lon)
+        for index, (polygon, low, high) in self._polygons.items():
+            inside_box = low[0] <= point[0] <= high[0] and low[1] <= point[1] <= high[1]
+            mask[index] = inside_box and point_in_polygon(lat, lon, polygon)
+        return mask
+
+    def covered(self, lat: float, lon: float) -> bool:
+        """True if at least one restaurant delivers to the point"""
+        return self._unlocated or bool(self.coverage(lat, lon).any())
+
+    def serving(self, lat: float, lon: float) -> list[tuple[int, float]]:
+        """(restaurant_id, distance_km) of restaurants delivering to the point, nearest first"""
+        distances = self.distances_km(lat, lon)
+        indexes = np.flatnonzero(self.coverage(lat, lon, distances))
+        indexes = indexes[np.argsort(distances[indexes], kind="stable")]
+        return [(int(self.ids[i]), float(distances[i])) for i in indexes]
+
+    def nearest(self, lat: float, lon: float, limit: int = 1) -> list[tuple[int, float]]:
+        """(restaurant_id, distance_km) of the closest restaurants regardless of zones"""
+        if not len(self.ids) or limit <= 0:
+            return []
+        distances = self.distances_km(lat, lon)
+        limit = min(limit, len(distances))
+        closest = np.argpartition(distances, limit - 1)[:limit]
+        closest = closest[np.argsort(distances[closest], kind="stable")]
+        return [(int(self.ids[i]), float(distances[i])) for i in closest]
+
+    def delivers_to(self, restaurant_id: int, lat: float, lon: float) -> bool:
+        """True if the restaurant delivers to the point; unknown restaurants are not restricted"""
+        index = self._index.get(restaurant_id)
+        if index is None:
+            return True
+
+        zone = self._polygons.get(index)
+        if zone:
+            return point_in_polygon(lat, lon, zone[0])
+
+        radius = self._radius[index]
+        if math.isinf(radius):
+            return True
+        distance = haversine_km(
+            math.degrees(self._lat[index]), math.degrees(self._lon[index]), lat, lon
+        )
+        return distance <= radius
+
+
+def _parse_polygon(zone) -> Optional[np.ndarray]:
+    """[[lat, lon], ...] from JSONB (decoded or text) as an (n, 2) array; None if unusable"""
+    if not zone:
+        return None
+    try:
+        if isinstance(zone, str):
+            zone = json.loads(zone)
+        polygon = np.asarray(zone, dtype=np.float64)
+    except (TypeError, ValueError) as e:
+        logging.error(f"Invalid delivery zone {zone!r}: {e}")
+        return None
+    if polygon.ndim != 2 or polygon.shape[1] != 2 or len(polygon) < 3:
+        return None
+    return polygon
@@ -0,0 +1,200 @@
+"""
+Restaurant opening hours as a precomputed timeline.
+
+Schedule turns every restaurant's hours into absolute open intervals over a
+window of days around now, once, and answers "is it open", "which are open"
+and "when does it open next" by binary search, without the database and
+without building timezone-aware datetimes per request.
+"""
+from bisect import bisect_right
+from collections import namedtuple
+from datetime import date, datetime, time as day_time, timedelta
+import time
+from typing import Iterable, Optional
+import pytz
+from config import Config
+
+# weekday follows date.weekday(): 0 is Monday. closes_at at or before
+# opens_at runs past midnight; equal times mean open around the clock.
+HoursEntry = namedtuple('HoursEntry', 'restaurant_id weekday opens_at closes_at')
+# restaurant_id None applies to every restaurant. Without times the day is
+# off; with times they replace the regular hours of that day.
+HolidayEntry = namedtuple('HolidayEntry', 'restaurant_id day opens_at closes_at')
+# The restaurants.startwork/endwork pair, for rows read outside the catalog
+DailyHours = namedtuple('DailyHours', 'id startwork endwork')
+
+WEEKDAYS = ('Dushanba', 'Seshanba', 'Chorshanba', 'Payshanba', 'Juma', 'Shanba', 'Yakshanba')
+
+# Days before today whose overnight windows can still reach into today
+_DAYS_BEHIND = 1
+
+
+class Schedule:
+    """
+    Open intervals of all restaurants from yesterday to horizon_days ahead.
+
+    A restaurant's day is, in order of precedence: its own holiday entry, a
+    holiday entry for all restaurants, its per-weekday hours, and otherwise
+    the daily startwork/endwork. Intervals are kept per restaurant as sorted
+    starts and ends, and for all restaurants as a timeline of transitions
+    with the set of open restaurants after each one. The timeline is rebuilt
+    when a lookup falls outside it, in practice once a day.
+    """
+
+    def __init__(self, restaurants: Iterable = (), hours: Iterable[HoursEntry] = (),
+                 holidays: Iterable[HolidayEntry] = (), timezone: Optional[str] = None,
+                 horizon_days: int = 14):
+        self._tz = pytz.timezone(timezone or Config.TIMEZONE)
+        self.horizon_days = horizon_days
+        self._daily = {r.id: (r.startwork, r.endwork) for r in restaurants}
+
+        self._weekly = {}  # restaurant_id -> weekday -> [(opens_at, closes_at)]
+        for entry in hours:
+            self._weekly.setdefault(entry.restaurant_id, {}).setdefault(entry.weekday, []).append(
+                (entry.opens_at, entry.closes_at)
+            )
+
+        self._holidays = {}  # (restaurant_id or None, day) -> [(opens_at, closes_at)], empty when off
+        for entry in holidays:
+            windows = self._holidays.setdefault((entry.restaurant_id, entry.day), [])
+            if entry.opens_at is not None and entry.closes_at is not None:
+                windows.append((entry.opens_at, entry.closes_at))
+
+        self._valid_from = self._valid_until = None
+
+    # Lookups
+
+    def is_open(self, restaurant_id: int, at: Optional[datetime] = None) -> bool:
+        moment = self._moment(at)
+        starts, ends = self._intervals.get(restaurant_id, ((), ()))
+        index = bisect_right(starts, moment) - 1
+        return index >= 0 and moment < ends[index]
+
+    def open_restaurants(self, at: Optional[datetime] = None) -> frozenset:
+        """Ids of the restaurants open at the given moment"""
+        moment = self._moment(at)
+        index = bisect_right(self._transitions, moment) - 1
+        return self._open_sets[index] if index >= 0 else frozenset()
+
+    def next_opening(self, restaurant_id: int, at: Optional[datetime] = None) -> Optional[datetime]:
+        """Local time of the first opening after the given moment, None if none is scheduled"""
+        return self._next_opening(restaurant_id, self._moment(at))
+
+    def hours_text(self, restaurant_id: int, at: Optional[datetime] = None) -> str:
+        """The restaurant's hours on the local day of the given moment, e.g. "10:00 - 22:00" """
+        day = datetime.fromtimestamp(self._moment(at), self._tz).date()
+        windows = self._windows(restaurant_id, day)
+        if windows is None:
+            return "noaniq"
+        if not windows:
+            return "dam olish kuni"
+        return ", ".join(f"{opens:%H:%M} - {closes:%H:%M}" for opens, closes in windows)
+
+    def opening_text(self, restaurant_id: int, at: Optional[datetime] = None) -> str:
+        """When a closed restaurant opens next, for messages"""
+        moment = self._moment(at)
+        opening = self._next_opening(restaurant_id, moment)
+        if opening is None:
+            return "Ish vaqti noaniq"
+
+        today = datetime.fromtimestamp(moment, self._tz).date()
+        days = (opening.date() - today).days
+        if days == 0:
+            when = "Bugun"
+        elif days == 1:
+            when = "Ertaga"
+        elif days < 7:
+            when = WEEKDAYS[opening.weekday()]
+        else:
+            when = opening.strftime("%d.%m")
+        return f"{when} soat {opening:%H:%M} da ochiladi"
+
+    def _next_opening(self, restaurant_id: int, moment: float) -> Optional[datetime]:
+        starts, _ = self._intervals.get(restaurant_id, ((), ()))
+        index = bisect_right(starts, moment)
+        if index == len(starts):
+            return None
+        return datetime.fromtimestamp(starts[index], self._tz)
+
+    # Building
+
+    def _moment(self, at: Optional[datetime]) -> float:
+        if at is None:
+            moment = time.time()
+        elif at.tzinfo is None:
+            moment = self._tz.localize(at).timestamp()
+        else:
+            moment = at.timestamp()
+
+        if self._valid_from is None or not self._valid_from <= moment < self._valid_until:
+            self._build(datetime.fromtimestamp(moment, self._tz).date())
+        return moment
+
+    def _windows(self, restaurant_id: int, day: date) -> Optional[list]:
+        """(opens_at, closes_at) windows starting on the day; None when the hours are unknown"""
+        for key in ((restaurant_id, day), (None, day)):
+            if key in self._holidays:
+                return self._holidays[key]
+
+        weekly = self._weekly.get(restaurant_id)
+        if weekly is not None:
+            return weekly.get(day.weekday(), [])
+
+        opens, closes = self._daily.get(restaurant_id, (None, None))
+        if opens is None or closes is None:
+            return None
+        return [(opens, closes)]
+
+    def _local(self, day: date, moment: day_time) -> float:
+        return self._tz.localize(datetime.combine(day, moment)).timestamp()
+
+    def _build(self, today: date):
+        first = today - timedelta(days=_DAYS_BEHIND)
+        days = [first + timedelta(days=offset) for offset in range(_DAYS_BEHIND + self.horizon_days + 1)]
+
+        intervals = {}
+        events = []
+        for restaurant_id in set(self._daily) | set(self._weekly):
+            spans = []
+            for day in days:
+                for opens, closes in self._windows(restaurant_id, day) or ():
+                    start = self._local(day, opens)
+                    end_day = day + timedelta(days=1) if closes <= opens else day
+                    spans.append((start, self._local(end_day, closes)))
+
+            # Overlapping or touching windows become one interval
+            merged = []
+            for start, end in sorted(spans):
+                if merged and start <= merged[-1][1]:
+                    merged[-1][1] = max(merged[-1][1], end)
+                else:
+                    merged.append([start, end])
+
+            intervals[restaurant_id] = (tuple(s for s, _ in merged), tuple(e for _, e in merged))
+            for start, end in merged:
+                events.append((start, 1, restaurant_id))
+                events.append((end, -1, restaurant_id))
+
+        # Closings sort before openings at the same moment
+        events.sort()
+        transitions = []
+        open_sets = []
+        current = set()
+        for moment, change, restaurant_id in events:
+            if change > 0:
+                current.add(restaurant_id)
+            else:
+                current.discard(restaurant_id)
+            if transitions and transitions[-1] == moment:
+                open_sets[-1] = frozenset(current)
+            else:
+                transitions.append(moment)
+                open_sets.append(frozenset(current))
+
+        self._intervals = intervals
+        self._transitions = transitions
+        self._open_sets = open_sets
+        # Stay valid through today and rebuild from tomorrow, so an overnight
+        # window or a next opening days ahead is always inside the timeline
+        self._valid_from = self._local(today, day_time())
+        self._valid_until = self._local(today + timedelta(days=1), day_time())
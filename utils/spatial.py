@@ -0,0 +1,109 @@
+import math
+from typing import Callable, Hashable, Optional
+from utils.delivery_zones import EARTH_RADIUS_KM, haversine_km
+
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+class GridIndex:
+    """
+    Moving points bucketed into square cells of about cell_km, so a nearest
+    lookup only reads the cells around the query point instead of every point.
+
+    Longitude steps are scaled for reference_latitude, which keeps the cells
+    square to within a few percent across one city.
+    """
+
+    def __init__(self, cell_km: float, reference_latitude: float):
+        self.cell_km = cell_km
+        self._lat_step = cell_km / KM_PER_DEGREE
+        self._lon_step = self._lat_step / max(math.cos(math.radians(reference_latitude)), 0.01)
+        self._cells = {}   # (row, col) -> keys
+        self._points = {}  # key -> (lat, lon, cell)
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._points
+
+    def get(self, key: Hashable) -> Optional[tuple[float, float]]:
+        point = self._points.get(key)
+        return point[:2] if point else None
+
+    def keys(self) -> list:
+        return list(self._points)
+
+    def update(self, key: Hashable, lat: float, lon: float):
+        """Insert a point or move it; O(1)"""
+        cell = self._cell(lat, lon)
+        previous = self._points.get(key)
+        if previous and previous[2] != cell:
+            self._discard(key, previous[2])
+        self._points[key] = (lat, lon, cell)
+        self._cells.setdefault(cell, set()).add(key)
+
+    def remove(self, key: Hashable):
+        previous = self._points.pop(key, None)
+        if previous:
+            self._discard(key, previous[2])
+
+    def nearest(self, lat: float, lon: float, limit: int = 1, max_km: float = math.inf,
+                accept: Optional[Callable[[Hashable], bool]] = None) -> list[tuple[Hashable, float]]:
+        """
+        (key, distance_km) of the closest points within max_km, nearest first.
+        Points for which accept(key) is false are skipped.
+
+        Cells are read in rings around the query cell. Anything beyond ring r
+        is at least r cells away, so the search stops as soon as enough points
+        closer than that have been found.
+        """
+        if not self._points or limit <= 0:
+            return []
+
+        row, col = self._cell(lat, lon)
+        if math.isinf(max_km):
+            last_ring = max(max(abs(r - row), abs(c - col)) for r, c in self._cells)
+        else:
+            last_ring = math.ceil(max_km / self.cell_km) + 1
+
+        found = []
+        for ring in range(last_ring + 1):
+            for cell in self._ring(row, col, ring):
+                for key in self._cells.get(cell, ()):
+                    if accept and not accept(key):
+                        continue
+                    point_lat, point_lon, _ = self._points[key]
+                    distance = haversine_km(lat, lon, point_lat, point_lon)
+                    if distance <= max_km:
+                        found.append((key, distance))
+
+            if len(found) >= limit:
+                found.sort(key=lambda item: item[1])
+                if found[limit - 1][1] <= ring * self.cell_km:
+                    break
+
+        found.sort(key=lambda item: item[1])
+        return found[:limit]
+
+    def _cell(self, lat: float, lon: float) -> tuple[int, int]:
+        return math.floor(lat / self._lat_step), math.floor(lon / self._lon_step)
+
+    def _discard(self, key: Hashable, cell: tuple[int, int]):
+        keys = self._cells.get(cell)
+        if keys:
+            keys.discard(key)
+            if not keys:
+                del self._cells[cell]
+
+    @staticmethod
+    def _ring(row: int, col: int, ring: int):
+        if ring == 0:
+            yield row, col
+            return
+        for c in range(col - ring, col + ring + 1):
+            yield row - ring, c
+            yield row + ring, c
+        for r in range(row - ring + 1, row + ring):
+            yield r, col - ring
+            yield r, col + ring